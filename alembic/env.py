@@ -1,8 +1,10 @@
 from logging.config import fileConfig
 from models import Base
-from sqlalchemy import engine_from_config
+from sqlalchemy import engine_from_config, make_url
 from sqlalchemy import pool
 
+import config as app_config
+
 from alembic import context
 
 # this is the Alembic Config object, which provides
@@ -11,8 +13,16 @@ config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
+# Loggers of the application stay enabled when migrations run in-process
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# Same database as the application, alembic works with the sync driver
+_url = make_url(app_config.DATABASE_URL)
+config.set_main_option(
+    "sqlalchemy.url",
+    _url.set(drivername=_url.get_backend_name()).render_as_string(hide_password=False),
+)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
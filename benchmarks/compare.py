@@ -0,0 +1,40 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any], threshold: float) -> List[str]:
+    regressions: List[str] = []
+
+    for name, head_result in head["results"].items():
+        base_result = base["results"].get(name)
+        if not base_result or not head_result:
+            print(f"{name}: no baseline")
+            continue
+
+        for metric in METRICS:
+            before, after = base_result[metric], head_result[metric]
+            change = (after - before) / before if before else 0.0
+            marker = ""
+            if change > threshold:
+                marker = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name}.{metric}: {before:.3f} -> {after:.3f} ms ({change:+.1%}){marker}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark results")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed slowdown, 0.1 = 10%%")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as base_file, open(args.head, encoding="utf-8") as head_file:
+        regressions = compare(json.load(base_file), json.load(head_file), args.threshold)
+
+    sys.exit(1 if regressions else 0)
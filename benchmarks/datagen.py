@@ -0,0 +1,161 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple
+
+from sqlalchemy import insert, update, select, func, bindparam
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from models import Operator, Source, Lead, LeadsSources, OperatorSourcePriority, Contact
+from dependencies.custom_enum import StatusList
+from repositories.repo_stats import StatsRepository
+
+
+class DatasetParams(NamedTuple):
+    operators: int = 1_000
+    sources: int = 200
+    leads: int = 100_000
+    contacts: int = 200_000
+    # Sources served by each operator
+    sources_per_operator: int = 5
+    seed: int = 42
+    chunk_size: int = 10_000
+
+
+# Rows are generated in chunks and written with executemany inserts,
+# one transaction per table, so 10M contacts don't have to fit in memory
+async def generate_dataset(engine: AsyncEngine, params: DatasetParams) -> Dict[str, int]:
+    rnd = random.Random(params.seed)
+    now = datetime.now(timezone.utc)
+
+    max_loading = {
+        operator_id: rnd.randint(20, 200)
+        for operator_id in range(1, params.operators + 1)
+    }
+    active_operators = {
+        operator_id for operator_id in max_loading if rnd.random() < 0.9
+    }
+
+    async with engine.begin() as conn:
+        await _insert_chunks(conn, Operator, params.chunk_size, (
+            {
+                "id": operator_id,
+                "name": f"operator-{operator_id}",
+                "max_loading": max_loading[operator_id],
+                "current_loading": 0,
+                "active": operator_id in active_operators,
+            }
+            for operator_id in max_loading
+        ))
+        await _insert_chunks(conn, Source, params.chunk_size, (
+            {"id": source_id, "name": f"source-{source_id}"}
+            for source_id in range(1, params.sources + 1)
+        ))
+
+    # Operators of every source for contacts generation
+    operators_by_source: Dict[int, List[int]] = {}
+    priorities: List[Dict[str, Any]] = []
+    for operator_id in max_loading:
+        count = min(params.sources_per_operator, params.sources)
+        for source_id in rnd.sample(range(1, params.sources + 1), count):
+            operators_by_source.setdefault(source_id, []).append(operator_id)
+            priorities.append({
+                "operator_id": operator_id,
+                "source_id": source_id,
+                "weight": rnd.randint(1, 100),
+                "created_at": now,
+                "updated_at": now,
+            })
+
+    async with engine.begin() as conn:
+        await _insert_chunks(conn, OperatorSourcePriority, params.chunk_size, iter(priorities))
+        await _insert_chunks(conn, Lead, params.chunk_size, (
+            {
+                "id": lead_id,
+                "external_id": f"bench-{lead_id}",
+                "created_at": now,
+            }
+            for lead_id in range(1, params.leads + 1)
+        ))
+
+    # Active contacts never exceed max_loading, extra ones are generated as done
+    loading: Counter[int] = Counter()
+    statuses = [StatusList.NEW, StatusList.IN_PROGRESS, StatusList.DONE, StatusList.IN_QUEUE]
+
+    def contacts():
+        start = now - timedelta(days=365)
+        step = timedelta(days=365) / max(params.contacts, 1)
+
+        for number in range(params.contacts):
+            source_id = rnd.randint(1, params.sources)
+            status = rnd.choices(statuses, weights=(2, 2, 5, 1))[0]
+            operator_id = None
+
+            if status != StatusList.IN_QUEUE and operators_by_source.get(source_id):
+                operator_id = rnd.choice(operators_by_source[source_id])
+                if status != StatusList.DONE:
+                    if loading[operator_id] < max_loading[operator_id]:
+                        loading[operator_id] += 1
+                    else:
+                        status = StatusList.DONE
+            elif status != StatusList.IN_QUEUE:
+                status = StatusList.IN_QUEUE
+
+            created_at = start + step * number
+            yield {
+                "lead_id": rnd.randint(1, params.leads),
+                "source_id": source_id,
+                "operator_id": operator_id,
+                "status": status,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+
+    async with engine.begin() as conn:
+        await _insert_chunks(conn, Contact, params.chunk_size, contacts())
+
+        # Links of lead and source follow the generated contacts
+        await conn.execute(
+            insert(LeadsSources.__table__).from_select(
+                ["lead_id", "source_id", "created_at"],
+                select(Contact.lead_id, Contact.source_id, func.min(Contact.created_at)) \
+                    .group_by(Contact.lead_id, Contact.source_id)
+            )
+        )
+
+        if loading:
+            await conn.execute(
+                update(Operator.__table__) \
+                    .where(Operator.__table__.c.id == bindparam("operator_id")) \
+                    .values(current_loading=bindparam("loading")),
+                [
+                    {"operator_id": operator_id, "loading": count}
+                    for operator_id, count in loading.items()
+                ]
+            )
+
+    # Bulk inserts bypass the session listeners that keep the hourly rollup,
+    # it is recounted from contacts like rebuild_rollup.py does
+    async with AsyncSession(bind=engine) as db:
+        rollup_rows = await StatsRepository(db).rebuild_rollup()
+
+    return {
+        "operators": params.operators,
+        "sources": params.sources,
+        "priorities": len(priorities),
+        "leads": params.leads,
+        "contacts": params.contacts,
+        "rollup_rows": rollup_rows,
+    }
+
+
+async def _insert_chunks(conn, model, chunk_size: int, rows) -> None:
+    chunk: List[Dict[str, Any]] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            await conn.execute(insert(model.__table__), chunk)
+            chunk = []
+
+    if chunk:
+        await conn.execute(insert(model.__table__), chunk)
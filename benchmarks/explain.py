@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from database import make_engine
+from dependencies.custom_enum import StatusList
+from schemas.schema_base import CursorParams, SortParams
+from schemas.schema_contact import FilterContact
+
+from repositories.repo_operator import OperatorRepository
+from repositories.repo_source import SourceRepository
+from repositories.repo_contact import DistributeRepository
+
+from benchmarks.datagen import DatasetParams
+from benchmarks.run import prepare_database
+
+# (name, repository call, indexes the plan of contacts may use)
+Check = Tuple[str, Callable[[AsyncSession], Awaitable[Any]], Tuple[str, ...]]
+
+DAY_AGO = datetime.now(timezone.utc) - timedelta(days=1)
+
+CHECKS: List[Check] = [
+    (
+        "contacts of operator by status",
+        lambda db: DistributeRepository(db).get_list(
+            filter_params=FilterContact(operator_id=1, status=StatusList.NEW),
+            cursor=CursorParams(), sort=SortParams()
+        ),
+        ("ix_contact_operator_status",),
+    ),
+    (
+        "contacts of source by status and date",
+        lambda db: DistributeRepository(db).get_list(
+            filter_params=FilterContact(source_id=1, status=StatusList.DONE, created_at_ge=DAY_AGO),
+            cursor=CursorParams(), sort=SortParams()
+        ),
+        # Both are a seek on source and status, planner picks by statistics
+        ("ix_contact_source_status_created_at", "ix_contact_status_source"),
+    ),
+    (
+        "contacts of lead by date",
+        lambda db: DistributeRepository(db).get_list(
+            filter_params=FilterContact(lead_id=1, created_at_ge=DAY_AGO),
+            cursor=CursorParams(), sort=SortParams()
+        ),
+        ("ix_contact_lead_created_at",),
+    ),
+    (
+        "oldest queued contacts of source",
+        lambda db: DistributeRepository(db).get_queued_ids(1, 100),
+        ("ix_contact_source_status_created_at",),
+    ),
+    (
+        "queue size by source",
+        lambda db: DistributeRepository(db).count_by_source(StatusList.IN_QUEUE),
+        ("ix_contact_status_source",),
+    ),
+    (
+        "active contacts of operator before delete",
+        lambda db: OperatorRepository(db).has_active_contacts(1),
+        ("ix_contact_operator_status",),
+    ),
+    (
+        "active contacts of source before delete",
+        lambda db: SourceRepository(db).has_active_contacts(1),
+        ("ix_contact_source_status_created_at", "ix_contact_status_source"),
+    ),
+]
+
+
+# Runs the repository call and explains its SELECTs on contacts on the same database
+async def query_plans(
+    engine: AsyncEngine,
+    sessions: async_sessionmaker,
+    call: Callable[[AsyncSession], Awaitable[Any]],
+) -> List[str]:
+    captured: List[Tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith("SELECT") and "contacts" in statement:
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        async with sessions() as db:
+            await call(db)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    plans: List[str] = []
+    async with engine.connect() as conn:
+        for statement, parameters in captured:
+            rows = await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            plans.extend(row[-1] for row in rows)
+    return plans
+
+
+def uses_index(plans: List[str], indexes: Tuple[str, ...]) -> bool:
+    return any(index in line for line in plans for index in indexes)
+
+
+# Runs every check with the real repository code, tests/test_query_plans.py
+# runs the same checks on a small generated database
+async def explain(engine: AsyncEngine, sessions: async_sessionmaker) -> List[str]:
+    failures: List[str] = []
+
+    for name, call, indexes in CHECKS:
+        plans = await query_plans(engine, sessions, call)
+        ok = uses_index(plans, indexes)
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: expected {' or '.join(indexes)}")
+        for line in plans:
+            print(f"       {line}")
+        if not ok:
+            failures.append(name)
+
+    return failures
+
+
+async def main(args: argparse.Namespace) -> int:
+    engine = make_engine(args.database_url)
+    if engine.dialect.name != "sqlite":
+        await engine.dispose()
+        print("EXPLAIN QUERY PLAN checks support only SQLite")
+        return 2
+
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        if not args.skip_generate:
+            await prepare_database(engine, DatasetParams(
+                operators=args.operators,
+                sources=args.sources,
+                leads=args.leads,
+                contacts=args.contacts,
+            ))
+        # Planner picks indexes by statistics, like on a real database
+        async with engine.begin() as conn:
+            await conn.execute(text("ANALYZE"))
+
+        failures = await explain(engine, sessions)
+    finally:
+        await engine.dispose()
+
+    return 1 if failures else 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check that contact queries use their indexes")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///benchmark.db")
+    parser.add_argument("--operators", type=int, default=100)
+    parser.add_argument("--sources", type=int, default=20)
+    parser.add_argument("--leads", type=int, default=10_000)
+    parser.add_argument("--contacts", type=int, default=50_000)
+    parser.add_argument("--skip-generate", action="store_true", help="Use existing database as is")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
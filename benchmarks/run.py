@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from database import make_engine
+from models import Base, Contact
+from dependencies.custom_enum import StatusList
+from schemas.schema_base import CursorParams, SortParams
+from schemas.schema_contact import FilterContact
+
+from repositories.repo_operator import OperatorRepository
+from repositories.repo_source import SourceRepository
+from repositories.repo_lead import LeadRepository
+from repositories.repo_contact import DistributeRepository
+from repositories.lead_cache import lead_cache
+
+from services.service_contact import DistributeService
+from services.routing_index import routing_index
+
+from benchmarks.datagen import DatasetParams, generate_dataset
+
+
+def build_service(db: AsyncSession) -> DistributeService:
+    return DistributeService(
+        source_repository=SourceRepository(db),
+        operator_repository=OperatorRepository(db),
+        lead_repository=LeadRepository(db),
+        distribute_repository=DistributeRepository(db),
+    )
+
+
+def summarize(timings: List[float], wall_time: float) -> Dict[str, float]:
+    timings_ms = sorted(timing * 1000 for timing in timings)
+    percentiles = statistics.quantiles(timings_ms, n=100, method="inclusive")
+    return {
+        "count": len(timings_ms),
+        "mean_ms": round(statistics.fmean(timings_ms), 4),
+        "p50_ms": round(percentiles[49], 4),
+        "p95_ms": round(percentiles[94], 4),
+        "p99_ms": round(percentiles[98], 4),
+        "max_ms": round(timings_ms[-1], 4),
+        "ops_per_sec": round(len(timings_ms) / wall_time, 2) if wall_time else 0.0,
+    }
+
+
+async def measure(
+    iterations: int,
+    warmup: int,
+    operation: Callable[[int], Awaitable[Any]],
+) -> Dict[str, float]:
+    for number in range(warmup):
+        await operation(number)
+
+    timings: List[float] = []
+    started = time.perf_counter()
+    for number in range(warmup, warmup + iterations):
+        begin = time.perf_counter()
+        await operation(number)
+        timings.append(time.perf_counter() - begin)
+
+    return summarize(timings, time.perf_counter() - started)
+
+
+async def bench_select_best_operator(sessions, params: DatasetParams, args, rnd) -> Dict[str, float]:
+    async with sessions() as db:
+        service = build_service(db)
+
+        async def operation(number: int) -> None:
+            await service.select_best_operator(rnd.randint(1, params.sources))
+
+        return await measure(args.iterations * 10, args.warmup, operation)
+
+
+async def bench_distribute_lead(sessions, params: DatasetParams, args, rnd) -> Dict[str, float]:
+    # Repeat leads are most of the real traffic
+    async def operation(number: int) -> None:
+        if rnd.random() < args.repeat_ratio:
+            external_id = f"bench-{rnd.randint(1, params.leads)}"
+        else:
+            external_id = f"bench-new-{args.run_id}-{number}"
+
+        async with sessions() as db:
+            await build_service(db).distribute_lead({
+                "external_id": external_id,
+                "source_id": rnd.randint(1, params.sources),
+            })
+
+    return await measure(args.iterations, args.warmup, operation)
+
+
+async def bench_get_list_contacts(sessions, params: DatasetParams, args, rnd) -> Dict[str, float]:
+    sort = SortParams(order_by="created_at", order_type="desc")
+    cursors: List[str] = []
+
+    async def operation(number: int) -> None:
+        # First pages and next pages by cursor in turn
+        cursor = cursors.pop() if cursors and number % 2 else None
+        filter_params = FilterContact(status=rnd.choice(list(StatusList))) if number % 3 == 0 else None
+
+        async with sessions() as db:
+            response = await DistributeRepository(db).get_list(
+                filter_params=filter_params,
+                sort=sort,
+                cursor=CursorParams(cursor=cursor, limit=args.page_size),
+            )
+
+        if response.get("next_cursor") and filter_params is None:
+            cursors.append(response["next_cursor"])
+
+    return await measure(args.iterations, args.warmup, operation)
+
+
+async def bench_update_status(sessions, params: DatasetParams, args, rnd) -> Dict[str, float]:
+    async with sessions() as db:
+        contact_ids = list(await db.scalars(
+            select(Contact.id) \
+                .where(Contact.status == StatusList.NEW) \
+                .limit(args.iterations + args.warmup)
+        ))
+
+    if not contact_ids:
+        return {}
+
+    async def operation(number: int) -> None:
+        async with sessions() as db:
+            await build_service(db).update(
+                contact_ids[number % len(contact_ids)],
+                {"status": StatusList.DONE}
+            )
+
+    return await measure(min(args.iterations, len(contact_ids)), 0, operation)
+
+
+SCENARIOS = {
+    "select_best_operator": bench_select_best_operator,
+    "distribute_lead": bench_distribute_lead,
+    "get_list_contacts": bench_get_list_contacts,
+    "update_status": bench_update_status,
+}
+
+
+async def prepare_database(engine: AsyncEngine, params: DatasetParams) -> Dict[str, Any]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    started = time.perf_counter()
+    counts = await generate_dataset(engine, params)
+    counts["generate_seconds"] = round(time.perf_counter() - started, 2)
+    return counts
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    params = DatasetParams(
+        operators=args.operators,
+        sources=args.sources,
+        leads=args.leads,
+        contacts=args.contacts,
+        sources_per_operator=args.sources_per_operator,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+    )
+    engine = make_engine(args.database_url)
+    sessions = async_sessionmaker(
+        bind=engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+    try:
+        dataset = None
+        if not args.skip_generate:
+            dataset = await prepare_database(engine, params)
+
+        routing_index.clear()
+        lead_cache.clear()
+        rnd = random.Random(args.seed)
+
+        results: Dict[str, Any] = {}
+        for name in args.scenarios:
+            results[name] = await SCENARIOS[name](sessions, params, args, rnd)
+            print(f"{name}: {results[name]}")
+    finally:
+        await engine.dispose()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": engine.dialect.name,
+            "dataset": {**params._asdict(), **(dataset or {})},
+            "iterations": args.iterations,
+            "lead_cache": lead_cache.stats(),
+        },
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    defaults = DatasetParams()
+    parser = argparse.ArgumentParser(description="Benchmark of contact distribution")
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///benchmark.db")
+    parser.add_argument("--operators", type=int, default=defaults.operators)
+    parser.add_argument("--sources", type=int, default=defaults.sources)
+    parser.add_argument("--leads", type=int, default=defaults.leads)
+    parser.add_argument("--contacts", type=int, default=defaults.contacts)
+    parser.add_argument("--sources-per-operator", type=int, default=defaults.sources_per_operator)
+    parser.add_argument("--chunk-size", type=int, default=defaults.chunk_size)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--skip-generate", action="store_true", help="Reuse data of the previous run")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat-ratio", type=float, default=0.7, help="Share of requests with existing leads")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+    args.run_id = int(time.time())
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+    print(f"Results saved to {args.output}")
@@ -1,23 +1,72 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///mini_crm.db"
+import config
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    database_url = make_url(url)
+    options: Dict[str, Any] = {"echo": config.DATABASE_ECHO}
+    
+    if database_url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        
+        # In-memory database lives in a single connection (StaticPool)
+        if database_url.database in (None, "", ":memory:"):
+            return options
+    
+    options.update(
+        {
+            "pool_size": config.DATABASE_POOL_SIZE,
+            "max_overflow": config.DATABASE_MAX_OVERFLOW,
+            "pool_timeout": config.DATABASE_POOL_TIMEOUT,
+            "pool_recycle": config.DATABASE_POOL_RECYCLE,
+            "pool_pre_ping": config.DATABASE_POOL_PRE_PING,
+        }
+    )
+    return options
+
+
+def make_engine(url: str) -> AsyncEngine:
+    new_engine = create_async_engine(url, **_engine_options(url))
+    
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    
+    return new_engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA foreign_keys={'ON' if config.SQLITE_FOREIGN_KEYS else 'OFF'}")
+    cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    echo=False, 
-    connect_args={"check_same_thread": False},
-    execution_options={"foreign_keys": True}
+# expire_on_commit=False: expired attributes can't be lazy loaded in async mode
+SessionLocal = async_sessionmaker(
+    bind=engine, 
+    class_=AsyncSession, 
+    autoflush=False, 
+    expire_on_commit=False
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
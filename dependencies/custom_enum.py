@@ -4,4 +4,10 @@ class StatusList(str, Enum):
     IN_QUEUE = "in_queue"
     NEW = "new"
     IN_PROGRESS = "in_progress"
-    DONE = "done"
\ No newline at end of file
+    DONE = "done"
+
+# Names of relationship sets loaded together with object, 
+# see repositories/loader_profiles.py
+class LoaderProfile(str, Enum):
+    OPERATOR_WITH_PRIORITIES = "operator_with_priorities"
+    LEAD_WITH_SOURCES = "lead_with_sources"
\ No newline at end of file
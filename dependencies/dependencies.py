@@ -1,11 +1,13 @@
-from typing import Optional
+from typing import Optional, Literal
 from dependencies.custom_enum import StatusList
 from datetime import datetime
 
-from sqlalchemy.orm import Session 
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, Query
 from database import get_db
 from schemas.schema_contact import FilterContact
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
+from schemas.schema_stats import FilterStats
 
 
 from repositories.repo_priorities import PriorityRepository
@@ -13,27 +15,49 @@ from repositories.repo_operator import OperatorRepository
 from repositories.repo_source import SourceRepository
 from repositories.repo_lead import LeadRepository
 from repositories.repo_contact import DistributeRepository
+from repositories.repo_stats import StatsRepository
+from repositories.repo_idempotency import IdempotencyRepository
 
 from services.service_operator import OperatorService
 from services.service_priority import PriorityService
 from services.service_source import SourceService
 from services.service_lead import LeadService
 from services.service_contact import DistributeService
+from services.service_stats import StatsService
+from services.lead_import import LeadImporter, import_executor
+from services.idempotency import IdempotencyStore
 
 
-def get_service_operator(db: Session = Depends(get_db)) -> OperatorService:
+async def get_service_operator(db: AsyncSession = Depends(get_db)) -> OperatorService:
     repository = OperatorRepository(db)
     return OperatorService(repository)
 
-def get_service_source(db: Session = Depends(get_db)) -> SourceService:
+async def get_service_source(db: AsyncSession = Depends(get_db)) -> SourceService:
     repository = SourceRepository(db)
     return SourceService(repository)
 
-def get_service_lead(db: Session = Depends(get_db)) -> LeadService:
-    repository = LeadRepository(db)
-    return LeadService(repository)
+async def get_service_lead(db: AsyncSession = Depends(get_db)) -> LeadService:
+    return LeadService(
+        lead_repository=LeadRepository(db),
+        operator_repository=OperatorRepository(db),
+        distribute_repository=DistributeRepository(db)
+    )
+
+async def get_service_stats(db: AsyncSession = Depends(get_db)) -> StatsService:
+    repository = StatsRepository(db)
+    return StatsService(repository)
+
+async def get_lead_importer(db: AsyncSession = Depends(get_db)) -> LeadImporter:
+    return LeadImporter(
+        lead_repository=LeadRepository(db),
+        source_repository=SourceRepository(db),
+        executor=import_executor.get()
+    )
+
+async def get_idempotency_store(db: AsyncSession = Depends(get_db)) -> IdempotencyStore:
+    return IdempotencyStore(IdempotencyRepository(db))
 
-def get_service_priority(db: Session = Depends(get_db)) -> PriorityService:
+async def get_service_priority(db: AsyncSession = Depends(get_db)) -> PriorityService:
     repo_op = OperatorRepository(db)
     repo_src = SourceRepository(db)
     repo_priority = PriorityRepository(db)
@@ -44,7 +68,7 @@ def get_service_priority(db: Session = Depends(get_db)) -> PriorityService:
         repo_source=repo_src
     )
 
-def get_service_distribute(db: Session = Depends(get_db)) -> DistributeService:
+async def get_service_distribute(db: AsyncSession = Depends(get_db)) -> DistributeService:
     repo_op = OperatorRepository(db)
     repo_src = SourceRepository(db)
     repo_lead = LeadRepository(db)
@@ -71,4 +95,51 @@ def get_filter_params_contact(
         created_at_le=created_at_le,
         updated_at_ge=updated_at_ge,
         updated_at_le=updated_at_le
-    )
\ No newline at end of file
+    )
+
+def get_cursor_params(
+    cursor: Optional[str] = Query(None, description="Cursor from next_cursor of the previous page"),
+    limit: int = Query(50, ge=1, le=500, description="Page size"),
+    with_count: bool = Query(False, description="Also return total_count"),
+):
+    return CursorParams(
+        cursor=cursor,
+        limit=limit,
+        with_count=with_count
+    )
+
+# Offset pagination when page is given, page size is the limit of the cursor
+def get_pagination_params(
+    page: Optional[int] = Query(None, ge=1, description="Page number, offset pagination instead of cursor"),
+    cursor: CursorParams = Depends(get_cursor_params),
+) -> Optional[PaginationParams]:
+    if page is None:
+        return None
+    return PaginationParams(
+        page=page,
+        limit=cursor.limit
+    )
+
+def get_sort_params(
+    order_by: str = Query('id', description="Sort by field"),
+    order_type: Literal['asc', 'desc'] = Query('asc', description="Sort direction"),
+):
+    return SortParams(
+        order_by=order_by,
+        order_type=order_type
+    )
+
+def get_filter_params_stats(
+    created_at_ge: Optional[datetime] = Query(None, description="Contacts created from:", alias="created_from"),
+    created_at_le: Optional[datetime] = Query(None, description="Contacts created to:", alias="created_to"),
+    operator_id: Optional[int] = Query(None, description="Filter by operator"),
+    source_id: Optional[int] = Query(None, description="Filter by source"),
+    status: Optional[StatusList] = Query(None, description="Filter by status"),
+):
+    return FilterStats(
+        created_at_ge=created_at_ge,
+        created_at_le=created_at_le,
+        operator_id=operator_id,
+        source_id=source_id,
+        status=status
+    )
@@ -11,6 +11,7 @@ class DictResponseList(TypedDict, Generic[ModelType], total=False):
     limit: Optional[int]
     order_by: Optional[str]
     order_type: Optional[str]
+    next_cursor: Optional[str]
     
 class DictBaseCreateModelObject(TypedDict, total=False):
     pass
@@ -18,6 +18,13 @@ class ForbiddenDeleteException(RepositoryException):
             detail=detail
         )
 
+class InvalidCursorException(RepositoryException):
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=400, 
+            detail=detail
+        )
+
 class FailedUpdateException(RepositoryException):
     def __init__(self, detail: str):
         super().__init__(
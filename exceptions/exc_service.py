@@ -38,4 +38,18 @@ class UnexpectedException(ServiceException):
         super().__init__(
             status_code=status_code, 
             detail=detail
-        )
\ No newline at end of file
+        )
+
+class IdempotencyConflictException(ServiceException):
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=409, 
+            detail=detail
+        )
+
+class IdempotencyKeyReusedException(ServiceException):
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=422, 
+            detail=detail
+        )
@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from database import SessionLocal
+
+from repositories.repo_lead import LeadRepository
+from repositories.repo_source import SourceRepository
+from services.lead_import import LeadImporter, iter_records
+
+
+async def read_file(path: str, block_size: int = 1 << 20):
+    loop = asyncio.get_running_loop()
+    with open(path, "rb") as file:
+        while block := await loop.run_in_executor(None, file.read, block_size):
+            yield block
+
+
+def print_progress(report):
+    print(
+        f"\rprocessed: {report['processed']}, imported: {report['imported']}, "
+        f"linked: {report['linked']}, failed: {report['failed']}",
+        end="", flush=True
+    )
+
+
+async def main(args):
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        async with SessionLocal() as db:
+            importer = LeadImporter(
+                lead_repository=LeadRepository(db),
+                source_repository=SourceRepository(db),
+                executor=executor,
+                chunk_size=args.chunk_size,
+                max_pending=args.workers * 2,
+            )
+            report = await importer.run(iter_records(read_file(args.path), format), format, print_progress)
+
+    print()
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    if report["errors_truncated"]:
+        print("...")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import leads from NDJSON or CSV file")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "csv"], help="By file extension if not set")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=config.LEAD_IMPORT_CHUNK_SIZE)
+    asyncio.run(main(parser.parse_args()))
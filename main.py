@@ -1,18 +1,57 @@
+from contextlib import asynccontextmanager
+
 import fastapi
 
+import config
+from database import SessionLocal, engine
+from dependencies.dependencies import get_service_distribute
+
 from routers.api.operator import router as router_operator
 from routers.api.source import router as router_source
 from routers.api.contact import router as router_contact
 from routers.api.lead import router as router_lead
 from routers.api.priority import router as router_priority
+from routers.api.metrics import router as router_metrics
+from routers.api.stats import router as router_stats
+
+from monitoring.middleware import MetricsMiddleware
+from monitoring.sql_profiler import SQLProfilerMiddleware
+from services.response_cache import ResponseCacheMiddleware
+from services.queue_worker import queue_worker
+from services.state_sync import state_sync
+from services.lead_import import import_executor
+
+
+async def redistribute_queue(batch_size: int) -> int:
+    async with SessionLocal() as db:
+        service = await get_service_distribute(db)
+        return await service.redistribute_queued(batch_size)
+
+
+@asynccontextmanager
+async def lifespan(app: fastapi.FastAPI):
+    if config.QUEUE_WORKER_ENABLED:
+        queue_worker.start(redistribute_queue)
+    if config.STATE_SYNC_ENABLED:
+        state_sync.start(engine)
+    yield
+    await state_sync.stop()
+    await queue_worker.stop()
+    import_executor.shutdown()
+
 
-app = fastapi.FastAPI()
+app = fastapi.FastAPI(lifespan=lifespan)
+app.add_middleware(ResponseCacheMiddleware)
+app.add_middleware(SQLProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(router_operator)
 app.include_router(router_source)
 app.include_router(router_contact)
 app.include_router(router_lead)
 app.include_router(router_priority)
+app.include_router(router_stats)
+app.include_router(router_metrics)
 
 if __name__ == "__main__":
     import uvicorn
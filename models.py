@@ -6,7 +6,7 @@ from sqlalchemy.orm import MappedAsDataclass
 from sqlalchemy.orm import mapped_column, relationship, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql.elements import ColumnElement
-from sqlalchemy import String, ForeignKey, Enum, DateTime
+from sqlalchemy import String, ForeignKey, Enum, DateTime, JSON, LargeBinary
 from datetime import datetime, timezone
 from dependencies.custom_enum import StatusList
 
@@ -34,6 +34,11 @@ date_updated = Annotated[
     )
 ]
 
+# Shared by contacts and contact_activity_hourly, one type in PostgreSQL
+contact_status = Enum(StatusList, name="contact_status")
+
+# Relations with cascade use passive_deletes: children are removed by 
+# set-based DELETE statements of repositories, ORM doesn't load them to delete
 class Operator(Base):
     __tablename__ = "operators"
     id: Mapped[int] = mapped_column(primary_key=True, init=False)
@@ -44,16 +49,18 @@ class Operator(Base):
     priorities: Mapped[List["OperatorSourcePriority"]] = relationship(
         back_populates="operator",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="OperatorSourcePriority.weight",
-        lazy="selectin",
+        lazy="raise",
         doc="Приоритеты оператора",
         default_factory=list,
     )
     contacts: Mapped[List["Contact"]] = relationship(
         back_populates="operator",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="Contact.created_at",
-        lazy="selectin",
+        lazy="raise",
         doc="Контакты назначенные оператору",
         default_factory=list
     )
@@ -80,30 +87,6 @@ class Operator(Base):
     def deactivate(self):
         self.active = False
     
-    def can_delete(self) -> bool:
-        active_statuses = (StatusList.IN_PROGRESS, StatusList.NEW)
-        has_active_contact = any(
-            contact.status in active_statuses 
-            for contact in self.contacts
-        )
-        return not has_active_contact
-    
-    def get_priority_source(self, source_id: int) -> Optional[int]:
-        return next(
-            (
-                priority.weight 
-                for priority in self.priorities 
-                if priority.source_id == source_id
-            ), 
-            None
-        )
-    
-    def increment_current_loading(self):
-        self.current_loading += 1
-    
-    def decrement_current_loading(self):
-        self.current_loading -= 1
-    
     @validates("max_loading")
     def validate_max_loading(self, key, max_loading):
         if max_loading <= 0:
@@ -142,16 +125,18 @@ class Lead(Base):
     contacts: Mapped[List["Contact"]] = relationship(
         back_populates="lead",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="Contact.created_at",
-        lazy="selectin",
+        lazy="raise",
         doc="Контакты связанные с лидом",
         default_factory=list,
     )
     sources: Mapped[List["Source"]] = relationship(
         back_populates="leads",
         secondary="leads_sources",
+        passive_deletes=True,
         order_by="LeadsSources.created_at",
-        lazy="selectin",
+        lazy="raise",
         doc="Источники связанные с лидом",
         default_factory=list,
     )
@@ -167,36 +152,31 @@ class Source(Base):
     contacts: Mapped[List["Contact"]] = relationship(
         back_populates="source",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="Contact.created_at",
-        lazy="selectin",
+        lazy="raise",
         doc="Контакты связанные с источником",
         default_factory=list
     )
     leads: Mapped[List["Lead"]] = relationship(
         back_populates="sources",
         secondary="leads_sources",
+        passive_deletes=True,
         order_by="LeadsSources.created_at",
-        lazy="selectin",
+        lazy="raise",
         doc="Лиды связанные с источником",
         default_factory=list
     )
     priorities: Mapped[List["OperatorSourcePriority"]] = relationship(
         back_populates="source",
         cascade="all, delete-orphan",
+        passive_deletes=True,
         order_by="OperatorSourcePriority.weight",
-        lazy="selectin",
+        lazy="raise",
         doc="Приоритеты источника",
         default_factory=list
     )
     
-    def can_delete(self) -> bool:
-        active_statuses = (StatusList.IN_PROGRESS, StatusList.NEW)
-        has_active_contact = any(
-            contact.status in active_statuses 
-            for contact in self.contacts
-        )
-        return not has_active_contact
-    
     def __repr__(self):
         return f"Source(id={self.id}, name='{self.name}')"
 
@@ -236,8 +216,8 @@ class OperatorSourcePriority(Base):
         ) 
     )
     weight: Mapped[int]
-    operator: Mapped["Operator"] = relationship(back_populates="priorities", init=False)
-    source: Mapped["Source"] = relationship(back_populates="priorities", init=False)
+    operator: Mapped["Operator"] = relationship(back_populates="priorities", lazy="raise", init=False)
+    source: Mapped["Source"] = relationship(back_populates="priorities", lazy="raise", init=False)
     created_at: Mapped[date_created] =  mapped_column(init=False)
     updated_at: Mapped[date_updated] =  mapped_column(init=False)
     
@@ -262,7 +242,9 @@ class Contact(Base):
             "operators.id",
             name="fk_contacts_operator_id"
         ),  
-        nullable=True
+        nullable=True,
+        default=None,
+        kw_only=True
     )
     source_id: Mapped[int] = mapped_column(
         ForeignKey(
@@ -276,23 +258,87 @@ class Contact(Base):
             name="fk_contacts_lead_id"
         ) 
     )
-    lead: Mapped["Lead"] = relationship(back_populates="contacts", init=False)
-    operator: Mapped[Optional["Operator"]] = relationship(back_populates="contacts", init=False)
-    source: Mapped["Source"] = relationship(back_populates="contacts", init=False)
+    lead: Mapped["Lead"] = relationship(back_populates="contacts", lazy="raise", init=False)
+    operator: Mapped[Optional["Operator"]] = relationship(back_populates="contacts", lazy="raise", init=False)
+    source: Mapped["Source"] = relationship(back_populates="contacts", lazy="raise", init=False)
     created_at: Mapped[date_created] = mapped_column(init=False)
     updated_at: Mapped[date_updated] = mapped_column(init=False)
     status: Mapped[StatusList] = mapped_column(
-        Enum(StatusList, name="contact_status"),
+        contact_status,
         default=StatusList.IN_QUEUE,
         doc="Статус контакта"
     )
     
+    # Matched to the queries: contacts of operator by status (and active
+    # contacts check before delete), of source by status and creation date
+    # (also the oldest queued contacts), of lead by date, queue size by source
     __table_args__ = (
-        Index("ix_contact_operator_id", "operator_id"),
-        Index("ix_contact_created_at", "created_at"),
-        Index("ix_contact_status", "status")
+        Index("ix_contact_operator_status", "operator_id", "status"),
+        Index("ix_contact_source_status_created_at", "source_id", "status", "created_at"),
+        Index("ix_contact_lead_created_at", "lead_id", "created_at"),
+        Index("ix_contact_status_source", "status", "source_id"),
+        Index("ix_contact_created_at", "created_at")
     )
     
     def __repr__(self):
         return f"Contact(id={self.id}, operator_id='{self.operator_id}', source_id='{self.source_id}', " \
-               f"lead_id='{self.lead_id}', status='{self.status}', created_at='{self.created_at}')"
\ No newline at end of file
+               f"lead_id='{self.lead_id}', status='{self.status}', created_at='{self.created_at}')"
+
+
+class ContactActivityHourly(Base):
+    # Count of contacts by hour of creation, source, operator and current status.
+    # Kept in sync on flush, see repositories/contact_rollup.py
+    __tablename__ = "contact_activity_hourly"
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    source_id: Mapped[int] = mapped_column(primary_key=True)
+    # 0 - contact without operator
+    operator_id: Mapped[int] = mapped_column(primary_key=True)
+    status: Mapped[StatusList] = mapped_column(contact_status, primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+    
+    def __repr__(self):
+        return f"ContactActivityHourly(hour='{self.hour}', source_id='{self.source_id}', " \
+               f"operator_id='{self.operator_id}', status='{self.status}', count={self.count})"
+
+
+class StateVersion(Base):
+    # One counter for all rows of state_changes, bumped once per transaction
+    __tablename__ = "state_version"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
+
+
+class StateChange(Base):
+    # Version of the last committed change of an operator, source or priorities 
+    # of an operator. Workers read rows above the version they have seen and 
+    # refresh only these entries, see services/state_sync.py
+    __tablename__ = "state_changes"
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    entity_id: Mapped[int] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
+    
+    __table_args__ = (
+        Index("ix_state_change_version", "version"),
+    )
+    
+    def __repr__(self):
+        return f"StateChange(table_name='{self.table_name}', entity_id={self.entity_id}, version={self.version})"
+
+
+class IdempotencyKey(Base):
+    # Request with Idempotency-Key, unique per endpoint across all workers.
+    # response is NULL while the first request is in progress
+    __tablename__ = "idempotency_keys"
+    scope: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    fingerprint: Mapped[bytes] = mapped_column(LargeBinary(32))
+    # Unix time, the key is free again after it
+    expires_at: Mapped[float] = mapped_column()
+    response: Mapped[Optional[dict]] = mapped_column(JSON(none_as_null=True), default=None)
+    
+    __table_args__ = (
+        Index("ix_idempotency_key_expires_at", "expires_at"),
+    )
+    
+    def __repr__(self):
+        return f"IdempotencyKey(scope='{self.scope}', key='{self.key}', expires_at={self.expires_at})"
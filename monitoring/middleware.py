@@ -0,0 +1,65 @@
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from monitoring.metrics import (
+    http_requests_total,
+    http_request_duration_seconds,
+    http_requests_in_progress,
+)
+
+
+# Plain ASGI middleware: no request/response wrappers, one dict lookup
+# per metric. Routes are labeled by template (/contacts/{id}), not raw path
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = _route_template(scope)
+            http_requests_in_progress.dec(method)
+            http_request_duration_seconds.observe(method, route, value=time.perf_counter() - started)
+            http_requests_total.inc(method, route, str(status_code))
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+
+    # Older Starlette doesn't put the route into scope
+    app = scope.get("app")
+    return _match_route(getattr(getattr(app, "router", None), "routes", ()), scope)
+
+
+def _match_route(routes, scope: Scope) -> str:
+    for candidate in routes:
+        match, _ = candidate.matches(scope)
+        if match != Match.FULL:
+            continue
+        if hasattr(candidate, "path"):
+            return candidate.path
+        # Newer FastAPI wraps included routers, their routes have full paths
+        router = getattr(candidate, "original_router", candidate)
+        return _match_route(getattr(router, "routes", ()), scope)
+
+    return "unmatched"
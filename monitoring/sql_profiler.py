@@ -0,0 +1,119 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from models import Base
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    __slots__ = ("count", "db_time", "rows", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.db_time = 0.0
+        # Affected rows of DML plus ORM objects loaded by SELECT
+        self.rows = 0
+        self.statements: Counter[str] = Counter()
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+# Stats of the current request, None outside of requests
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("sql_query_stats", default=None)
+
+_START_KEY = "sql_profiler_start"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current_stats.get() is not None:
+        conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current_stats.get()
+    starts = conn.info.get(_START_KEY)
+    if stats is None or not starts:
+        return
+
+    stats.db_time += time.perf_counter() - starts.pop()
+    stats.count += 1
+    # Batched inserts (executemany, insertmanyvalues) may run once per row,
+    # that's one statement of the caller, not N+1
+    if not executemany:
+        stats.statements[statement] += 1
+    if cursor.rowcount and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+@event.listens_for(Base, "load", propagate=True)
+def _count_loaded(target, context) -> None:
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+# Counts statements, database time and rows of every HTTP request.
+# Requests above thresholds and repeated statements (N+1) are logged
+class SQLProfilerMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not config.SQL_PROFILE_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and config.SQL_PROFILE_HEADERS:
+                headers = list(message.get("headers", []))
+                headers.extend([
+                    (b"x-sql-queries", str(stats.count).encode()),
+                    (b"x-sql-time-ms", f"{stats.db_time * 1000:.2f}".encode()),
+                    (b"x-sql-rows", str(stats.rows).encode()),
+                ])
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_stats.reset(token)
+            _report(scope, stats)
+
+
+def _report(scope: Scope, stats: QueryStats) -> None:
+    request = f"{scope['method']} {scope['path']}"
+
+    if (
+        stats.count > config.SQL_PROFILE_MAX_QUERIES
+        or stats.db_time * 1000 > config.SQL_PROFILE_SLOW_MS
+    ):
+        logger.warning(
+            "%s: %d SQL statements, %.1f ms in database, %d rows",
+            request, stats.count, stats.db_time * 1000, stats.rows
+        )
+
+    for statement, count in stats.repeated(config.SQL_PROFILE_REPEAT_THRESHOLD):
+        logger.warning(
+            "%s: possible N+1, statement executed %d times: %s",
+            request, count, " ".join(statement.split())[:300]
+        )
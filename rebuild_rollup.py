@@ -0,0 +1,21 @@
+import argparse
+import asyncio
+from datetime import datetime
+
+from database import SessionLocal
+from repositories.repo_stats import StatsRepository
+
+
+async def main(args):
+    async with SessionLocal() as db:
+        rows = await StatsRepository(db).rebuild_rollup(args.created_from, args.created_to)
+    print(f"Rollup rebuilt, rows: {rows}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recount contact_activity_hourly from contacts, whole table if no window is set"
+    )
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat)
+    asyncio.run(main(parser.parse_args()))
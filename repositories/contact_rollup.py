@@ -0,0 +1,143 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from models import Contact, ContactActivityHourly
+from dependencies.custom_enum import StatusList
+from repositories.repo_base import get_upsert_insert
+
+HOUR = timedelta(hours=1)
+
+# (hour, source_id, operator_id or 0, status)
+RollupKey = Tuple[datetime, int, int, StatusList]
+
+
+def as_utc(value: datetime) -> datetime:
+    # Naive values come from SQLite and are UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def floor_hour(value: datetime) -> datetime:
+    return as_utc(value).replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value: datetime) -> datetime:
+    hour = floor_hour(value)
+    return hour if hour == as_utc(value) else hour + HOUR
+
+
+# Same truncation in SQL for the rebuild. SQLite keeps DateTime as text,
+# the format must match how SQLAlchemy writes hour on insert.
+# PostgreSQL truncates timestamptz in the TimeZone of the session:
+# the UTC wall time is truncated and turned back into timestamptz
+def hour_bucket(column: ColumnElement, dialect: str) -> ColumnElement:
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+    return func.timezone("UTC", func.date_trunc("hour", func.timezone("UTC", column)))
+
+
+def _key(
+    created_at: datetime,
+    source_id: int,
+    operator_id: Optional[int],
+    status: StatusList,
+) -> RollupKey:
+    return (floor_hour(created_at), source_id, operator_id or 0, status)
+
+
+def _old_value(contact: Contact, name: str):
+    history = inspect(contact).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(contact, name)
+
+
+def _old_key(contact: Contact) -> RollupKey:
+    return _key(
+        contact.created_at,
+        _old_value(contact, "source_id"),
+        _old_value(contact, "operator_id"),
+        _old_value(contact, "status"),
+    )
+
+
+# Contacts created, changed and deleted through the ORM move their counts
+# between rollup rows in the same transaction, right after flush.
+# Bulk statements on contacts must keep the rollup themselves
+@event.listens_for(Session, "after_flush")
+def _update_rollup(session: Session, flush_context) -> None:
+    deltas: Counter[RollupKey] = Counter()
+
+    for object in session.new:
+        if isinstance(object, Contact):
+            deltas[_key(object.created_at, object.source_id, object.operator_id, object.status)] += 1
+
+    for object in session.dirty:
+        if not isinstance(object, Contact) or not session.is_modified(object):
+            continue
+        old = _old_key(object)
+        new = _key(object.created_at, object.source_id, object.operator_id, object.status)
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+
+    # Changed before the delete in the same flush: counted under the old values
+    for object in session.deleted:
+        if isinstance(object, Contact):
+            deltas[_old_key(object)] -= 1
+
+    apply_rollup_deltas(session, deltas)
+
+
+def apply_rollup_deltas(session: Session, deltas: Counter) -> None:
+    rows = [
+        {
+            "hour": hour,
+            "source_id": source_id,
+            "operator_id": operator_id,
+            "status": status,
+            "count": count,
+        }
+        for (hour, source_id, operator_id, status), count in deltas.items()
+        if count
+    ]
+    if not rows:
+        return
+
+    connection = session.connection()
+    insert = get_upsert_insert(connection.dialect.name)
+    table = ContactActivityHourly.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={"count": table.c.count + statement.excluded["count"]}
+    )
+    connection.execute(statement, rows)
+
+
+# Set-based delete of contacts bypasses flush: counts of the contacts
+# matching criteria are taken off the rollup by one grouped SELECT
+def remove_from_rollup(session: Session, *criteria: ColumnElement[bool]) -> None:
+    connection = session.connection()
+    hour = hour_bucket(Contact.created_at, connection.dialect.name)
+    columns = (hour, Contact.source_id, Contact.operator_id, Contact.status)
+    rows = connection.execute(
+        select(*columns, func.count()) \
+            .where(*criteria) \
+            .group_by(*columns)
+    )
+
+    deltas: Counter[RollupKey] = Counter()
+    for created_hour, source_id, operator_id, status, count in rows:
+        # SQLite returns the bucket as text
+        if isinstance(created_hour, str):
+            created_hour = datetime.fromisoformat(created_hour)
+        deltas[_key(created_hour, source_id, operator_id, status)] -= count
+
+    apply_rollup_deltas(session, deltas)
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Contact, Lead
+from repositories.session_changes import SessionChanges
+
+
+# Process-local LRU map lead_id -> operator of the last assigned contact.
+# Warmed once from contacts, then kept by committed assignments.
+# Leads evicted or never seen simply have no affinity
+class LeadAffinity:
+    def __init__(self, max_size: int = config.LEAD_AFFINITY_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._operators: OrderedDict[int, int] = OrderedDict()
+        self._loaded = False
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    # Rows are oldest first and go in front of entries already in the map:
+    # assignments committed after the rows were read are newer, they are kept
+    def load(self, rows: Iterable[Tuple[int, int]]) -> None:
+        with self._lock:
+            for lead_id, operator_id in reversed(list(rows)):
+                if lead_id not in self._operators:
+                    self._operators[lead_id] = operator_id
+                    self._operators.move_to_end(lead_id, last=False)
+            self._evict()
+            self._loaded = True
+
+    def get(self, lead_id: int) -> Optional[int]:
+        with self._lock:
+            operator_id = self._operators.get(lead_id)
+            if operator_id is None:
+                self.misses += 1
+                return None
+            self._operators.move_to_end(lead_id)
+            self.hits += 1
+            return operator_id
+
+    def set_many(self, operators: Dict[int, int]) -> None:
+        with self._lock:
+            for lead_id, operator_id in operators.items():
+                self._operators[lead_id] = operator_id
+                self._operators.move_to_end(lead_id)
+            self._evict()
+
+    def invalidate(self, lead_ids: Iterable[int]) -> None:
+        with self._lock:
+            for lead_id in lead_ids:
+                self._operators.pop(lead_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._operators.clear()
+            self._loaded = False
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._operators), "hits": self.hits, "misses": self.misses}
+
+    def _evict(self) -> None:
+        while len(self._operators) > self.max_size:
+            self._operators.popitem(last=False)
+
+
+lead_affinity = LeadAffinity()
+
+
+# Assignments are applied only after commit, (lead id, operator id or None)
+_assignments: SessionChanges[List[Tuple[int, Optional[int]]]] = SessionChanges("lead_affinity_changes", list)
+
+
+# Bulk UPDATE of contacts bypasses flush, its assignments are staged explicitly
+def stage_assignments(session: Union[Session, AsyncSession], assignments: Dict[int, int]) -> None:
+    _assignments.of(session).extend(assignments.items())
+
+
+@_assignments.collector
+def _collect_assignments(session: Session, changes: List[Tuple[int, Optional[int]]]) -> None:
+    if not config.LEAD_AFFINITY_ENABLED:
+        return
+
+    for object in session.new:
+        if isinstance(object, Contact) and object.operator_id is not None:
+            changes.append((object.lead_id, object.operator_id))
+
+    for object in session.dirty:
+        if isinstance(object, Contact) and object.operator_id is not None:
+            if inspect(object).attrs.operator_id.history.added:
+                changes.append((object.lead_id, object.operator_id))
+
+    for object in session.deleted:
+        if isinstance(object, Lead):
+            changes.append((object.id, None))
+
+
+@_assignments.applier
+def _apply_assignments(session: Session, changes: List[Tuple[int, Optional[int]]]) -> None:
+    for lead_id, operator_id in changes:
+        if operator_id is None:
+            lead_affinity.invalidate([lead_id])
+        else:
+            lead_affinity.set_many({lead_id: operator_id})
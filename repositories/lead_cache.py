@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Lead
+from repositories.session_changes import SessionChanges
+
+
+# Marker of a cached miss: lead with this external_id does not exist
+MISSING = -1
+
+
+# Process-local LRU cache external_id -> lead_id with TTL.
+# Misses are cached too, with a shorter TTL, because the lead
+# may be created by another worker process
+class LeadCache:
+    def __init__(
+        self,
+        max_size: int = config.LEAD_CACHE_SIZE,
+        ttl: float = config.LEAD_CACHE_TTL,
+        negative_ttl: float = config.LEAD_CACHE_NEGATIVE_TTL,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, Tuple[int, float]] = OrderedDict()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # None - unknown, MISSING - known to be absent, otherwise lead id
+    def get(self, external_id: str) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(external_id)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[external_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(external_id)
+            if entry[0] == MISSING:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[0]
+
+    def set(self, external_id: str, lead_id: int) -> None:
+        if self.max_size <= 0:
+            return
+        ttl = self.negative_ttl if lead_id == MISSING else self.ttl
+        with self._lock:
+            self._entries[external_id] = (lead_id, time.monotonic() + ttl)
+            self._entries.move_to_end(external_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_many(self, lead_ids: Dict[str, int]) -> None:
+        for external_id, lead_id in lead_ids.items():
+            self.set(external_id, lead_id)
+
+    def invalidate(self, external_ids: Iterable[str]) -> None:
+        with self._lock:
+            for external_id in external_ids:
+                self._entries.pop(external_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.negative_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+lead_cache = LeadCache()
+
+
+# Created and deleted leads are applied to the cache only after commit:
+# (external_id, lead id or None for a removed one)
+_lead_changes: SessionChanges[List[Tuple[str, Optional[int]]]] = SessionChanges("lead_cache_changes", list)
+
+
+# Core INSERT of leads bypasses flush, created leads are staged explicitly
+def stage_leads(session: Union[Session, AsyncSession], lead_ids: Dict[str, int]) -> None:
+    _lead_changes.of(session).extend(lead_ids.items())
+
+
+@_lead_changes.collector
+def _collect_lead_changes(session: Session, changes: List[Tuple[str, Optional[int]]]) -> None:
+    for object in session.new:
+        if isinstance(object, Lead):
+            changes.append((object.external_id, object.id))
+
+    for object in session.dirty:
+        if isinstance(object, Lead):
+            history = inspect(object).attrs.external_id.history
+            changes.extend((external_id, None) for external_id in history.deleted or ())
+            changes.extend((external_id, object.id) for external_id in history.added or ())
+
+    for object in session.deleted:
+        if isinstance(object, Lead):
+            changes.append((object.external_id, None))
+
+
+@_lead_changes.applier
+def _apply_lead_changes(session: Session, changes: List[Tuple[str, Optional[int]]]) -> None:
+    for external_id, lead_id in changes:
+        if lead_id is None:
+            lead_cache.invalidate([external_id])
+        else:
+            lead_cache.set(external_id, lead_id)
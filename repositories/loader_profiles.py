@@ -0,0 +1,14 @@
+from typing import Dict, Tuple
+
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.interfaces import ORMOption
+
+from models import Operator, Lead
+from dependencies.custom_enum import LoaderProfile
+
+# All relationships in models are lazy="raise": 
+# object is loaded without relations unless query opts into a profile
+LOADER_PROFILES: Dict[LoaderProfile, Tuple[ORMOption, ...]] = {
+    LoaderProfile.OPERATOR_WITH_PRIORITIES: (selectinload(Operator.priorities),),
+    LoaderProfile.LEAD_WITH_SOURCES: (selectinload(Lead.sources),),
+}
@@ -1,16 +1,30 @@
-from typing import TypeVar, Generic, Type, Optional, Callable, Dict, Any, TYPE_CHECKING
+import asyncio
+import base64
+import functools
+import json
+import random
+from datetime import datetime
+from enum import Enum
+from typing import TypeVar, Generic, Type, Optional, Dict, Any, List, Set, Tuple, Iterable, Callable, Awaitable, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from schemas.schema_base import SortParams, PaginationParams
+    from schemas.schema_base import SortParams, PaginationParams, CursorParams
     from pydantic import BaseModel
-    from sqlalchemy.orm import Session
-    from sqlalchemy.orm.query import Query
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.sql import ColumnElement, Select
     from dependencies.typed_dict import DictResponseList
 
+import config
 from models import Base
+from dependencies.custom_enum import LoaderProfile
+from repositories.loader_profiles import LOADER_PROFILES
         
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import select, func, tuple_, literal, and_, or_
+from sqlalchemy.exc import SQLAlchemyError, OperationalError
+from sqlalchemy.dialects import postgresql, sqlite
+from exceptions.exc_base import RepositoryException
 from exceptions.exc_base import NotFoundException
+from exceptions.exc_base import InvalidCursorException
 from exceptions.exc_base import FailedUpdateException
 from exceptions.exc_base import DatabaseException
 from exceptions.exc_base import UnexpectedException
@@ -20,22 +34,113 @@ from exceptions.exc_base import UnexpectedException
 ModelType = TypeVar("ModelType", bound=Base)
 RelatedType = TypeVar("RelatedType", bound=Base)
 
+# Depth of open services.unit_of_work.UnitOfWork blocks in session.info
+UNIT_OF_WORK_KEY = "unit_of_work_depth"
+
+# INSERT ... ON CONFLICT of dialects supporting it
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+def get_upsert_insert(dialect: str):
+    if dialect not in UPSERT_INSERTS:
+        raise DatabaseException(
+            status_code=500,
+            detail=f"Database Error\n"
+                   f"Upsert is not supported for {dialect}"
+        )
+    return UPSERT_INSERTS[dialect]
+
+LOCK_ERROR_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "deadlock detected",
+    "could not obtain lock",
+)
+
+def is_lock_error(error: SQLAlchemyError) -> bool:
+    message = str(getattr(error, "orig", error)).lower()
+    return isinstance(error, OperationalError) and any(
+        lock_message in message for lock_message in LOCK_ERROR_MESSAGES
+    )
+
+# Repositories and services wrap database errors, the cause is down the chain
+def caused_by(error: BaseException, matches: Callable[[BaseException], bool]) -> bool:
+    seen: Set[int] = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if matches(error):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+def caused_by_lock_error(error: BaseException) -> bool:
+    return caused_by(error, lambda cause: isinstance(cause, SQLAlchemyError) and is_lock_error(cause))
+
+
+# Runs the whole method again on "database is locked": after rollback the
+# next attempt reads fresh state instead of replaying old changes. Only the
+# outermost transaction is retried, nested calls inside a unit of work 
+# leave it to the method that opened it. ORM objects passed as arguments
+# are refreshed, rollback expired them
+def retry_on_lock(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        db: AsyncSession = self.db if hasattr(self, "db") else self.uow.db
+        attempt = 0
+        
+        while True:
+            try:
+                return await method(self, *args, **kwargs)
+            
+            except Exception as e:
+                if (
+                    db.info.get(UNIT_OF_WORK_KEY, 0) > 0
+                    or not caused_by_lock_error(e)
+                    or attempt >= config.DATABASE_LOCK_RETRIES
+                ):
+                    raise
+            
+            await db.rollback()
+            attempt += 1
+            delay = config.DATABASE_LOCK_RETRY_DELAY * 2 ** (attempt - 1)
+            await asyncio.sleep(random.uniform(0, delay))
+            
+            for argument in (*args, *kwargs.values()):
+                if isinstance(argument, Base) and argument in db:
+                    await db.refresh(argument)
+    
+    return wrapper
+
+
 class BaseRepository(Generic[ModelType]):
-    def __init__(self, model: Type[ModelType], db: Session):
+    def __init__(self, model: Type[ModelType], db: AsyncSession):
         self.model = model
         self.db = db
     
+    @property
+    def in_unit_of_work(self) -> bool:
+        return self.db.info.get(UNIT_OF_WORK_KEY, 0) > 0
+    
     def _apply_sort(
         self, 
         sort: SortParams, 
-        query: Query[RelatedType], 
+        query: Select[tuple[RelatedType]], 
         response: DictResponseList[RelatedType]
-    ) -> Query[RelatedType]:
+    ) -> Select[tuple[RelatedType]]:
         if hasattr(self.model, sort.order_by):
             column = getattr(self.model, sort.order_by)
-            query = query.order_by(
-                column.asc() if sort.order_type == 'asc' else column.desc()
-            )
+            order = column.asc() if sort.order_type == 'asc' else column.desc()
+            # Same order as the cursor pages: NULLs last, ties by id
+            if sort.order_by in self.model.__table__.columns and sort.order_by != 'id':
+                if self.model.__table__.columns[sort.order_by].nullable:
+                    order = order.nulls_last()
+                id_column = self.model.id # type: ignore
+                order = (order, id_column.asc() if sort.order_type == 'asc' else id_column.desc())
+            else:
+                order = (order,)
+            query = query.order_by(*order)
             
             response.update(
                 {
@@ -49,9 +154,9 @@ class BaseRepository(Generic[ModelType]):
     def _apply_pagination(
         self, 
         pagination: PaginationParams, 
-        query: Query[RelatedType], 
+        query: Select[tuple[RelatedType]], 
         response: DictResponseList[RelatedType]
-    ) -> Query[RelatedType]:
+    ) -> Select[tuple[RelatedType]]:
         query = query \
             .offset((pagination.page - 1) * pagination.limit) \
             .limit(pagination.limit)
@@ -65,11 +170,150 @@ class BaseRepository(Generic[ModelType]):
             
         return query
     
+    def _apply_cursor(
+        self, 
+        cursor: CursorParams, 
+        sort: Optional[SortParams],
+        query: Select[tuple[RelatedType]], 
+        response: DictResponseList[RelatedType]
+    ) -> Select[tuple[RelatedType]]:
+        # Keyset pagination: ORDER BY <sort column>, id + seek predicate 
+        # from the last row of the previous page instead of OFFSET
+        order_by = sort.order_by if sort else 'id'
+        order_type = sort.order_type if sort else 'asc'
+        
+        if cursor.cursor:
+            order_by, order_type, value, last_id = self._decode_cursor(cursor.cursor)
+        
+        if order_by not in self.model.__table__.columns:
+            order_by = 'id'
+        
+        column = getattr(self.model, order_by)
+        id_column = self.model.id # type: ignore
+        keys = (column, id_column) if order_by != 'id' else (id_column,)
+        # NULL never compares in a row value, such columns get their own seek
+        nullable = order_by != 'id' and self.model.__table__.columns[order_by].nullable
+        
+        if cursor.cursor and nullable:
+            query = query.filter(self._seek_nullable(column, order_type, value, last_id))
+        elif cursor.cursor:
+            last_keys = tuple(
+                literal(key_value, key.type) 
+                for key_value, key in zip((value, last_id), keys)
+            )
+            query = query.filter(
+                tuple_(*keys) > tuple_(*last_keys) 
+                if order_type == 'asc' 
+                else tuple_(*keys) < tuple_(*last_keys)
+            )
+        
+        order = [key.asc() if order_type == 'asc' else key.desc() for key in keys]
+        if nullable:
+            # Same place of NULLs in every dialect: after all values
+            order[0] = order[0].nulls_last()
+        
+        query = query \
+            .order_by(*order) \
+            .limit(cursor.limit + 1)
+        
+        response.update(
+            {
+                'order_type': order_type,
+                'order_by': order_by,
+                'limit': cursor.limit,
+            }
+        )
+        
+        return query
+    
+    def _seek_nullable(
+        self, 
+        column: Any, 
+        order_type: str, 
+        value: Any, 
+        last_id: int
+    ) -> ColumnElement[bool]:
+        # Rows after (value, last_id) when NULLs go last
+        id_column = self.model.id # type: ignore
+        after_id = id_column > last_id if order_type == 'asc' else id_column < last_id
+        
+        if value is None:
+            return and_(column.is_(None), after_id)
+        
+        value = literal(value, column.type)
+        after_value = column > value if order_type == 'asc' else column < value
+        return or_(
+            after_value, 
+            and_(column == value, after_id), 
+            column.is_(None)
+        )
+    
+    def _cut_cursor_page(
+        self, 
+        cursor: CursorParams, 
+        objects: List[RelatedType], 
+        response: DictResponseList[RelatedType]
+    ) -> List[RelatedType]:
+        # One extra row was fetched to know whether the next page exists
+        next_cursor = None
+        
+        if len(objects) > cursor.limit:
+            objects = objects[:cursor.limit]
+            last = objects[-1]
+            next_cursor = self._encode_cursor(
+                response['order_by'] or 'id',
+                response['order_type'] or 'asc',
+                getattr(last, response['order_by'] or 'id'),
+                last.id # type: ignore
+            )
+        
+        response.update({'next_cursor': next_cursor})
+        return objects
+    
+    @staticmethod
+    def _encode_cursor(order_by: str, order_type: str, value: Any, id: int) -> str:
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, Enum):
+            value = value.value
+        
+        payload = json.dumps([order_by, order_type, value, id])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+    
+    def _decode_cursor(self, cursor: str) -> Tuple[str, str, Any, int]:
+        try:
+            order_by, order_type, value, id = json.loads(base64.urlsafe_b64decode(cursor))
+            
+            python_type = self.model.__table__.columns[order_by].type.python_type
+            if value is not None:
+                value = datetime.fromisoformat(value) \
+                    if issubclass(python_type, datetime) \
+                    else python_type(value)
+            
+            if order_type not in ('asc', 'desc'):
+                raise ValueError(f"unknown order_type {order_type}")
+                
+            return order_by, order_type, value, int(id)
+        
+        except Exception as e:
+            raise InvalidCursorException(
+                detail=f"Invalid cursor for Model {self.model.__name__}: {e}"
+            ) from e
+    
+    def _apply_profile(
+        self, 
+        query: Select[tuple[RelatedType]], 
+        profile: Optional[LoaderProfile]
+    ) -> Select[tuple[RelatedType]]:
+        if profile:
+            query = query.options(*LOADER_PROFILES[profile])
+        return query
+    
     def _apply_filter(
         self, 
         filter_params: BaseModel, 
-        query: Query
-    ) -> Query:
+        query: Select
+    ) -> Select:
         cleaned_filter = filter_params \
             .model_dump(exclude_none=True, exclude_unset=True) \
             .items()
@@ -77,14 +321,28 @@ class BaseRepository(Generic[ModelType]):
             query = query.filter(getattr(self.model, key) == value)    
         
         return query
+    
+    async def _count(self, query: Select) -> int:
+        return await self.db.scalar(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ) or 0
 
-    def get_list(self, 
+    async def get_list(self, 
         pagination: Optional[PaginationParams] = None,
         filter_params: Optional[BaseModel] = None,
         sort: Optional[SortParams] = None,
+        cursor: Optional[CursorParams] = None,
     ) -> DictResponseList[ModelType]:
         try:
-            query = self.db.query(self.model)
+            if pagination and cursor and cursor.cursor:
+                raise InvalidCursorException(
+                    detail=f"Cursor can't be combined with page for Model {self.model.__name__}"
+                )
+            # Page number wins over the cursor, the limit is shared
+            if pagination:
+                cursor = None
+            
+            query = select(self.model)
             response: DictResponseList[ModelType] = {}
             
             if filter_params:
@@ -93,23 +351,38 @@ class BaseRepository(Generic[ModelType]):
                     query=query, 
                 )
             
-            total_count = query.count()    
+            # In cursor mode count is optional: it costs one more scan
+            total_count = None
+            if cursor is None or cursor.with_count:
+                total_count = await self._count(query)    
+            
+            if cursor:
+                query = self._apply_cursor(cursor, sort, query, response)
                 
-            if sort:    
-                query = self._apply_sort(sort=sort, query=query, response=response)   
+            else:
+                if sort:    
+                    query = self._apply_sort(sort=sort, query=query, response=response)   
+                
+                if pagination:    
+                    query = self._apply_pagination(pagination, query, response)
+            
+            objects = list(await self.db.scalars(query))
             
-            if pagination:    
-                query = self._apply_pagination(pagination, query, response)
+            if cursor:
+                objects = self._cut_cursor_page(cursor, objects, response)
             
             response.update(
                 {
-                    'objects': query.all(),
+                    'objects': objects,
                     'total_count': total_count,
                 }
             )
             
             return response
         
+        except RepositoryException:
+            raise
+        
         except SQLAlchemyError as e:
             raise DatabaseException(
                 status_code=500, 
@@ -122,16 +395,19 @@ class BaseRepository(Generic[ModelType]):
                 detail=f"Unexpected Error: {str(e)}"
             ) from e
 
-    def create(self, object: Dict[str, Any]) -> ModelType:
+    @retry_on_lock
+    async def create(self, object: Dict[str, Any]) -> ModelType:
         try:
             new_object = self.model(**object)     
             self.db.add(new_object)
-            self.save()
-            self.db.refresh(new_object)
+            await self.save()
+            
+            if not self.in_unit_of_work:
+                await self.db.refresh(new_object)
             return new_object
         
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise DatabaseException(
                 status_code=500, 
                 detail=f"Database Error\n"
@@ -145,23 +421,48 @@ class BaseRepository(Generic[ModelType]):
                        f"Failed to create object: {e}"
             ) from e
         
-    def update(
+    async def add_many(self, objects: List[Dict[str, Any]]) -> List[ModelType]:
+        # Flush only, commit is up to the caller
+        try:
+            new_objects = [self.model(**object) for object in objects]
+            self.db.add_all(new_objects)
+            await self.db.flush()
+            return new_objects
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to create objects: {e}",
+            ) from e
+    
+    async def get_existing_ids(self, ids: Iterable[int]) -> Set[int]:
+        rows = await self.db.scalars(
+            select(self.model.id).filter(self.model.id.in_(list(ids))) # type: ignore
+        )
+        return set(rows)
+        
+    @retry_on_lock
+    async def update(
         self,
         id: int,
         data: Dict[str, Any],
     ) -> ModelType:
         try:
-            object = self.get(id)   
+            object = await self.get(id)   
                     
             for key, value in data.items():
                 setattr(object, key, value)
             
-            self.save()
-            self.db.refresh(object)
+            await self.save()
+            
+            if not self.in_unit_of_work:
+                await self.db.refresh(object)
             return object
         
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise DatabaseException(
                 status_code=500, 
                 detail=f"Database Error\n"
@@ -175,9 +476,9 @@ class BaseRepository(Generic[ModelType]):
                        f"Error: {e} "
             ) from e
     
-    def get(self, id: int) -> ModelType:
-        object = self.db.query(self.model) \
-            .filter(self.model.id == id).first() # type: ignore
+    async def get(self, id: int, profile: Optional[LoaderProfile] = None) -> ModelType:
+        query = select(self.model).filter(self.model.id == id) # type: ignore
+        object = await self.db.scalar(self._apply_profile(query, profile))
         
         if object is None:
             raise NotFoundException(
@@ -187,9 +488,10 @@ class BaseRepository(Generic[ModelType]):
         
         return object
     
-    def get_locked(self, id: int) -> ModelType:
-        object = self.db.query(self.model) \
-            .filter(self.model.id == id).with_for_update().first() # type: ignore
+    async def get_locked(self, id: int) -> ModelType:
+        object = await self.db.scalar(
+            select(self.model).filter(self.model.id == id).with_for_update() # type: ignore
+        )
         
         if object is None:
             raise NotFoundException(
@@ -199,55 +501,33 @@ class BaseRepository(Generic[ModelType]):
         
         return object
     
-    def delete(self, object: ModelType) -> None:
+    @retry_on_lock
+    async def delete(self, object: ModelType) -> None:
         try:        
-            self.db.delete(object)
-            self.save()
+            await self.db.delete(object)
+            await self.save()
             
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise DatabaseException(
                 status_code=500, 
                 detail=f"Database Error\n"
                        f"Failed to delete object: {e}"
             ) from e
     
-    def save(self) -> None:
+    async def save(self) -> None:
+        # Inside unit of work the service commits once at the end.
+        # Lock errors are retried by retry_on_lock of the whole operation
         try:
-            self.db.commit()
+            if self.in_unit_of_work:
+                await self.db.flush()
+            else:
+                await self.db.commit()
             
         except SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise DatabaseException(
                 status_code=500, 
                 detail=f"Database Error\n"
                        f"Failed to save changes: {e}"
             ) from e
-        
-    def execute_with_locked(
-        self, 
-        id: int, 
-        f: Callable[[ModelType], ModelType]
-    ) -> ModelType:
-        with self.db.begin():
-            try:
-                object = self.get_locked(id)
-                result = f(object)
-                self.save()
-                return result
-            
-            except SQLAlchemyError as e:
-                self.db.rollback()
-                raise DatabaseException(
-                    status_code=500, 
-                    detail="Database Error\n"
-                           "Failed to execute function\n" 
-                           f"for changes in BEGIN LOCK BLOCK: {e}"
-                ) from e
-            except Exception as e:
-                self.db.rollback()
-                raise UnexpectedException(
-                    status_code=500,
-                    detail=f"Database Inexpected Error in BEGIN LOCK BLOCK: {e}"
-                ) from e
-
@@ -1,29 +1,39 @@
-from typing import Optional, TYPE_CHECKING
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from dependencies.typed_dict import DictResponseList
-    from schemas.schema_base import SortParams, PaginationParams
     from pydantic import BaseModel
             
 from models import Contact
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import select, func, update, delete, exists
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
 
 from repositories.repo_base import BaseRepository
-from exceptions.exc_base import DatabaseException, UnexpectedException
+# Registers flush listener keeping contact_activity_hourly in sync
+from repositories.contact_rollup import RollupKey, apply_rollup_deltas, floor_hour, remove_from_rollup
+from dependencies.custom_enum import StatusList
+from repositories.lead_affinity import stage_assignments
+from exceptions.exc_base import DatabaseException
+
+import config
+
+# Contacts holding capacity of their operator
+ACTIVE_STATUSES = (StatusList.NEW, StatusList.IN_PROGRESS)
 
 
 class DistributeRepository(BaseRepository[Contact]):
     
-    def __init__(self, db:Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         super().__init__(model=Contact, db=db)
     
-    #Override methods _apply_filter, get_list from BaseRepository  
+    #Override method _apply_filter from BaseRepository  
     def _apply_filter(
         self, 
         filter_params: BaseModel, 
-        query: Query[Contact]
-    ) -> Query[Contact]:
+        query: Select[tuple[Contact]]
+    ) -> Select[tuple[Contact]]:
         cleaned_filter = filter_params \
             .model_dump(
                 exclude_none=True, 
@@ -55,47 +65,133 @@ class DistributeRepository(BaseRepository[Contact]):
             query = query.filter(self.model.status == cleaned_filter['status'])  
         
         return query
-
-    def get_list(self, 
-        pagination: Optional[PaginationParams] = None,
+    
+    async def count_by_source(self, status: StatusList) -> Dict[int, int]:
+        rows = await self.db.execute(
+            select(self.model.source_id, func.count()) \
+                .where(self.model.status == status) \
+                .group_by(self.model.source_id)
+        )
+        return {source_id: count for source_id, count in rows}
+    
+    # Columns only, no ORM objects. Rows are fetched from server side cursor
+    # in partitions of batch_size, so memory does not depend on result size
+    async def stream_rows(
+        self, 
         filter_params: Optional[BaseModel] = None,
-        sort: Optional[SortParams] = None,
-    ) -> DictResponseList[Contact]:
+        batch_size: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        query = select(
+            self.model.id,
+            self.model.lead_id,
+            self.model.source_id,
+            self.model.operator_id,
+            self.model.status,
+            self.model.created_at,
+            self.model.updated_at
+        ).order_by(self.model.id)
+        
+        if filter_params:
+            query = self._apply_filter(filter_params=filter_params, query=query)
+        
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.mappings().partitions():
+            yield rows
+    
+    # Oldest first, so contacts leave the queue in the order they came
+    async def get_queued_ids(self, source_id: int, limit: int) -> List[int]:
+        result = await self.db.scalars(
+            select(self.model.id) \
+                .where(self.model.source_id == source_id) \
+                .where(self.model.status == StatusList.IN_QUEUE) \
+                .order_by(self.model.created_at, self.model.id) \
+                .limit(limit)
+        )
+        return list(result)
+    
+    # One UPDATE for all contacts of the operator. Contacts changed 
+    # by another request since they were read are not matched,
+    # only ids of assigned contacts are returned
+    async def assign_queued(self, ids: Iterable[int], operator_id: int) -> List[int]:
         try:
-            query = self.db.query(self.model)
-            response: DictResponseList[Contact] = {}
-            
-            if filter_params:
-                query = self._apply_filter(
-                    filter_params=filter_params, 
-                    query=query, 
-                )   
-                
-            if sort:    
-                query = super()._apply_sort(sort=sort, query=query, response=response)   
+            rows = (await self.db.execute(
+                update(self.model) \
+                    .where(self.model.id.in_(list(ids))) \
+                    .where(self.model.status == StatusList.IN_QUEUE) \
+                    .values(operator_id=operator_id, status=StatusList.NEW) \
+                    .returning(
+                        self.model.id, 
+                        self.model.lead_id, 
+                        self.model.source_id, 
+                        self.model.created_at
+                    )
+            )).all()
             
-            if pagination:    
-                query = super()._apply_pagination(pagination=pagination, query=query, response=response)
+            # Bulk UPDATE bypasses flush, rollup and affinity are kept here
+            deltas: Counter[RollupKey] = Counter()
+            for _, _, source_id, created_at in rows:
+                deltas[(floor_hour(created_at), source_id, 0, StatusList.IN_QUEUE)] -= 1
+                deltas[(floor_hour(created_at), source_id, operator_id, StatusList.NEW)] += 1
+            await self.db.run_sync(apply_rollup_deltas, deltas)
+            if config.LEAD_AFFINITY_ENABLED:
+                stage_assignments(self.db, {lead_id: operator_id for _, lead_id, _, _ in rows})
             
-            response.update(
-                {
-                    'objects': query.all(),
-                    'total_count': query.count(),
-                }
-            )
-                
-            return response
+            return [id for id, _, _, _ in rows]
         
         except SQLAlchemyError as e:
+            await self.db.rollback()
             raise DatabaseException(
                 status_code=500, 
-                detail=f"Database Error: {str(e)}"
+                detail=f"Database Error\n"
+                       f"Failed to assign queued contacts to operator id={operator_id}: {e}"
             ) from e
-            
-        except Exception as e:
-            raise UnexpectedException(
+    
+    # EXISTS stops at the first matching index entry
+    async def has_active(self, *criteria: ColumnElement[bool]) -> bool:
+        return await self.db.scalar(
+            select(
+                exists() \
+                    .where(*criteria) \
+                    .where(self.model.status.in_(ACTIVE_STATUSES))
+            )
+        )
+    
+    async def count_active_by_operator(self, *criteria: ColumnElement[bool]) -> Dict[int, int]:
+        rows = await self.db.execute(
+            select(self.model.operator_id, func.count()) \
+                .where(*criteria) \
+                .where(self.model.status.in_(ACTIVE_STATUSES)) \
+                .where(self.model.operator_id.is_not(None)) \
+                .group_by(self.model.operator_id)
+        )
+        return {operator_id: count for operator_id, count in rows}
+    
+    # One DELETE instead of loading and deleting contacts one by one.
+    # Operator capacity is not released here, callers check active contacts
+    async def delete_where(self, *criteria: ColumnElement[bool]) -> int:
+        try:
+            await self.db.run_sync(remove_from_rollup, *criteria)
+            result = await self.db.execute(delete(self.model).where(*criteria))
+            return result.rowcount
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
                 status_code=500, 
-                detail=f"Unexpected Error: {str(e)}"
+                detail=f"Database Error\n"
+                       f"Failed to delete contacts: {e}"
             ) from e
-     
-    
\ No newline at end of file
+    
+    # Operator of the last assigned contact of every lead, oldest first
+    async def get_last_operators(self, limit: int) -> List[Tuple[int, int]]:
+        last_ids = select(func.max(self.model.id)) \
+            .where(self.model.operator_id.is_not(None)) \
+            .group_by(self.model.lead_id) \
+            .order_by(func.max(self.model.id).desc()) \
+            .limit(limit)
+        rows = await self.db.execute(
+            select(self.model.lead_id, self.model.operator_id) \
+                .where(self.model.id.in_(last_ids)) \
+                .order_by(self.model.id)
+        )
+        return [tuple(row) for row in rows]
@@ -0,0 +1,106 @@
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import IdempotencyKey
+from .repo_base import BaseRepository, get_upsert_insert, retry_on_lock
+from exceptions.exc_base import DatabaseException
+
+
+class IdempotencyRepository(BaseRepository[IdempotencyKey]):
+
+    def __init__(self, db: AsyncSession) -> None:
+        super().__init__(model=IdempotencyKey, db=db)
+
+    # Committed right away, so the key is seen in progress by every worker.
+    # Returns None if the key is reserved for the caller,
+    # otherwise (fingerprint, response) of the existing request
+    @retry_on_lock
+    async def reserve(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: bytes,
+        now: float,
+        expires_at: float,
+    ) -> Optional[Tuple[bytes, Optional[Dict[str, Any]]]]:
+        insert = get_upsert_insert(self.db.get_bind().dialect.name)
+        statement = insert(self.model.__table__) \
+            .values(scope=scope, key=key, fingerprint=fingerprint, expires_at=expires_at) \
+            .on_conflict_do_nothing(index_elements=[self.model.scope, self.model.key]) \
+            .returning(self.model.key)
+
+        try:
+            await self.db.execute(
+                delete(self.model).where(self.model.expires_at < now)
+            )
+            while True:
+                if await self.db.scalar(statement) is not None:
+                    await self.db.commit()
+                    return None
+
+                existing = (await self.db.execute(
+                    select(self.model.fingerprint, self.model.response) \
+                        .where(self.model.scope == scope) \
+                        .where(self.model.key == key)
+                )).first()
+                # Released by a failed request in between: try again
+                if existing is not None:
+                    await self.db.commit()
+                    return existing.fingerprint, existing.response
+
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500,
+                detail=f"Database Error\n"
+                       f"Failed to reserve idempotency key {key}: {e}"
+            ) from e
+
+    @retry_on_lock
+    async def save_response(
+        self,
+        scope: str,
+        key: str,
+        response: Dict[str, Any],
+        expires_at: float,
+    ) -> None:
+        try:
+            await self.db.execute(
+                update(self.model) \
+                    .where(self.model.scope == scope) \
+                    .where(self.model.key == key) \
+                    .values(response=response, expires_at=expires_at)
+            )
+            await self.db.commit()
+
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500,
+                detail=f"Database Error\n"
+                       f"Failed to save response of idempotency key {key}: {e}"
+            ) from e
+
+    # Uncommitted work of the failed request is rolled back first
+    @retry_on_lock
+    async def release(self, scope: str, key: str) -> None:
+        try:
+            await self.db.rollback()
+            await self.db.execute(
+                delete(self.model) \
+                    .where(self.model.scope == scope) \
+                    .where(self.model.key == key) \
+                    .where(self.model.response.is_(None))
+            )
+            await self.db.commit()
+
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500,
+                detail=f"Database Error\n"
+                       f"Failed to release idempotency key {key}: {e}"
+            ) from e
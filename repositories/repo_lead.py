@@ -1,21 +1,161 @@
-from typing import Optional, List, TYPE_CHECKING
+from typing import Any, Optional, List, Dict, Tuple, Iterable, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from models import Source
-    from sqlalchemy.orm import Session
+    from sqlalchemy.ext.asyncio import AsyncSession
     
-from models import Lead
-from .repo_base import BaseRepository
+from sqlalchemy import select, func, delete
+from sqlalchemy.exc import SQLAlchemyError
+from models import Lead, LeadsSources, Contact
+from dependencies.custom_enum import LoaderProfile
+from .repo_base import BaseRepository, get_upsert_insert
+from .repo_contact import DistributeRepository
+from .lead_cache import LeadCache, lead_cache, stage_leads, MISSING
+from exceptions.exc_base import DatabaseException
 
 class LeadRepository(BaseRepository[Lead]):
     
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, cache: LeadCache = lead_cache):
         super().__init__(model=Lead, db=db)
+        self.cache = cache
    
-    def find_by_external_id(self, external_id: str) -> Optional[Lead]:
-        return self.db.query(self.model) \
-            .where(self.model.external_id == external_id) \
-            .first()
-           
-    def get_list_sources(self, id: int) -> List[Source]:
-        return self.get(id).sources
\ No newline at end of file
+    async def find_id_by_external_id(self, external_id: str) -> Optional[int]:
+        lead_ids = await self.get_ids_by_external_ids([external_id])
+        return lead_ids.get(external_id)
+    
+    async def get_ids_by_external_ids(self, external_ids: Iterable[str]) -> Dict[str, int]:
+        lead_ids: Dict[str, int] = {}
+        unknown: List[str] = []
+        
+        for external_id in external_ids:
+            lead_id = self.cache.get(external_id)
+            if lead_id is None:
+                unknown.append(external_id)
+            elif lead_id != MISSING:
+                lead_ids[external_id] = lead_id
+        
+        if unknown:
+            rows = await self.db.execute(
+                select(self.model.external_id, self.model.id) \
+                    .where(self.model.external_id.in_(unknown))
+            )
+            found = {row.external_id: row.id for row in rows}
+            self.cache.set_many({
+                external_id: found.get(external_id, MISSING) 
+                for external_id in unknown
+            })
+            lead_ids.update(found)
+        
+        return lead_ids
+    
+    # Children are deleted by one statement per table. Capacity held by
+    # active contacts of the lead is released by the service beforehand
+    async def delete(self, object: Lead) -> None:
+        try:
+            await DistributeRepository(self.db).delete_where(Contact.lead_id == object.id)
+            await self.db.execute(
+                delete(LeadsSources) \
+                    .where(LeadsSources.lead_id == object.id)
+            )
+            await super().delete(object)
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to delete lead id={object.id}: {e}"
+            ) from e
+    
+    async def get_list_sources(self, id: int) -> List[Source]:
+        lead = await self.get(id, LoaderProfile.LEAD_WITH_SOURCES)
+        return lead.sources
+    
+    # Bulk upsert by unique external_id, name is kept if the new one is empty.
+    # Flush-less Core statement: commit is up to the caller
+    async def upsert_many(self, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+        if not rows:
+            return {}
+        
+        insert = get_upsert_insert(self.db.get_bind().dialect.name)
+        statement = insert(self.model.__table__).values(rows)
+        statement = statement \
+            .on_conflict_do_update(
+                index_elements=[self.model.external_id],
+                set_={"name": func.coalesce(statement.excluded.name, self.model.name)}
+            ) \
+            .returning(self.model.external_id, self.model.id)
+        
+        try:
+            result = await self.db.execute(statement)
+            return {row.external_id: row.id for row in result}
+        
+        except SQLAlchemyError as e:
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to upsert leads: {e}"
+            ) from e
+    
+    # Leads created meanwhile by a concurrent transaction are skipped
+    # by the INSERT and read back, first contacts of one new lead don't fail
+    # on the unique external_id. Flush-less: commit is up to the caller
+    async def get_or_create_ids(self, external_ids: Iterable[str]) -> Dict[str, int]:
+        external_ids = list(dict.fromkeys(external_ids))
+        if not external_ids:
+            return {}
+        
+        insert = get_upsert_insert(self.db.get_bind().dialect.name)
+        statement = insert(self.model.__table__) \
+            .values([{"external_id": external_id} for external_id in external_ids]) \
+            .on_conflict_do_nothing(index_elements=[self.model.external_id]) \
+            .returning(self.model.external_id, self.model.id)
+        
+        try:
+            result = await self.db.execute(statement)
+            lead_ids = {row.external_id: row.id for row in result}
+            
+            existing = [external_id for external_id in external_ids if external_id not in lead_ids]
+            if existing:
+                rows = await self.db.execute(
+                    select(self.model.external_id, self.model.id) \
+                        .where(self.model.external_id.in_(existing))
+                )
+                found = {row.external_id: row.id for row in rows}
+                # Committed by another transaction or worker: a cached miss 
+                # is stale right now, not only after our commit
+                self.cache.set_many(found)
+                lead_ids.update(found)
+            
+            stage_leads(self.db, lead_ids)
+            return lead_ids
+        
+        except SQLAlchemyError as e:
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to create leads: {e}"
+            ) from e
+    
+    # Returns count of new links, existing ones are skipped
+    async def add_source_links_ignore_existing(self, links: Iterable[Tuple[int, int]]) -> int:
+        values = [
+            {"lead_id": lead_id, "source_id": source_id}
+            for lead_id, source_id in links
+        ]
+        if not values:
+            return 0
+        
+        insert = get_upsert_insert(self.db.get_bind().dialect.name)
+        try:
+            result = await self.db.execute(
+                insert(LeadsSources.__table__).values(values).on_conflict_do_nothing()
+            )
+            return max(result.rowcount, 0)
+        
+        except SQLAlchemyError as e:
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to add lead sources: {e}"
+            ) from e
@@ -1,45 +1,165 @@
-from typing import TYPE_CHECKING
+from typing import List, Tuple, Optional, Iterable, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from sqlalchemy.orm import Session
+    from sqlalchemy.ext.asyncio import AsyncSession
     
-from sqlalchemy.orm import contains_eager
-from models import Operator, OperatorSourcePriority
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import SQLAlchemyError
+from models import Operator, OperatorSourcePriority, Contact
+from dependencies.custom_enum import LoaderProfile
 from repositories.repo_base import BaseRepository
+from repositories.repo_contact import DistributeRepository
+# Registers the listeners that log routing state changes
+import repositories.state_changes
 from exceptions.exc_base import ForbiddenDeleteException, RepositoryException
+from exceptions.exc_base import DatabaseException
 
 class OperatorRepository(BaseRepository[Operator]):
     
-    def __init__(self, db:Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         super().__init__(model=Operator, db=db)
 
-    def get_list_priotiries(self, id: int):
-        operator = self.get(id)
+    async def get_list_priotiries(self, id: int):
+        operator = await self.get(id, LoaderProfile.OPERATOR_WITH_PRIORITIES)
         return operator.priorities
     
-    def get_list_contacts(self, id: int):
-        operator = self.get(id)
-        return operator.contacts
-
-    def delete(self, object: Operator) -> None:
+    async def has_active_contacts(self, id: int) -> bool:
+        return await DistributeRepository(self.db).has_active(Contact.operator_id == id)
+    
+    # Children are deleted by one statement per table, 
+    # contacts history of the operator is never loaded
+    async def delete(self, object: Operator) -> None:
         try:
-            if not object.can_delete():
+            if await self.has_active_contacts(object.id):
                 raise ForbiddenDeleteException(
                     detail=f"Operator with id={object.id} cannot be "
                            "deleted while has active loadings"
                 )   
-            super().delete(object)
+            await DistributeRepository(self.db).delete_where(Contact.operator_id == object.id)
+            await self.db.execute(
+                delete(OperatorSourcePriority) \
+                    .where(OperatorSourcePriority.operator_id == object.id)
+            )
+            await super().delete(object)
             
         except RepositoryException as e:
             raise
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to delete operator id={object.id}: {e}"
+            ) from e
  
-    def get_available_operator_for_source(self, source_id: int) -> list[Operator]:
-        return self.db.query(self.model) \
-            .join(OperatorSourcePriority, self.model.priorities) \
-            .filter(self.model.is_active) \
-            .filter(self.model.is_available) \
-            .filter(OperatorSourcePriority.source_id == source_id) \
-            .options(contains_eager(self.model.priorities)) \
-            .all()
-    
-    
\ No newline at end of file
+    async def claim_capacity(self, id: int, count: int = 1) -> Optional[Operator]:
+        # One conditional UPDATE instead of read-modify-write and row locks:
+        # None means operator is inactive or has no free capacity anymore
+        try:
+            operator = await self.db.scalar(
+                update(self.model) \
+                    .where(self.model.id == id) \
+                    .where(self.model.is_active) \
+                    .where(self.model.current_loading + count <= self.model.max_loading) \
+                    .values(current_loading=self.model.current_loading + count) \
+                    .returning(self.model)
+            )
+            return operator
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to claim capacity of operator id={id}: {e}"
+            ) from e
+    
+    async def release_capacity(self, id: int, count: int = 1) -> Optional[Operator]:
+        try:
+            operator = await self.db.scalar(
+                update(self.model) \
+                    .where(self.model.id == id) \
+                    .where(self.model.current_loading >= count) \
+                    .values(current_loading=self.model.current_loading - count) \
+                    .returning(self.model)
+            )
+            return operator
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to release capacity of operator id={id}: {e}"
+            ) from e
+    
+    async def get_loading_state(self, id: int) -> Optional[Tuple[int, int, bool]]:
+        row = (await self.db.execute(
+            select(
+                self.model.current_loading,
+                self.model.max_loading,
+                self.model.active
+            ).where(self.model.id == id)
+        )).first()
+        return tuple(row) if row else None
+    
+    async def get_routing_state(
+        self, 
+        source_ids: Optional[Iterable[int]] = None
+    ) -> Tuple[List[Tuple[int, int, int, bool]], List[Tuple[int, int, int]]]:
+        operators = select(
+            self.model.id,
+            self.model.current_loading,
+            self.model.max_loading,
+            self.model.active
+        )
+        priorities = select(
+            OperatorSourcePriority.operator_id,
+            OperatorSourcePriority.source_id,
+            OperatorSourcePriority.weight
+        )
+        
+        if source_ids is not None:
+            priorities = priorities.filter(OperatorSourcePriority.source_id.in_(list(source_ids)))
+            operators = operators.filter(
+                self.model.id.in_(priorities.with_only_columns(OperatorSourcePriority.operator_id))
+            )
+        
+        operators = (await self.db.execute(operators)).all()
+        priorities = (await self.db.execute(priorities)).all()
+        
+        return (
+            [tuple(row) for row in operators], 
+            [tuple(row) for row in priorities]
+        )
+    
+    async def get_routing_states_of(self, ids: Iterable[int]) -> List[Tuple[int, int, int, bool]]:
+        rows = await self.db.execute(
+            select(
+                self.model.id,
+                self.model.current_loading,
+                self.model.max_loading,
+                self.model.active
+            ).where(self.model.id.in_(list(ids)))
+        )
+        return [tuple(row) for row in rows]
+    
+    async def get_priorities_of(self, ids: Iterable[int]) -> List[Tuple[int, int, int]]:
+        rows = await self.db.execute(
+            select(
+                OperatorSourcePriority.operator_id,
+                OperatorSourcePriority.source_id,
+                OperatorSourcePriority.weight
+            ).where(OperatorSourcePriority.operator_id.in_(list(ids)))
+        )
+        return [tuple(row) for row in rows]
+    
+    async def get_loading_states(self) -> List[Tuple[int, int, int]]:
+        rows = await self.db.execute(
+            select(
+                self.model.id,
+                self.model.current_loading,
+                self.model.max_loading
+            )
+        )
+        return [tuple(row) for row in rows]
@@ -1,8 +1,8 @@
 from .repo_base import BaseRepository
 from models import OperatorSourcePriority
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 class PriorityRepository(BaseRepository[OperatorSourcePriority]):
     
-    def __init__(self, db:Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         super().__init__(model=OperatorSourcePriority, db=db)
\ No newline at end of file
@@ -1,25 +1,49 @@
 from typing import Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from sqlalchemy.orm import Session
+    from sqlalchemy.ext.asyncio import AsyncSession
 
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
     
-from models import Source
+from models import Source, Contact, OperatorSourcePriority, LeadsSources
 from .repo_base import BaseRepository
-from exceptions.exc_base import RepositoryException, ForbiddenDeleteException
+from .repo_contact import DistributeRepository
+from exceptions.exc_base import RepositoryException, ForbiddenDeleteException, DatabaseException
 
 class SourceRepository(BaseRepository[Source]):
     
-    def __init__(self, db:Session) -> None:
+    def __init__(self, db: AsyncSession) -> None:
         super().__init__(model=Source, db=db)
     
-    def delete(self, object: Source) -> None:
+    async def has_active_contacts(self, id: int) -> bool:
+        return await DistributeRepository(self.db).has_active(Contact.source_id == id)
+    
+    # Children are deleted by one statement per table, 
+    # contacts history of the source is never loaded
+    async def delete(self, object: Source) -> None:
         try:
-            if not object.can_delete():
+            if await self.has_active_contacts(object.id):
                 raise ForbiddenDeleteException(
                     detail=f"Cannot be deleted while has active contacts with this source"
                 )   
-            super().delete(object)
+            await DistributeRepository(self.db).delete_where(Contact.source_id == object.id)
+            await self.db.execute(
+                delete(OperatorSourcePriority) \
+                    .where(OperatorSourcePriority.source_id == object.id)
+            )
+            await self.db.execute(
+                delete(LeadsSources) \
+                    .where(LeadsSources.source_id == object.id)
+            )
+            await super().delete(object)
             
         except RepositoryException as e:
-            raise
\ No newline at end of file
+            raise
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to delete source id={object.id}: {e}"
+            ) from e
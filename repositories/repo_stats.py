@@ -0,0 +1,181 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from schemas.schema_stats import FilterStats
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+from sqlalchemy import select, func, delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import Contact, ContactActivityHourly
+from dependencies.custom_enum import StatusList
+from repositories.repo_base import BaseRepository
+from repositories.contact_rollup import HOUR, as_utc, floor_hour, ceil_hour, hour_bucket
+from exceptions.exc_base import DatabaseException
+
+
+# Counts by hour of creation are read from contact_activity_hourly,
+# only the partial hours at the edges of the window are counted over contacts
+class StatsRepository(BaseRepository[Contact]):
+    
+    def __init__(self, db: AsyncSession) -> None:
+        super().__init__(model=Contact, db=db)
+    
+    async def count_contacts(
+        self, 
+        group_by: Sequence[str], 
+        filter_params: FilterStats
+    ) -> List[Dict[str, Any]]:
+        created_from = filter_params.created_at_ge
+        created_to = filter_params.created_at_le
+        # Whole hours of the window: [first_hour, last_hour)
+        first_hour = ceil_hour(created_from) if created_from else None
+        last_hour = floor_hour(created_to + timedelta(microseconds=1)) if created_to else None
+        
+        counts: Counter = Counter()
+        try:
+            if first_hour is not None and last_hour is not None and first_hour >= last_hour:
+                # Window inside one hour
+                await self._count_raw(counts, group_by, filter_params, created_from, created_to, True)
+            else:
+                await self._count_rollup(counts, group_by, filter_params, first_hour, last_hour)
+                if created_from is not None and as_utc(created_from) != first_hour:
+                    await self._count_raw(counts, group_by, filter_params, created_from, first_hour, False)
+                if created_to is not None:
+                    await self._count_raw(counts, group_by, filter_params, last_hour, created_to, True)
+        
+        except SQLAlchemyError as e:
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to count contacts: {e}"
+            ) from e
+        
+        return [
+            {**dict(zip(group_by, key)), "count": count}
+            for key, count in sorted(counts.items(), key=lambda item: [str(value) for value in item[0]])
+            if count
+        ]
+    
+    # One row per operator or source with count of every status
+    async def count_by_status(
+        self, 
+        group_by: str, 
+        filter_params: FilterStats
+    ) -> List[Dict[str, Any]]:
+        rows: Dict[int, Dict[str, Any]] = {}
+        
+        for item in await self.count_contacts([group_by, "status"], filter_params):
+            if item[group_by] is None:
+                continue
+            row = rows.setdefault(
+                item[group_by], 
+                {group_by: item[group_by], "total": 0, **{status.value: 0 for status in StatusList}}
+            )
+            row[item["status"].value] += item["count"]
+            row["total"] += item["count"]
+        
+        return [rows[key] for key in sorted(rows)]
+    
+    # Recount rollup rows of the window (whole hours) from contacts.
+    # Without window the whole table is rebuilt
+    async def rebuild_rollup(
+        self, 
+        created_from: Optional[datetime] = None, 
+        created_to: Optional[datetime] = None
+    ) -> int:
+        rollup = ContactActivityHourly.__table__
+        dialect = self.db.get_bind().dialect.name
+        bucket = hour_bucket(self.model.created_at, dialect)
+        operator_id = func.coalesce(self.model.operator_id, 0)
+        
+        delete_query = delete(rollup)
+        source = select(
+            bucket, 
+            self.model.source_id, 
+            operator_id, 
+            self.model.status, 
+            func.count()
+        )
+        if created_from is not None:
+            delete_query = delete_query.where(rollup.c.hour >= floor_hour(created_from))
+            source = source.where(self.model.created_at >= floor_hour(created_from))
+        if created_to is not None:
+            delete_query = delete_query.where(rollup.c.hour < floor_hour(created_to) + HOUR)
+            source = source.where(self.model.created_at < floor_hour(created_to) + HOUR)
+        source = source.group_by(bucket, self.model.source_id, operator_id, self.model.status)
+        
+        try:
+            await self.db.execute(delete_query)
+            result = await self.db.execute(
+                insert(rollup).from_select(
+                    ["hour", "source_id", "operator_id", "status", "count"], 
+                    source
+                )
+            )
+            await self.db.commit()
+            return max(result.rowcount, 0)
+        
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to rebuild contact rollup: {e}"
+            ) from e
+    
+    async def _count_rollup(
+        self, 
+        counts: Counter, 
+        group_by: Sequence[str], 
+        filter_params: FilterStats, 
+        first_hour: Optional[datetime], 
+        last_hour: Optional[datetime]
+    ) -> None:
+        rollup = ContactActivityHourly
+        columns = [getattr(rollup, name) for name in group_by]
+        query = select(*columns, func.sum(rollup.count)).group_by(*columns)
+        
+        if first_hour is not None:
+            query = query.where(rollup.hour >= first_hour)
+        if last_hour is not None:
+            query = query.where(rollup.hour < last_hour)
+        if filter_params.operator_id is not None:
+            query = query.where(rollup.operator_id == filter_params.operator_id)
+        if filter_params.source_id is not None:
+            query = query.where(rollup.source_id == filter_params.source_id)
+        if filter_params.status is not None:
+            query = query.where(rollup.status == filter_params.status)
+        
+        for *key, count in await self.db.execute(query):
+            # 0 is stored for contacts without operator
+            key = [None if name == "operator_id" and value == 0 else value for name, value in zip(group_by, key)]
+            counts[tuple(key)] += count or 0
+    
+    async def _count_raw(
+        self, 
+        counts: Counter, 
+        group_by: Sequence[str], 
+        filter_params: FilterStats, 
+        created_from: datetime, 
+        created_to: datetime,
+        include_end: bool
+    ) -> None:
+        columns = [getattr(self.model, name) for name in group_by]
+        created_at = self.model.created_at
+        query = select(*columns, func.count()) \
+            .where(created_at >= as_utc(created_from)) \
+            .where(created_at <= as_utc(created_to) if include_end else created_at < as_utc(created_to)) \
+            .group_by(*columns)
+        
+        if filter_params.operator_id is not None:
+            query = query.where(self.model.operator_id == filter_params.operator_id)
+        if filter_params.source_id is not None:
+            query = query.where(self.model.source_id == filter_params.source_id)
+        if filter_params.status is not None:
+            query = query.where(self.model.status == filter_params.status)
+        
+        for *key, count in await self.db.execute(query):
+            counts[tuple(key)] += count
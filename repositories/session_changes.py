@@ -0,0 +1,60 @@
+from typing import Any, Callable, Generic, TypeVar, Union
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+ChangesType = TypeVar("ChangesType")
+
+
+# Changes of a transaction kept in session.info under their own key:
+# collected on flush (bulk statements bypass it and stage them with of),
+# applied once when the transaction commits and dropped on rollback.
+# apply_on="before_commit" applies them inside the transaction instead
+class SessionChanges(Generic[ChangesType]):
+    def __init__(
+        self,
+        key: str,
+        factory: Callable[[], ChangesType],
+        apply_on: str = "after_commit"
+    ) -> None:
+        self.key = key
+        self.factory = factory
+        self.apply_on = apply_on
+        event.listen(Session, "after_rollback", self._discard)
+
+    def of(self, session: Union[Session, AsyncSession]) -> ChangesType:
+        changes = session.info.get(self.key)
+        if changes is None:
+            changes = session.info[self.key] = self.factory()
+        return changes
+
+    # Decorated function(session, changes) runs after every flush
+    def collector(
+        self,
+        function: Callable[[Session, ChangesType], None]
+    ) -> Callable[[Session, ChangesType], None]:
+        def collect(session: Session, flush_context: Any) -> None:
+            function(session, self.of(session))
+
+        event.listen(Session, "after_flush", collect)
+        return function
+
+    # Decorated function(session, changes) runs on commit, only with changes
+    def applier(
+        self,
+        function: Callable[[Session, ChangesType], None]
+    ) -> Callable[[Session, ChangesType], None]:
+        def apply(session: Session) -> None:
+            if self.apply_on == "before_commit":
+                # Commit flushes pending objects only after this hook
+                session.flush()
+            changes = session.info.pop(self.key, None)
+            if changes:
+                function(session, changes)
+
+        event.listen(Session, self.apply_on, apply)
+        return function
+
+    def _discard(self, session: Session) -> None:
+        session.info.pop(self.key, None)
@@ -0,0 +1,100 @@
+from typing import Iterable, List, Set, Tuple
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Operator, OperatorSourcePriority, Source, StateChange, StateVersion
+from repositories.repo_base import BaseRepository, get_upsert_insert
+from repositories.session_changes import SessionChanges
+
+# (table name, entity id). Priorities are logged by operator id
+ChangeKey = Tuple[str, int]
+
+OPERATORS = Operator.__tablename__
+PRIORITIES = OperatorSourcePriority.__tablename__
+SOURCES = Source.__tablename__
+
+
+class StateChangeRepository(BaseRepository[StateChange]):
+
+    def __init__(self, db: AsyncSession) -> None:
+        super().__init__(model=StateChange, db=db)
+
+    async def get_version(self) -> int:
+        return await self.db.scalar(select(func.coalesce(func.max(StateVersion.version), 0)))
+
+    async def get_changes_since(self, version: int) -> List[Tuple[str, int, int]]:
+        rows = await self.db.execute(
+            select(self.model.table_name, self.model.entity_id, self.model.version) \
+                .where(self.model.version > version)
+        )
+        return [tuple(row) for row in rows]
+
+
+# Changes are written right before commit, in the same transaction, under one new version
+_state_changes: SessionChanges[Set[ChangeKey]] = SessionChanges("state_changes", set, apply_on="before_commit")
+
+
+@_state_changes.collector
+def _collect_changes(session: Session, changes: Set[ChangeKey]) -> None:
+    if not config.STATE_SYNC_ENABLED:
+        return
+
+    for object in session.new | session.dirty | session.deleted:
+        if isinstance(object, Operator):
+            if object in session.dirty and not _routing_changed(object):
+                continue
+            changes.add((OPERATORS, object.id))
+        elif isinstance(object, OperatorSourcePriority):
+            changes.add((PRIORITIES, object.operator_id))
+        elif isinstance(object, Source):
+            changes.add((SOURCES, object.id))
+
+
+# Loading changes on every distribution and would make the counter row 
+# a write hotspot. It isn't synced: a failed claim refreshes the operator,
+# and workers re-read operators they see as full on every poll
+def _routing_changed(operator: Operator) -> bool:
+    state = inspect(operator)
+    return any(
+        state.attrs[attribute.key].history.has_changes()
+        for attribute in state.mapper.column_attrs
+        if attribute.key != "current_loading"
+    )
+
+
+@_state_changes.applier
+def _write_changes(session: Session, changes: Set[ChangeKey]) -> None:
+    record_changes(session, changes)
+
+
+# The counter row is locked until commit, so versions become visible
+# in order and a worker never skips a change with a lower version
+def record_changes(session: Session, changes: Iterable[ChangeKey]) -> int:
+    connection = session.connection()
+    insert = get_upsert_insert(connection.dialect.name)
+
+    counter = StateVersion.__table__
+    statement = insert(counter).values(id=1, version=1)
+    version = connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[counter.c.id],
+            set_={"version": counter.c.version + 1}
+        ).returning(counter.c.version)
+    ).scalar_one()
+
+    table = StateChange.__table__
+    statement = insert(table)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={"version": statement.excluded["version"]}
+        ),
+        [
+            {"table_name": table_name, "entity_id": entity_id, "version": version}
+            for table_name, entity_id in sorted(changes)
+        ]
+    )
+    return version
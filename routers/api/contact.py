@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, status
+from typing import Optional, Literal
+
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
 
 from schemas.schema_contact import UpdateContact, ResponseContact
 from schemas.schema_contact import ResponseListContact, FilterContact
-from schemas.schema_lead import AssignLead
+from schemas.schema_contact import ResponseBatchContact
+from schemas.schema_lead import AssignLead, BatchAssignLead
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
 
 from models import Contact
 
 from services.service_contact import DistributeService
+from services.idempotency import IdempotencyStore
 
-from dependencies.dependencies import get_service_distribute
+from dependencies.dependencies import get_service_distribute, get_idempotency_store
 from dependencies.dependencies import get_filter_params_contact
+from dependencies.dependencies import get_cursor_params, get_pagination_params, get_sort_params
 
 
 router = APIRouter(
@@ -21,9 +28,29 @@ router = APIRouter(
 async def list_contacts(
     service: DistributeService = Depends(get_service_distribute),
     filter_params: FilterContact = Depends(get_filter_params_contact),
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
+):
+    return await service.repo.get_list(
+        pagination=pagination,
+        filter_params=filter_params,
+        cursor=cursor,
+        sort=sort
+    )
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(
+    service: DistributeService = Depends(get_service_distribute),
+    filter_params: FilterContact = Depends(get_filter_params_contact),
+    format: Literal['ndjson', 'csv'] = Query('ndjson', description="Export format"),
 ):
-    return service.repo.get_list(
-        filter_params=filter_params
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    
+    return StreamingResponse(
+        service.export(filter_params, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=contacts.{format}"}
     )
 
 @router.post(
@@ -33,9 +60,52 @@ async def list_contacts(
 )
 async def create_contact(
     data: AssignLead,
-    service: DistributeService = Depends(get_service_distribute)
-) -> Contact:
-    return service.distribute_lead(data.model_dump(exclude_unset=True, exclude_none=True))
+    response: Response,
+    service: DistributeService = Depends(get_service_distribute),
+    idempotency_store: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255)
+):
+    payload = data.model_dump(exclude_unset=True, exclude_none=True)
+    
+    if idempotency_key is None:
+        return await service.distribute_lead(payload)
+    
+    # Retry with the same key returns the first response 
+    # without distributing the lead again
+    async with idempotency_store.claim("create_contact", idempotency_key, payload) as entry:
+        if entry.response is None:
+            contact = await service.distribute_lead(payload)
+            entry.response = ResponseContact.model_validate(contact)
+        else:
+            response.headers["Idempotent-Replayed"] = "true"
+    
+    return entry.response
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_201_CREATED, 
+    response_model=ResponseBatchContact
+)
+async def create_contacts_batch(
+    data: BatchAssignLead,
+    response: Response,
+    service: DistributeService = Depends(get_service_distribute),
+    idempotency_store: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255)
+):
+    items = [item.model_dump(exclude_unset=True, exclude_none=True) for item in data.items]
+    
+    if idempotency_key is None:
+        return await service.distribute_batch(items)
+    
+    async with idempotency_store.claim("create_contacts_batch", idempotency_key, {"items": items}) as entry:
+        if entry.response is None:
+            result = await service.distribute_batch(items)
+            entry.response = ResponseBatchContact.model_validate(result)
+        else:
+            response.headers["Idempotent-Replayed"] = "true"
+    
+    return entry.response
 
 @router.put("/{id}", response_model=ResponseContact)
 async def update_contacts(
@@ -43,7 +113,7 @@ async def update_contacts(
     contact: UpdateContact,
     service: DistributeService = Depends(get_service_distribute)
 ) -> Contact:
-    return service.update(
+    return await service.update(
         id, 
         contact.model_dump(exclude_unset=True, exclude_none=True)
     )
@@ -69,5 +139,5 @@ async def delete_operator(
     id: int,
     service: DistributeService = Depends(get_service_distribute)
 ) -> None:
-        source = service.repo.get(id)
-        service.delete(source)
\ No newline at end of file
+        source = await service.repo.get(id)
+        await service.delete(source)
\ No newline at end of file
@@ -1,17 +1,22 @@
 from schemas.schema_lead import CreateLead, UpdateLead
-from schemas.schema_lead import ResponseLead, ResponseListLead
+from schemas.schema_lead import ResponseLead, ResponseListLead, ResponseLeadImport
 from schemas.schema_contact import ResponseListContact, FilterContact
 from schemas.schema_source import ResponseListSource
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
 
 from models import Lead
 
 from services.service_lead import LeadService
+from services.lead_import import LeadImporter, iter_records
 
-from dependencies.dependencies import get_service_lead
+from dependencies.dependencies import get_service_lead, get_lead_importer
 from dependencies.dependencies import get_service_distribute
 from dependencies.dependencies import get_filter_params_contact
+from dependencies.dependencies import get_cursor_params, get_pagination_params, get_sort_params
 
-from fastapi import APIRouter, Depends, status
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query, Request, status
 
 
 router = APIRouter(
@@ -22,9 +27,12 @@ router = APIRouter(
 
 @router.get("/", response_model=ResponseListLead)
 async def list_leads(
-    service: LeadService = Depends(get_service_lead)
+    service: LeadService = Depends(get_service_lead),
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
 ):
-    return service.repo.get_list()
+    return await service.repo.get_list(pagination=pagination, cursor=cursor, sort=sort)
 
 @router.post(
     "/",
@@ -35,7 +43,17 @@ async def create_lead(
     lead: CreateLead,
     service: LeadService = Depends(get_service_lead)
 ) -> Lead:
-    return service.repo.create(lead.model_dump(exclude_unset=True, exclude_none=True))
+    return await service.repo.create(lead.model_dump(exclude_unset=True, exclude_none=True))
+
+# File is sent as raw request body and read as a stream,
+# e.g. curl --data-binary @leads.ndjson "/leads/import?format=ndjson"
+@router.post("/import", response_model=ResponseLeadImport)
+async def import_leads(
+    request: Request,
+    format: Literal['ndjson', 'csv'] = Query('ndjson', description="File format"),
+    importer: LeadImporter = Depends(get_lead_importer)
+):
+    return await importer.run(iter_records(request.stream(), format), format)
 
 @router.put("/{id}", response_model=ResponseLead)
 async def update_lead(
@@ -43,7 +61,7 @@ async def update_lead(
     data: UpdateLead,
     service: LeadService = Depends(get_service_lead)
 ) -> Lead:
-    return service.repo.update(
+    return await service.repo.update(
         id, 
         data.model_dump(exclude_unset=True, exclude_none=True)
     )
@@ -69,21 +87,28 @@ async def delete_lead(
     id: int,
     service: LeadService = Depends(get_service_lead)
 ) -> None:
-        lead = service.repo.get(id)
-        service.repo.delete(lead)
+        await service.delete(id)
 
 @router.get("/{id}/contacts", response_model=ResponseListContact)
 async def get_contacts_by_lead(
     id: int,
     service: LeadService = Depends(get_service_distribute),
     filter_params: FilterContact = Depends(get_filter_params_contact),
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
 ):
     extended_filter_params = filter_params.model_copy(update={"lead_id": id})
-    return service.repo.get_list(filter_params=extended_filter_params)
+    return await service.repo.get_list(
+        pagination=pagination,
+        filter_params=extended_filter_params, 
+        cursor=cursor, 
+        sort=sort
+    )
 
 @router.get("/{id}/sources", response_model=ResponseListSource)
 async def get_sources_by_lead(
     id: int,
     service: LeadService = Depends(get_service_lead)
 ):
-    return service.get_sources(id)
+    return await service.get_sources(id)
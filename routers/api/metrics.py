@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from services.service_contact import DistributeService
+
+from dependencies.dependencies import get_service_distribute
+from dependencies.custom_enum import StatusList
+
+from monitoring.metrics import registry, CONTENT_TYPE
+from monitoring.metrics import operator_current_loading, operator_max_loading, contacts_in_queue
+from monitoring.metrics import lead_cache_stats
+from repositories.lead_cache import lead_cache
+
+
+router = APIRouter(tags=["metrics"])
+
+
+class MetricsResponse(PlainTextResponse):
+    media_type = CONTENT_TYPE
+
+
+@router.get("/metrics", response_class=MetricsResponse, include_in_schema=False)
+async def metrics(
+    service: DistributeService = Depends(get_service_distribute)
+) -> str:
+    # Domain gauges are read from database on scrape,
+    # request handlers don't pay for them
+    operators = await service.repo_operator.get_loading_states()
+    queued = await service.repo.count_by_source(StatusList.IN_QUEUE)
+
+    operator_current_loading.replace({
+        (str(operator_id),): current_loading
+        for operator_id, current_loading, _ in operators
+    })
+    operator_max_loading.replace({
+        (str(operator_id),): max_loading
+        for operator_id, _, max_loading in operators
+    })
+    contacts_in_queue.replace({
+        (str(source_id),): count
+        for source_id, count in queued.items()
+    })
+
+    lead_cache_stats.replace({
+        (stat,): value
+        for stat, value in lead_cache.stats().items()
+    })
+
+    return registry.render()
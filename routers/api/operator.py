@@ -8,6 +8,7 @@ from schemas.schema_operator import ResponseListOperator
 from schemas.schema_operator import FilterOperator
 from schemas.schema_priority import ResponseListPriority
 from schemas.schema_contact import ResponseListContact
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
 
 from models import Operator
 
@@ -17,6 +18,7 @@ from services.service_contact import DistributeService
 from dependencies.dependencies import get_service_operator
 from dependencies.dependencies import get_filter_params_contact
 from dependencies.dependencies import get_service_distribute
+from dependencies.dependencies import get_cursor_params, get_pagination_params, get_sort_params
 
 router = APIRouter(
     prefix="/operators",
@@ -27,9 +29,17 @@ router = APIRouter(
 @router.get("/", response_model=ResponseListOperator)
 async def list_operators(
     service: Annotated[OperatorService, Depends(get_service_operator)],
+    cursor: Annotated[CursorParams, Depends(get_cursor_params)],
+    pagination: Annotated[Optional[PaginationParams], Depends(get_pagination_params)],
+    sort: Annotated[SortParams, Depends(get_sort_params)],
     active: Optional[bool] = Query(None, description="Filter by active"),
 ):
-    return service.repo.get_list(filter_params=FilterOperator(active=active))
+    return await service.repo.get_list(
+        pagination=pagination,
+        filter_params=FilterOperator(active=active),
+        cursor=cursor,
+        sort=sort
+    )
 
 @router.post(
     "/", 
@@ -40,7 +50,7 @@ async def create_operator(
     operator: CreateOperator,
     service: Annotated[OperatorService, Depends(get_service_operator)]
 ) -> Operator:
-    return service.repo.create(
+    return await service.repo.create(
         operator.model_dump(exclude_unset=True, exclude_none=True)
     )
 
@@ -50,7 +60,7 @@ async def update_operator(
     operator: UpdateOperator,
     service: Annotated[OperatorService, Depends(get_service_operator)]
 ) -> Operator:
-    return service.repo.update(
+    return await service.repo.update(
         id, 
         operator.model_dump(exclude_unset=True, exclude_none=True)
     )
@@ -76,15 +86,14 @@ async def delete_operator(
     id: int,
     service: Annotated[OperatorService, Depends(get_service_operator)]
 ) -> None:
-        operator = service.repo.get(id)
-        service.repo.delete(operator)
+        await service.delete(id)
 
 @router.get("/{id}/priorities", response_model=ResponseListPriority)
 async def list_priorities(
     id: int,
     service: Annotated[OperatorService, Depends(get_service_operator)]
 ):
-    return service.get_priorities(id)
+    return await service.get_priorities(id)
 
 @router.get(
     "/{id}/contacts",
@@ -92,7 +101,15 @@ async def list_priorities(
 async def list_contacts_by_operator(
     id: int,
     service: Annotated[DistributeService, Depends(get_service_distribute)],
+    cursor: Annotated[CursorParams, Depends(get_cursor_params)],
+    pagination: Annotated[Optional[PaginationParams], Depends(get_pagination_params)],
+    sort: Annotated[SortParams, Depends(get_sort_params)],
     filter_params: FilterOperator = Depends(get_filter_params_contact),
 ):
     extended_filter_params = filter_params.model_copy(update={"operator_id": id})
-    return service.repo.get_list(filter_params=extended_filter_params)
\ No newline at end of file
+    return await service.repo.get_list(
+        pagination=pagination,
+        filter_params=extended_filter_params,
+        cursor=cursor,
+        sort=sort
+    )
\ No newline at end of file
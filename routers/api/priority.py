@@ -1,12 +1,15 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, status
 from schemas.schema_priority import CreatePriority, ResponsePriority
 from schemas.schema_priority import ResponseListPriority, UpdatePriority
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
 
 from models import OperatorSourcePriority
 
 from services.service_priority import PriorityService
 
 from dependencies.dependencies import get_service_priority
+from dependencies.dependencies import get_cursor_params, get_pagination_params, get_sort_params
 
 router = APIRouter(
     prefix="/priorities",
@@ -15,9 +18,12 @@ router = APIRouter(
 
 @router.get("/", response_model=ResponseListPriority)
 async def list_priorities(
-    service: PriorityService = Depends(get_service_priority)
+    service: PriorityService = Depends(get_service_priority),
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
 ):
-    return service.repo.get_list()
+    return await service.repo.get_list(pagination=pagination, cursor=cursor, sort=sort)
 
 
 @router.post(
@@ -29,7 +35,7 @@ async def create_priority(
     data: CreatePriority,
     service: PriorityService = Depends(get_service_priority)
 ) -> OperatorSourcePriority:
-    new_priority = service.assign_priority(
+    new_priority = await service.assign_priority(
         data.model_dump(exclude_unset=True, exclude_none=True)
     )
     return new_priority
@@ -40,7 +46,7 @@ async def update_priority(
     priority: UpdatePriority,
     service: PriorityService = Depends(get_service_priority)
 ) -> OperatorSourcePriority:
-    return service.repo.update(
+    return await service.repo.update(
         id, 
         priority.model_dump(exclude_unset=True, exclude_none=True)
     )
\ No newline at end of file
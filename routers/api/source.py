@@ -1,8 +1,11 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, status
 
 from schemas.schema_source import CreateSource, UpdateSource, ResponseSource
 from schemas.schema_source import ResponseListSource
 from schemas.schema_contact import ResponseListContact, FilterContact
+from schemas.schema_base import CursorParams, PaginationParams, SortParams
 
 from models import Source
 
@@ -12,6 +15,7 @@ from services.service_contact import DistributeService
 from dependencies.dependencies import get_service_source
 from dependencies.dependencies import get_service_distribute
 from dependencies.dependencies import get_filter_params_contact
+from dependencies.dependencies import get_cursor_params, get_pagination_params, get_sort_params
 
 router = APIRouter(
     prefix="/sources",
@@ -20,9 +24,12 @@ router = APIRouter(
 
 @router.get("/", response_model=ResponseListSource)
 async def list_sources(
-    service: SourceService = Depends(get_service_source)
+    service: SourceService = Depends(get_service_source),
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
 ):
-    return service.repo.get_list()
+    return await service.repo.get_list(pagination=pagination, cursor=cursor, sort=sort)
 
 @router.post(
     "/", 
@@ -31,7 +38,7 @@ async def create_source(
     source: CreateSource,
     service: SourceService = Depends(get_service_source)
 ) -> Source:
-    return service.repo.create(
+    return await service.repo.create(
         source.model_dump(exclude_unset=True, exclude_none=True)
     )
 
@@ -41,7 +48,7 @@ async def update_source(
     source: UpdateSource,
     service: SourceService = Depends(get_service_source)
 ) -> Source:
-    return service.repo.update(
+    return await service.repo.update(
         id, 
         source.model_dump(exclude_unset=True, exclude_none=True)
     )
@@ -67,14 +74,21 @@ async def delete_source(
     id: int,
     service: SourceService = Depends(get_service_source)
 ) -> None:
-        source = service.repo.get(id)
-        service.repo.delete(source)
+        await service.delete(id)
 
 @router.get("/{id}/contacts", response_model=ResponseListContact)
 async def get_contacts_by_source(
     id: int,
     service: DistributeService = Depends(get_service_distribute),
     filter_params: FilterContact = Depends(get_filter_params_contact),    
+    cursor: CursorParams = Depends(get_cursor_params),
+    pagination: Optional[PaginationParams] = Depends(get_pagination_params),
+    sort: SortParams = Depends(get_sort_params),
 ):
     extended_filter_params = filter_params.model_copy(update={"source_id": id})
-    return service.repo.get_list(filter_params=extended_filter_params)
+    return await service.repo.get_list(
+        pagination=pagination,
+        filter_params=extended_filter_params, 
+        cursor=cursor, 
+        sort=sort
+    )
@@ -0,0 +1,41 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+
+from schemas.schema_stats import FilterStats, StatsGroup
+from schemas.schema_stats import ResponseStatsContacts, ResponseStatsOperators, ResponseStatsSources
+
+from services.service_stats import StatsService
+
+from dependencies.dependencies import get_service_stats, get_filter_params_stats
+
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+)
+
+@router.get("/contacts", response_model=ResponseStatsContacts)
+async def stats_contacts(
+    group_by: List[StatsGroup] = Query(
+        ['operator_id', 'source_id', 'status'], 
+        description="Group by fields, e.g. ?group_by=operator_id&group_by=status"
+    ),
+    filter_params: FilterStats = Depends(get_filter_params_stats),
+    service: StatsService = Depends(get_service_stats),
+):
+    return await service.get_contacts(group_by, filter_params)
+
+@router.get("/operators", response_model=ResponseStatsOperators)
+async def stats_operators(
+    filter_params: FilterStats = Depends(get_filter_params_stats),
+    service: StatsService = Depends(get_service_stats),
+):
+    return await service.get_by_status('operator_id', filter_params)
+
+@router.get("/sources", response_model=ResponseStatsSources)
+async def stats_sources(
+    filter_params: FilterStats = Depends(get_filter_params_stats),
+    service: StatsService = Depends(get_service_stats),
+):
+    return await service.get_by_status('source_id', filter_params)
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class PaginationParams(BaseModel):
@@ -6,4 +7,9 @@ class PaginationParams(BaseModel):
 
 class SortParams(BaseModel):
     order_by: str = 'id'
-    order_type: str = 'asc'
\ No newline at end of file
+    order_type: str = 'asc'
+
+class CursorParams(BaseModel):
+    cursor: Optional[str] = None
+    limit: int = 50
+    with_count: bool = False
\ No newline at end of file
@@ -25,11 +25,21 @@ class ResponseContact(BaseContact):
 
 class ResponseListContact(BaseModel):
     objects: List[ResponseContact]
-    total_count: int
+    total_count: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
     order_by: Optional[str] = None
     order_type: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+class ResponseBatchContactItem(ResponseContact):
+    external_id: str
+
+class ResponseBatchContact(BaseModel):
+    objects: List[ResponseBatchContactItem]
+    total_count: int
+    assigned_count: int
+    queued_count: int
 
 class FilterContact(BaseModel):
     source_id: Optional[int] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -21,10 +21,33 @@ class ResponseListLead(BaseModel):
     objects: List[ResponseLead]
     page: Optional[int] = None
     limit: Optional[int] = None
-    total_count: int
+    total_count: Optional[int] = None
+    order_by: Optional[str] = None
+    order_type: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 class AssignLead(BaseLead):
     source_id: int
 
+class BatchAssignLead(BaseModel):
+    items: List[AssignLead]
+
+class ImportLead(BaseModel):
+    external_id: str = Field(min_length=1, max_length=50)
+    name: Optional[str] = Field(default=None, max_length=50)
+    source_id: Optional[int] = None
+
+class ImportLeadError(BaseModel):
+    line: int
+    error: str
+
+class ResponseLeadImport(BaseModel):
+    processed: int
+    imported: int
+    linked: int
+    failed: int
+    errors: List[ImportLeadError]
+    errors_truncated: bool
+
 class FilterLead(BaseModel):
     created_at: Optional[datetime]
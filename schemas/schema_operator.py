@@ -24,11 +24,12 @@ class ResponseOperator(BaseOperator):
     
 class ResponseListOperator(BaseModel):
     objects: List[ResponseOperator]
-    total_count: int
+    total_count: Optional[int] = None
     page: Optional[int] = None
     limit: Optional[int] = None
     order_by: Optional[str] = None
     order_type: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 class FilterOperator(BaseModel):
     active: Optional[bool] = None
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 class BasePriority(BaseModel):
@@ -21,5 +21,10 @@ class ResponsePriority(BasePriority):
     
 class ResponseListPriority(BaseModel):
     objects: List[ResponsePriority]
-    total_count: int
+    total_count: Optional[int] = None
+    page: Optional[int] = None
+    limit: Optional[int] = None
+    order_by: Optional[str] = None
+    order_type: Optional[str] = None
+    next_cursor: Optional[str] = None
     
\ No newline at end of file
@@ -19,7 +19,10 @@ class ResponseListSource(BaseModel):
     objects: List[ResponseSource]
     page: Optional[int] = None
     limit: Optional[int] = None
-    total_count: int
+    total_count: Optional[int] = None
+    order_by: Optional[str] = None
+    order_type: Optional[str] = None
+    next_cursor: Optional[str] = None
 
 class FilterSource(BaseModel):
     created_at: Optional[datetime]
\ No newline at end of file
@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional, List, Literal
+from dependencies.custom_enum import StatusList
+
+StatsGroup = Literal['operator_id', 'source_id', 'status']
+
+class FilterStats(BaseModel):
+    created_at_ge: Optional[datetime] = None
+    created_at_le: Optional[datetime] = None
+    operator_id: Optional[int] = None
+    source_id: Optional[int] = None
+    status: Optional[StatusList] = None
+
+class ResponseStatsContactItem(BaseModel):
+    operator_id: Optional[int] = None
+    source_id: Optional[int] = None
+    status: Optional[StatusList] = None
+    count: int
+
+class ResponseStatsContacts(BaseModel):
+    objects: List[ResponseStatsContactItem]
+    group_by: List[StatsGroup]
+    total_count: int
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+class BaseStatsStatus(BaseModel):
+    in_queue: int
+    new: int
+    in_progress: int
+    done: int
+    total: int
+
+class ResponseStatsOperatorItem(BaseStatsStatus):
+    operator_id: int
+
+class ResponseStatsSourceItem(BaseStatsStatus):
+    source_id: int
+
+class ResponseStatsOperators(BaseModel):
+    objects: List[ResponseStatsOperatorItem]
+    total_count: int
+
+class ResponseStatsSources(BaseModel):
+    objects: List[ResponseStatsSourceItem]
+    total_count: int
@@ -0,0 +1,219 @@
+import heapq
+import random
+from typing import Dict, List, Optional, Tuple, Type
+
+import config
+
+
+# Policy choosing an operator for one source. RoutingIndex keeps it
+# incrementally: update for every change of an operator able to take
+# a contact, remove when the operator can't anymore. select is called
+# per contact and must not scan all operators. It doesn't change the
+# strategy, so it also serves as a probe: the turn is consumed by advance
+# once the chosen operator really got the contact
+class DistributionStrategy:
+    name = ""
+
+    def update(self, operator_id: int, weight: int, current_loading: int, max_loading: int) -> None:
+        raise NotImplementedError
+
+    def remove(self, operator_id: int) -> None:
+        raise NotImplementedError
+
+    def select(self) -> Optional[int]:
+        raise NotImplementedError
+
+    def advance(self, operator_id: int) -> None:
+        pass
+
+
+# Heap ordered by _key. Changed operators are pushed again with a new stamp,
+# outdated entries are dropped lazily when they reach the top
+class HeapStrategy(DistributionStrategy):
+    def __init__(self) -> None:
+        self._heap: List[Tuple] = []
+        self._stamps: Dict[int, int] = {}
+        self._counter = 0
+
+    def _key(self, weight: int, current_loading: int, max_loading: int) -> Tuple:
+        raise NotImplementedError
+
+    def update(self, operator_id: int, weight: int, current_loading: int, max_loading: int) -> None:
+        self._push(operator_id, self._key(weight, current_loading, max_loading))
+
+    def remove(self, operator_id: int) -> None:
+        self._stamps.pop(operator_id, None)
+
+    def select(self) -> Optional[int]:
+        heap = self._heap
+        while heap:
+            *_, operator_id, stamp = heap[0]
+            if self._stamps.get(operator_id) == stamp:
+                return operator_id
+            heapq.heappop(heap)
+        return None
+
+    def _push(self, operator_id: int, key: Tuple) -> None:
+        # New stamp invalidates every older entry of the operator
+        self._counter += 1
+        self._stamps[operator_id] = self._counter
+        heapq.heappush(self._heap, (*key, operator_id, self._counter))
+
+        # Rebuild when outdated entries start to dominate the heap
+        if len(self._heap) > 2 * len(self._stamps) + 16:
+            self._heap = [entry for entry in self._heap if self._stamps.get(entry[-2]) == entry[-1]]
+            heapq.heapify(self._heap)
+
+
+# Coef weight/max(current_loading, 1) desc, then current_loading asc
+class WeightedLoadStrategy(HeapStrategy):
+    name = "weighted_load"
+
+    def _key(self, weight: int, current_loading: int, max_loading: int) -> Tuple:
+        return (-weight / max(current_loading, 1), current_loading)
+
+
+# Fewest contacts in work first, higher weight breaks ties
+class LeastLoadedStrategy(HeapStrategy):
+    name = "least_loaded"
+
+    def _key(self, weight: int, current_loading: int, max_loading: int) -> Tuple:
+        return (current_loading, -weight)
+
+
+# Lowest share of used capacity first, higher weight breaks ties
+class CapacityRatioStrategy(HeapStrategy):
+    name = "capacity_ratio"
+
+    def _key(self, weight: int, current_loading: int, max_loading: int) -> Tuple:
+        return (current_loading / max_loading, -weight)
+
+
+# Smooth weighted round-robin as stride scheduling: the operator with
+# the lowest pass goes next and advances it by 1/weight. Gives the same
+# proportions and interleaving as the classic algorithm in O(log n)
+# instead of a pass over all operators per choice
+class SmoothRoundRobinStrategy(HeapStrategy):
+    name = "smooth_round_robin"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._passes: Dict[int, float] = {}
+        self._strides: Dict[int, float] = {}
+        self._time = 0.0
+
+    def update(self, operator_id: int, weight: int, current_loading: int, max_loading: int) -> None:
+        if weight <= 0:
+            self.remove(operator_id)
+            return
+        self._strides[operator_id] = 1 / weight
+        # Operator coming back doesn't catch up on turns it missed
+        self._passes[operator_id] = max(self._passes.get(operator_id, 0.0), self._time)
+        self._push(operator_id, (self._passes[operator_id],))
+
+    def advance(self, operator_id: int) -> None:
+        if operator_id not in self._stamps:
+            return
+        # Turn given out of order (lead affinity) doesn't move the clock
+        if self.select() == operator_id:
+            self._time = self._passes[operator_id]
+        self._passes[operator_id] += self._strides[operator_id]
+        self._push(operator_id, (self._passes[operator_id],))
+
+
+# Random operator with probability proportional to weight. Weights are kept
+# in a Fenwick tree: O(log n) both to change an operator and to sample
+class WeightedRandomStrategy(DistributionStrategy):
+    name = "weighted_random"
+
+    def __init__(self, rnd: Optional[random.Random] = None) -> None:
+        self._random = rnd or random.Random()
+        self._slots: Dict[int, int] = {}
+        self._operators: List[Optional[int]] = []
+        self._weights: List[int] = []
+        self._free: List[int] = []
+        self._tree: List[int] = [0]
+        self._total = 0
+
+    def update(self, operator_id: int, weight: int, current_loading: int, max_loading: int) -> None:
+        slot = self._slots.get(operator_id)
+        if slot is None:
+            slot = self._take_slot(operator_id)
+        self._set_weight(slot, max(weight, 0))
+
+    def remove(self, operator_id: int) -> None:
+        slot = self._slots.pop(operator_id, None)
+        if slot is None:
+            return
+        self._set_weight(slot, 0)
+        self._operators[slot] = None
+        self._free.append(slot)
+
+    def select(self) -> Optional[int]:
+        if self._total <= 0:
+            return None
+
+        # Smallest slot whose prefix sum of weights exceeds target
+        target = self._random.randrange(self._total)
+        size = len(self._weights)
+        position = 0
+        step = 1 << size.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= size and self._tree[next_position] <= target:
+                position = next_position
+                target -= self._tree[next_position]
+            step >>= 1
+        return self._operators[position]
+
+    def _take_slot(self, operator_id: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self._operators[slot] = operator_id
+        else:
+            slot = len(self._weights)
+            self._operators.append(operator_id)
+            self._weights.append(0)
+            # Index of the new node covers (slot + 1 - lowbit, slot + 1]
+            index = slot + 1
+            lowbit = index & -index
+            self._tree.append(sum(self._weights[index - lowbit:index]))
+        self._slots[operator_id] = slot
+        return slot
+
+    def _set_weight(self, slot: int, weight: int) -> None:
+        delta = weight - self._weights[slot]
+        if not delta:
+            return
+        self._weights[slot] = weight
+        self._total += delta
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+
+STRATEGIES: Dict[str, Type[DistributionStrategy]] = {
+    strategy.name: strategy
+    for strategy in (
+        WeightedLoadStrategy,
+        LeastLoadedStrategy,
+        CapacityRatioStrategy,
+        SmoothRoundRobinStrategy,
+        WeightedRandomStrategy,
+    )
+}
+
+
+# Misspelled names in config fail at start, not on the first contact
+for _name in {config.DISTRIBUTION_STRATEGY, *config.DISTRIBUTION_STRATEGY_BY_SOURCE.values()}:
+    if _name not in STRATEGIES:
+        raise ValueError(
+            f"Unknown distribution strategy '{_name}', "
+            f"expected one of: {', '.join(STRATEGIES)}"
+        )
+
+
+def make_strategy(source_id: int) -> DistributionStrategy:
+    name = config.DISTRIBUTION_STRATEGY_BY_SOURCE.get(source_id, config.DISTRIBUTION_STRATEGY)
+    return STRATEGIES[name]()
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+from pydantic import BaseModel
+
+import config
+from repositories.repo_idempotency import IdempotencyRepository
+from exceptions.exc_service import IdempotencyConflictException, IdempotencyKeyReusedException
+
+
+class IdempotencyEntry:
+    __slots__ = ("response",)
+
+    def __init__(self) -> None:
+        # None while the first request is still in progress
+        self.response: Any = None
+
+
+# Responses by Idempotency-Key, stored in the database and shared by all workers.
+# Keys are scoped by endpoint, the request body is kept only as a digest
+class IdempotencyStore:
+    def __init__(
+        self,
+        repository: IdempotencyRepository,
+        ttl: float = config.IDEMPOTENCY_TTL,
+        lock_timeout: float = config.IDEMPOTENCY_LOCK_TIMEOUT,
+    ) -> None:
+        self.repo = repository
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    @staticmethod
+    def fingerprint(data: Dict[str, Any]) -> bytes:
+        body = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(body.encode()).digest()
+
+    # Yields the entry of the key. If entry.response is set, it is a replay
+    # and the caller returns it, otherwise the caller stores its response
+    # in entry.response. On error the key is released for a retry.
+    # A key of a worker that died mid-request is free after lock_timeout
+    @asynccontextmanager
+    async def claim(self, scope: str, key: str, data: Dict[str, Any]) -> AsyncIterator[IdempotencyEntry]:
+        fingerprint = self.fingerprint(data)
+        now = time.time()
+        entry = IdempotencyEntry()
+
+        existing = await self.repo.reserve(scope, key, fingerprint, now, now + self.lock_timeout)
+        if existing is not None:
+            existing_fingerprint, response = existing
+            if existing_fingerprint != fingerprint:
+                raise IdempotencyKeyReusedException(
+                    detail=f"Idempotency-Key {key} was already used with another request body"
+                )
+            if response is None:
+                raise IdempotencyConflictException(
+                    detail=f"Request with Idempotency-Key {key} is still in progress"
+                )
+            entry.response = response
+            yield entry
+            return
+
+        try:
+            yield entry
+        except Exception:
+            await self.repo.release(scope, key)
+            raise
+
+        if entry.response is None:
+            await self.repo.release(scope, key)
+            return
+
+        response = entry.response
+        if isinstance(response, BaseModel):
+            response = response.model_dump(mode="json")
+        await self.repo.save_response(scope, key, response, time.time() + self.ttl)
@@ -0,0 +1,272 @@
+import asyncio
+import csv
+import json
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+import config
+from repositories.repo_lead import LeadRepository
+from repositories.repo_source import SourceRepository
+from repositories.repo_base import retry_on_lock
+from repositories.lead_cache import lead_cache
+from services.unit_of_work import UnitOfWork
+from schemas.schema_lead import ImportLead
+
+from exceptions.exc_base import RepositoryException
+from exceptions.exc_service import ServiceException
+
+# (line number, error)
+RowError = Tuple[int, str]
+# (line number, validated row)
+ParsedRow = Tuple[int, Dict[str, Any]]
+
+
+# Runs in a worker of the executor, so it must stay a picklable module function.
+# numbers holds the line number of every record of the chunk
+def parse_chunk(
+    format: str,
+    header: Optional[List[str]],
+    lines: List[bytes],
+    numbers: List[int],
+) -> Tuple[List[ParsedRow], List[RowError]]:
+    rows: List[ParsedRow] = []
+    errors: List[RowError] = []
+
+    decoded: List[str] = []
+    decoded_numbers: List[int] = []
+    for number, line in zip(numbers, lines):
+        try:
+            decoded.append(decode_line(line))
+            decoded_numbers.append(number)
+        except UnicodeDecodeError as e:
+            errors.append((number, f"Invalid UTF-8: {e.reason} at position {e.start}"))
+
+    for number, record in zip(decoded_numbers, decoded):
+        try:
+            if format != "csv":
+                record = json.loads(record)
+            else:
+                # One record per reader, a broken record fails alone
+                record = next(csv.DictReader([record], fieldnames=header))
+                # Empty CSV cells mean "no value"
+                record = {key: value for key, value in record.items() if value not in ("", None)}
+            lead = ImportLead.model_validate(record)
+            rows.append((number, lead.model_dump()))
+
+        except json.JSONDecodeError as e:
+            errors.append((number, f"Invalid JSON: {e.msg}"))
+        except csv.Error as e:
+            errors.append((number, f"Invalid CSV: {e}"))
+        except ValidationError as e:
+            errors.append((number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+                for error in e.errors()
+            )))
+
+    return rows, errors
+
+
+def decode_line(line: bytes) -> str:
+    return line.decode("utf-8-sig").rstrip("\r")
+
+
+# Lines stay undecoded, a line that isn't valid UTF-8 fails as a row error
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    rest = b""
+    async for chunk in chunks:
+        rest += chunk
+        *lines, rest = rest.split(b"\n")
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+# Records of the file: NDJSON line by line, while a CSV record goes on until
+# its quotes are balanced, a quoted cell may hold newlines. An escaped quote ""
+# keeps the parity and the quote byte never occurs inside a UTF-8 sequence
+async def iter_records(chunks: AsyncIterable[bytes], format: str = "ndjson") -> AsyncIterator[bytes]:
+    lines: List[bytes] = []
+    quotes = 0
+    async for line in iter_lines(chunks):
+        if format != "csv":
+            yield line
+            continue
+        lines.append(line)
+        quotes += line.count(b'"')
+        if quotes % 2 == 0:
+            yield b"\n".join(lines)
+            lines, quotes = [], 0
+    if lines:
+        yield b"\n".join(lines)
+
+
+# Worker processes shared by the imports of the API, started by the first
+# import and shut down with the application
+class ImportExecutor:
+    def __init__(self, max_workers: int = config.LEAD_IMPORT_WORKERS) -> None:
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def get(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def shutdown(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+import_executor = ImportExecutor()
+
+
+# Parsing and validation of chunks run in the executor, while a single writer
+# upserts validated chunks in order, one transaction per chunk.
+# Errors are collected per row, a failed chunk doesn't stop the import
+class LeadImporter:
+    def __init__(
+        self,
+        lead_repository: LeadRepository,
+        source_repository: SourceRepository,
+        executor: Optional[Executor] = None,
+        chunk_size: int = config.LEAD_IMPORT_CHUNK_SIZE,
+        max_pending: int = config.LEAD_IMPORT_MAX_PENDING,
+        max_errors: int = config.LEAD_IMPORT_MAX_ERRORS,
+    ) -> None:
+        self.repo_lead = lead_repository
+        self.repo_source = source_repository
+        self.executor = executor
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending
+        self.max_errors = max_errors
+        self.uow = UnitOfWork(lead_repository.db)
+        self.report: Dict[str, Any] = {
+            "processed": 0,
+            "imported": 0,
+            "linked": 0,
+            "failed": 0,
+            "errors": [],
+            "errors_truncated": False,
+        }
+
+    async def run(
+        self,
+        lines: AsyncIterable[bytes],
+        format: str = "ndjson",
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        pending: Deque[asyncio.Future] = deque()
+
+        async for numbers, header, chunk in self._chunks(lines, format):
+            pending.append(loop.run_in_executor(
+                self.executor, parse_chunk, format, header, chunk, numbers
+            ))
+            if len(pending) >= self.max_pending:
+                await self._write(*await pending.popleft())
+                if on_progress:
+                    on_progress(self.report)
+
+        while pending:
+            await self._write(*await pending.popleft())
+            if on_progress:
+                on_progress(self.report)
+
+        return self.report
+
+    async def _chunks(
+        self,
+        lines: AsyncIterable[bytes],
+        format: str,
+    ) -> AsyncIterator[Tuple[List[int], Optional[List[str]], List[bytes]]]:
+        header: Optional[List[str]] = None
+        chunk: List[bytes] = []
+        numbers: List[int] = []
+        number = 0
+
+        async for line in lines:
+            # Errors point to the first line of a record spanning several
+            first = number + 1
+            number += 1 + line.count(b"\n")
+            if not line.strip():
+                continue
+            if format == "csv" and header is None:
+                try:
+                    header = next(csv.reader([decode_line(line)]))
+                except UnicodeDecodeError as e:
+                    raise ServiceException(
+                        status_code=400,
+                        detail=f"Invalid UTF-8 in CSV header on line {first}: {e.reason}"
+                    )
+                continue
+            chunk.append(line)
+            numbers.append(first)
+
+            if len(chunk) >= self.chunk_size:
+                yield numbers, header, chunk
+                chunk, numbers = [], []
+
+        if chunk:
+            yield numbers, header, chunk
+
+    async def _write(self, rows: List[ParsedRow], errors: List[RowError]) -> None:
+        self.report["processed"] += len(rows) + len(errors)
+        written = [number for number, _ in rows]
+
+        try:
+            lead_ids, linked, missing = await self._store(rows)
+            errors.extend(missing)
+
+            self.report["imported"] += len(lead_ids)
+            self.report["linked"] += linked
+            # Upserts bypass the ORM, so cached misses are dropped explicitly
+            lead_cache.invalidate(lead_ids)
+
+        except (RepositoryException, ServiceException) as e:
+            errors.extend((number, f"Database error: {e.detail}") for number in written)
+
+        self.report["failed"] += len(errors)
+        room = self.max_errors - len(self.report["errors"])
+        self.report["errors"].extend(
+            {"line": number, "error": error} for number, error in sorted(errors)[:max(room, 0)]
+        )
+        if len(errors) > room:
+            self.report["errors_truncated"] = True
+
+    # One chunk in one transaction. Returns lead ids by external_id, 
+    # number of new links and rows with unknown sources
+    @retry_on_lock
+    async def _store(self, rows: List[ParsedRow]) -> Tuple[Dict[str, int], int, List[RowError]]:
+        missing: List[RowError] = []
+        
+        async with self.uow:
+            # Unknown source would fail the whole statement on the foreign key
+            source_ids = await self.repo_source.get_existing_ids(
+                {row["source_id"] for _, row in rows if row["source_id"] is not None}
+            )
+            # Last row wins, one statement can't update the same lead twice
+            leads: Dict[str, Dict[str, Any]] = {}
+            links = set()
+            for number, row in rows:
+                if row["source_id"] is not None:
+                    if row["source_id"] not in source_ids:
+                        missing.append((number, f"source_id: Source with id={row['source_id']} not found"))
+                        continue
+                    links.add((row["external_id"], row["source_id"]))
+                previous = leads.get(row["external_id"], {})
+                leads[row["external_id"]] = {
+                    "external_id": row["external_id"],
+                    "name": row["name"] if row["name"] is not None else previous.get("name"),
+                }
+
+            lead_ids = await self.repo_lead.upsert_many(list(leads.values()))
+            linked = await self.repo_lead.add_source_links_ignore_existing(
+                (lead_ids[external_id], source_id) for external_id, source_id in links
+            )
+        
+        return lead_ids, linked, missing
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Set, Union
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+from models import Operator, OperatorSourcePriority
+from repositories.session_changes import SessionChanges
+
+logger = logging.getLogger(__name__)
+
+
+# Assigns IN_QUEUE contacts in the background. Runs a pass when a committed
+# transaction freed operator capacity and every sweep_interval as a fallback
+# for changes made by other processes
+class QueueWorker:
+    def __init__(
+        self,
+        batch_size: int = config.QUEUE_WORKER_BATCH_SIZE,
+        sweep_interval: float = config.QUEUE_WORKER_SWEEP_INTERVAL,
+    ) -> None:
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self._wakeup = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # redistribute opens its own session and returns the number of assigned contacts
+    def start(self, redistribute: Callable[[int], Awaitable[int]]) -> None:
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        # First pass picks up contacts queued before the start
+        self._wakeup.set()
+        self._task = self._loop.create_task(self._run(redistribute))
+
+    async def stop(self) -> None:
+        task, self._task, self._loop = self._task, None, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    # Safe to call from any thread, does nothing while the worker is stopped
+    def notify(self) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self, redistribute: Callable[[int], Awaitable[int]]) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.sweep_interval)
+            except TimeoutError:
+                pass
+            # Cleared before the pass: capacity freed during it triggers one more
+            self._wakeup.clear()
+
+            try:
+                assigned = await redistribute(self.batch_size)
+                if assigned:
+                    logger.info("Assigned %d queued contacts", assigned)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to redistribute queued contacts")
+
+
+queue_worker = QueueWorker()
+
+
+# Tables whose changes may free capacity, reported only after commit
+_freed_capacity: SessionChanges[Set[str]] = SessionChanges("queue_capacity_freed", set)
+
+
+# Bulk release of capacity bypasses flush, it's staged explicitly
+def stage_capacity_freed(session: Union[Session, AsyncSession]) -> None:
+    _freed_capacity.of(session).add(Operator.__tablename__)
+
+
+# New or changed operators and priorities may let queued contacts through
+@_freed_capacity.collector
+def _collect_freed_capacity(session: Session, tables: Set[str]) -> None:
+    for object in session.new | session.dirty:
+        if isinstance(object, (Operator, OperatorSourcePriority)):
+            tables.add(object.__tablename__)
+
+
+@_freed_capacity.applier
+def _notify_freed_capacity(session: Session, tables: Set[str]) -> None:
+    queue_worker.notify()
@@ -0,0 +1,180 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import config
+from repositories.session_changes import SessionChanges
+
+# Cached GET routes and tables their responses are built from
+CACHED_ROUTES: Dict[str, Tuple[str, ...]] = {
+    "/operators/": ("operators",),
+    "/sources/": ("sources",),
+    "/priorities/": ("operator_source_priorities",),
+}
+
+
+class CachedResponse(NamedTuple):
+    versions: Tuple[int, ...]
+    etag: str
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+# Version of every table, bumped after commit of a transaction that wrote it.
+# A cached response is valid while versions of its tables are unchanged
+class TableVersions:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def get(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, tables: Iterable[str]) -> None:
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+
+class ResponseCache:
+    def __init__(self, max_size: int = config.RESPONSE_CACHE_SIZE) -> None:
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.max_size = max_size
+
+    def get(self, key: str, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.versions != versions:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CachedResponse) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+table_versions = TableVersions()
+response_cache = ResponseCache()
+
+
+# Written tables are collected on flush and by ORM bulk statements,
+# versions are bumped only after commit
+_written_tables: SessionChanges[Set[str]] = SessionChanges("response_cache_tables", set)
+
+
+@_written_tables.collector
+def _collect_flushed_tables(session: Session, tables: Set[str]) -> None:
+    for object in session.new | session.dirty | session.deleted:
+        table = getattr(object, "__tablename__", None)
+        if table:
+            tables.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tables(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None:
+        _written_tables.of(orm_execute_state.session).add(table.name)
+
+
+@_written_tables.applier
+def _bump_table_versions(session: Session, tables: Set[str]) -> None:
+    table_versions.bump(tables)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+# Serves GET of CACHED_ROUTES from ResponseCache and answers 304
+# when If-None-Match has the ETag (hash of the body) of the current response
+class ResponseCacheMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        tables = CACHED_ROUTES.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if tables is None or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode())))
+        key = f"{scope['path']}?{query}"
+        if_none_match = next(
+            (value.decode() for name, value in scope["headers"] if name == b"if-none-match"), None
+        )
+        # Taken before the request, a write during it makes the entry outdated
+        versions = table_versions.get(tables)
+
+        entry = response_cache.get(key, versions)
+        if entry is None:
+            start, body = await self._capture(scope, receive)
+
+            # Errors are not cached, the captured response goes out as is
+            if start.get("status") != 200:
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            entry = self._make_entry(start, body, versions)
+            response_cache.set(key, entry)
+
+        if _etag_matches(if_none_match, entry.etag):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", entry.etag.encode()), (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({"type": "http.response.start", "status": 200, "headers": entry.headers})
+        await send({"type": "http.response.body", "body": entry.body})
+
+    async def _capture(self, scope: Scope, receive: Receive) -> Tuple[Dict, bytes]:
+        start: Dict = {}
+        chunks: List[bytes] = []
+
+        async def capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+        return start, b"".join(chunks)
+
+    @staticmethod
+    def _make_entry(start: Dict, body: bytes, versions: Tuple[int, ...]) -> CachedResponse:
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = [
+            (name, value) for name, value in start.get("headers", [])
+            if name not in (b"etag", b"cache-control")
+        ]
+        headers += [(b"etag", etag.encode()), (b"cache-control", b"no-cache")]
+        return CachedResponse(versions, etag, headers, body)
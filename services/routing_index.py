@@ -0,0 +1,309 @@
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Operator, OperatorSourcePriority, Source
+from repositories.session_changes import SessionChanges
+from services.distribution_strategies import DistributionStrategy, make_strategy
+
+
+class OperatorState(NamedTuple):
+    current_loading: int
+    max_loading: int
+    active: bool
+
+
+# Process-local index of routable operators per source.
+# Every source has its own DistributionStrategy (see config), 
+# kept incrementally: operators able to take a contact are passed 
+# to it on every change, the others are removed from it
+class RoutingIndex:
+    def __init__(
+        self, 
+        strategy_factory: Callable[[int], DistributionStrategy] = make_strategy
+    ) -> None:
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._strategy_factory = strategy_factory
+        self._operators: Dict[int, OperatorState] = {}
+        self._weights: Dict[int, Dict[int, int]] = {}
+        self._sources_by_operator: Dict[int, Set[int]] = {}
+        self._strategies: Dict[int, DistributionStrategy] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    def load(
+        self,
+        operators: Iterable[Tuple[int, int, int, bool]],
+        priorities: Iterable[Tuple[int, int, int]],
+    ) -> None:
+        with self._lock:
+            self._reset()
+            for operator_id, current_loading, max_loading, active in operators:
+                self._operators[operator_id] = OperatorState(
+                    current_loading, max_loading, active
+                )
+            for operator_id, source_id, weight in priorities:
+                self._weights.setdefault(source_id, {})[operator_id] = weight
+                self._sources_by_operator.setdefault(operator_id, set()).add(source_id)
+            for source_id, weights in self._weights.items():
+                for operator_id in weights:
+                    self._push(source_id, operator_id)
+            self._loaded = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+    def select(self, source_id: int) -> Optional[int]:
+        with self._lock:
+            strategy = self._strategies.get(source_id)
+            return strategy.select() if strategy else None
+
+    def has_candidate(self, source_id: int) -> bool:
+        return self.select(source_id) is not None
+
+    # Operator got a contact of the source, strategies taking turns move on
+    def advance(self, source_id: int, operator_id: int) -> None:
+        with self._lock:
+            strategy = self._strategies.get(source_id)
+            if strategy:
+                strategy.advance(operator_id)
+
+    # Same eligibility the strategies get, for a known operator
+    def can_take(self, source_id: int, operator_id: int) -> bool:
+        with self._lock:
+            return self._weight_if_eligible(source_id, operator_id) is not None
+
+    def upsert_operator(
+        self,
+        operator_id: int,
+        current_loading: int,
+        max_loading: int,
+        active: bool,
+    ) -> None:
+        with self._lock:
+            state = OperatorState(current_loading, max_loading, active)
+            if self._operators.get(operator_id) == state:
+                return
+            self._operators[operator_id] = state
+            for source_id in self._sources_by_operator.get(operator_id, ()):
+                self._push(source_id, operator_id)
+
+    # With only_source_id the other sources of the operator 
+    # keep the old loading until refresh
+    def increment_loading(self, operator_id: int, only_source_id: Optional[int] = None) -> None:
+        with self._lock:
+            state = self._operators[operator_id]
+            if only_source_id is None:
+                self.upsert_operator(
+                    operator_id,
+                    state.current_loading + 1,
+                    state.max_loading,
+                    state.active,
+                )
+                return
+
+            self._operators[operator_id] = state._replace(current_loading=state.current_loading + 1)
+            self._push(only_source_id, operator_id)
+
+    def refresh(self, source_id: int, operator_ids: Iterable[int]) -> None:
+        with self._lock:
+            for operator_id in operator_ids:
+                if operator_id in self._weights.get(source_id, {}):
+                    self._push(source_id, operator_id)
+
+    # Active operators without free capacity
+    def full_operators(self) -> Set[int]:
+        with self._lock:
+            return {
+                operator_id
+                for operator_id, state in self._operators.items()
+                if state.active and state.current_loading >= state.max_loading
+            }
+
+    def sources_of(self, operator_id: int) -> Set[int]:
+        with self._lock:
+            return set(self._sources_by_operator.get(operator_id, ()))
+
+    def remove_operator(self, operator_id: int) -> None:
+        with self._lock:
+            self._operators.pop(operator_id, None)
+            for source_id in self._sources_by_operator.pop(operator_id, set()):
+                self._weights.get(source_id, {}).pop(operator_id, None)
+                if source_id in self._strategies:
+                    self._strategies[source_id].remove(operator_id)
+
+    def set_priority(self, operator_id: int, source_id: int, weight: int) -> None:
+        with self._lock:
+            self._weights.setdefault(source_id, {})[operator_id] = weight
+            self._sources_by_operator.setdefault(operator_id, set()).add(source_id)
+            self._push(source_id, operator_id)
+
+    def remove_priority(self, operator_id: int, source_id: int) -> None:
+        with self._lock:
+            self._weights.get(source_id, {}).pop(operator_id, None)
+            self._sources_by_operator.get(operator_id, set()).discard(source_id)
+            if source_id in self._strategies:
+                self._strategies[source_id].remove(operator_id)
+
+    # All priorities of the operator, sources missing in weights are dropped
+    def replace_priorities(self, operator_id: int, weights: Dict[int, int]) -> None:
+        with self._lock:
+            for source_id in self._sources_by_operator.get(operator_id, set()) - weights.keys():
+                self.remove_priority(operator_id, source_id)
+            for source_id, weight in weights.items():
+                self.set_priority(operator_id, source_id, weight)
+
+    def remove_source(self, source_id: int) -> None:
+        with self._lock:
+            for operator_id in self._weights.pop(source_id, {}):
+                self._sources_by_operator.get(operator_id, set()).discard(source_id)
+            self._strategies.pop(source_id, None)
+
+    def _reset(self) -> None:
+        self._loaded = False
+        self._operators.clear()
+        self._weights.clear()
+        self._sources_by_operator.clear()
+        self._strategies.clear()
+
+    def _push(self, source_id: int, operator_id: int) -> None:
+        strategy = self._strategies.get(source_id)
+        if strategy is None:
+            strategy = self._strategies[source_id] = self._strategy_factory(source_id)
+
+        weight = self._weight_if_eligible(source_id, operator_id)
+        if weight is None:
+            strategy.remove(operator_id)
+            return
+
+        state = self._operators[operator_id]
+        strategy.update(operator_id, weight, state.current_loading, state.max_loading)
+
+    def _weight_if_eligible(self, source_id: int, operator_id: int) -> Optional[int]:
+        state = self._operators.get(operator_id)
+        weight = self._weights.get(source_id, {}).get(operator_id)
+        if (
+            state is None 
+            or weight is None 
+            or not state.active 
+            or state.current_loading >= state.max_loading
+        ):
+            return None
+        return weight
+
+
+# Assigns contacts one by one against an index snapshot with the same
+# result as select + increment_loading per contact, but the new loading 
+# of a chosen operator goes only to the strategy of the current source.
+# Strategies of its other sources get it when they are asked next, once 
+# per changed operator instead of once per contact
+class BatchAssigner:
+    def __init__(self, index: RoutingIndex) -> None:
+        self.index = index
+        self._pending: Dict[int, Set[int]] = {}
+        self._sources: Dict[int, Set[int]] = {}
+
+    def select(self, source_id: int) -> Optional[int]:
+        pending = self._pending.pop(source_id, None)
+        if pending:
+            self.index.refresh(source_id, pending)
+        return self.index.select(source_id)
+
+    def has_candidate(self, source_id: int) -> bool:
+        return self.select(source_id) is not None
+
+    def can_take(self, source_id: int, operator_id: int) -> bool:
+        # Operator states are always current, only strategies lag
+        return self.index.can_take(source_id, operator_id)
+
+    def take(self, source_id: int, operator_id: int) -> None:
+        pending = self._pending.pop(source_id, None)
+        if pending:
+            self.index.refresh(source_id, pending)
+        self.index.increment_loading(operator_id, only_source_id=source_id)
+        self.index.advance(source_id, operator_id)
+
+        sources = self._sources.get(operator_id)
+        if sources is None:
+            sources = self._sources[operator_id] = self.index.sources_of(operator_id)
+        for other_source_id in sources:
+            if other_source_id != source_id:
+                self._pending.setdefault(other_source_id, set()).add(operator_id)
+
+    def assign(self, source_id: int) -> Optional[int]:
+        operator_id = self.select(source_id)
+        if operator_id is not None:
+            self.take(source_id, operator_id)
+        return operator_id
+
+    # Brings every strategy up to date, the index is usable directly again
+    def flush(self) -> None:
+        for source_id, operator_ids in self._pending.items():
+            self.index.refresh(source_id, operator_ids)
+        self._pending.clear()
+        self._sources.clear()
+
+
+routing_index = RoutingIndex()
+
+
+# Keep index in sync with committed ORM changes
+_routing_changes: SessionChanges[List[Tuple]] = SessionChanges("routing_index_changes", list)
+
+
+# Bulk UPDATE statements bypass flush, their results are staged explicitly
+def stage_operator_state(session: Union[Session, AsyncSession], operator: Operator) -> None:
+    _routing_changes.of(session).append((
+        "operator",
+        operator.id,
+        operator.current_loading,
+        operator.max_loading,
+        operator.active,
+    ))
+
+
+@_routing_changes.collector
+def _collect_routing_changes(session: Session, changes: List[Tuple]) -> None:
+    for object in session.new | session.dirty:
+        if isinstance(object, Operator):
+            changes.append((
+                "operator",
+                object.id,
+                object.current_loading,
+                object.max_loading,
+                object.active,
+            ))
+        elif isinstance(object, OperatorSourcePriority):
+            changes.append(("priority", object.operator_id, object.source_id, object.weight))
+
+    for object in session.deleted:
+        if isinstance(object, Operator):
+            changes.append(("operator_deleted", object.id))
+        elif isinstance(object, OperatorSourcePriority):
+            changes.append(("priority_deleted", object.operator_id, object.source_id))
+        elif isinstance(object, Source):
+            changes.append(("source_deleted", object.id))
+
+
+@_routing_changes.applier
+def _apply_routing_changes(session: Session, changes: List[Tuple]) -> None:
+    if not routing_index.is_loaded:
+        return
+
+    for kind, *values in changes:
+        if kind == "operator":
+            routing_index.upsert_operator(*values)
+        elif kind == "priority":
+            routing_index.set_priority(*values)
+        elif kind == "operator_deleted":
+            routing_index.remove_operator(*values)
+        elif kind == "priority_deleted":
+            routing_index.remove_priority(*values)
+        elif kind == "source_deleted":
+            routing_index.remove_source(*values)
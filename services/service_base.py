@@ -2,6 +2,7 @@ from typing import Generic, TypeVar
 
 from models import Base
 from repositories.repo_base import BaseRepository
+from services.unit_of_work import UnitOfWork
 
 RepoType = TypeVar("RepoType", bound=BaseRepository)
 ModelType = TypeVar("ModelType", bound=Base)
@@ -9,5 +10,6 @@ ModelType = TypeVar("ModelType", bound=Base)
 class BaseService(Generic[RepoType, ModelType]):
     def __init__(self, repo: RepoType) -> None:
         self.repo = repo
+        self.uow = UnitOfWork(repo.db)
     
     
\ No newline at end of file
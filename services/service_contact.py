@@ -1,21 +1,65 @@
-from typing import Dict, Any, Optional, TYPE_CHECKING
+import csv
+import io
+import json
+from collections import Counter
+import functools
+from typing import Dict, Any, Optional, List, AsyncIterator, Awaitable, Callable, Iterable, Union, TYPE_CHECKING
+
+from sqlalchemy.exc import IntegrityError
 
 if TYPE_CHECKING:
-    from models import Operator
+    from schemas.schema_contact import FilterContact
 
 from repositories.repo_source import SourceRepository
 from repositories.repo_operator import OperatorRepository
 from repositories.repo_contact import DistributeRepository
 from repositories.repo_lead import LeadRepository
+from repositories.repo_base import caused_by, retry_on_lock
 
 from models import Contact
 
 from services.service_base import BaseService
+from services.routing_index import BatchAssigner, RoutingIndex, routing_index, stage_operator_state
+from services.queue_worker import stage_capacity_freed
+from repositories.lead_affinity import LeadAffinity, lead_affinity
+
+from monitoring.metrics import distribution_outcomes_total
+
+import config
 
 from dependencies.custom_enum import StatusList
-from exceptions.exc_service import UnexpectedException
+from exceptions.exc_service import UnexpectedException, NotFoundException, ServiceException
 from exceptions.exc_base import RepositoryException
     
+# Candidates tried when the index is behind the database
+MAX_CLAIM_ATTEMPTS = 10
+
+EXPORT_COLUMNS = ["id", "lead_id", "source_id", "operator_id", "status", "created_at", "updated_at"]
+
+
+# Lead deleted by another worker stays in the lead cache of this one until
+# its TTL, the source link or the contact fails on the foreign key.
+# Cached ids of the leads are forgotten and the method runs once more
+def retry_on_stale_lead(
+    external_ids: Callable[..., Iterable[str]]
+) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    def decorator(method: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await method(self, *args, **kwargs)
+            
+            except Exception as e:
+                # Nested in another unit of work: its owner rolls back
+                if self.repo.in_unit_of_work or not caused_by(e, lambda cause: isinstance(cause, IntegrityError)):
+                    raise
+            
+            await self.repo.db.rollback()
+            self.repo_lead.cache.invalidate(external_ids(*args, **kwargs))
+            return await method(self, *args, **kwargs)
+        
+        return wrapper
+    return decorator
 
 
 class DistributeService(BaseService[DistributeRepository, Contact]):
@@ -24,112 +68,372 @@ class DistributeService(BaseService[DistributeRepository, Contact]):
         source_repository: SourceRepository,
         operator_repository: OperatorRepository,
         lead_repository: LeadRepository,
-        distribute_repository: DistributeRepository
+        distribute_repository: DistributeRepository,
+        index: RoutingIndex = routing_index,
+        affinity: LeadAffinity = lead_affinity
     ):
         super().__init__(repo=distribute_repository)
         self.repo_source = source_repository
         self.repo_operator = operator_repository
         self.repo_lead = lead_repository 
+        self.routing_index = index
+        self.affinity = affinity
     
-    def update(self, id: int, data: Dict[str, Any]) -> Contact:
-        if data.get('status', None):
-            contact = self.repo.get(id)
-            
-            if data['status'] == StatusList.DONE:
+    @retry_on_lock
+    async def update(self, id: int, data: Dict[str, Any]) -> Contact:
+        async with self.uow:
+            if data.get('status', None):
+                contact = await self.repo.get(id)
                 
-                if contact.operator_id:
-                    operator = self.repo_operator.get(contact.operator_id)
-                    operator.decrement_current_loading()
-                    self.repo.save()
-            
+                if data['status'] == StatusList.DONE:
                     
-        return self.repo.update(id, data)
+                    if contact.operator_id and contact.status != StatusList.DONE:
+                        await self.release_operator(contact.operator_id)
+                
+                        
+            return await self.repo.update(id, data)
     
-    def delete(self, object: Contact) -> None:
+    @retry_on_lock
+    async def delete(self, object: Contact) -> None:
         try:
-            if  object.operator_id:
-                operator = self.repo_operator.get(object.operator_id)
-                operator.decrement_current_loading()
-                
-            self.repo.delete(object)
-            self.repo.save()
+            async with self.uow:
+                if  object.operator_id and object.status != StatusList.DONE:
+                    await self.release_operator(object.operator_id)
+                    
+                await self.repo.delete(object)
             
         except RepositoryException as e:
-            self.repo.db.rollback()
             raise
         except Exception as e:
-            self.repo.db.rollback()
             raise UnexpectedException(
                 status_code=500,
                 detail=f"Unexpected Error in Service Contact: {e}"
             ) from e
     
-    def distribute_lead(self, data: Dict[str, Any]) -> Contact:
+    @retry_on_lock
+    @retry_on_stale_lead(lambda data: [data['external_id']])
+    async def distribute_lead(self, data: Dict[str, Any]) -> Contact:
         try:
-            # Find or create lead
-
-            lead = self.repo_lead.find_by_external_id(data['external_id'])
-            
-            if lead is None:
-                copy_data = data.copy()
-                del copy_data['source_id']
-                lead = self.repo_lead.create(copy_data)
-            
-            # Get source and add to lead. For model LeadsSources
-            # SQLALchemy auto prevent add duplicate for relationship fields
-            source = self.repo_source.get(data['source_id'])
-            lead.sources.append(source)
-            operator = self.select_best_operator(data['source_id'])
-            
-            contact_data: Dict[str, Any] = {
-                "lead_id": lead.id,
-                "source_id": data['source_id']
-            }
+            async with self.uow:
+                # Find or create lead
+    
+                lead_id = await self.repo_lead.find_id_by_external_id(data['external_id'])
+                
+                if lead_id is None:
+                    lead_ids = await self.repo_lead.get_or_create_ids([data['external_id']])
+                    lead_id = lead_ids[data['external_id']]
+                
+                # Link source to lead. For model LeadsSources 
+                # without loading all sources of the lead
+                source = await self.repo_source.get(data['source_id'])
+                await self.repo_lead.add_source_links_ignore_existing([(lead_id, source.id)])
+                operator_id = await self.claim_best_operator(data['source_id'], lead_id)
+                
+                contact_data: Dict[str, Any] = {
+                    "lead_id": lead_id,
+                    "source_id": data['source_id']
+                }
+                
+                if operator_id:
+                    contact_data.update(
+                        {
+                            "operator_id": operator_id, 
+                            "status": StatusList.NEW
+                        }
+                    )
+    
+                # Create contact with operator or not  
+                new_contact = await self.repo.create(object=contact_data)
             
-            if operator:
-                contact_data.update(
-                    {
-                        "operator_id": operator.id, 
-                        "status": StatusList.NEW
+            distribution_outcomes_total.inc("assigned" if operator_id else "queued")
+            return new_contact
+        
+        except Exception as e:
+            raise UnexpectedException(
+                status_code=500,
+                detail=f"Unexpected Error in Service Contact: {e}"
+            ) from e
+    
+    @retry_on_lock
+    @retry_on_stale_lead(lambda items: [item['external_id'] for item in items])
+    async def distribute_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        try:
+            async with self.uow:
+                source_ids = {item['source_id'] for item in items}
+                missing_source_ids = source_ids - await self.repo_source.get_existing_ids(source_ids)
+            
+                if missing_source_ids:
+                    raise NotFoundException(
+                        detail=f"Objects with id={sorted(missing_source_ids)} not found "
+                               "in Model Source"
+                    )
+            
+                # Find or create all leads by one query
+                external_ids = list(dict.fromkeys(item['external_id'] for item in items))
+                lead_ids = await self.repo_lead.get_ids_by_external_ids(external_ids)
+                lead_ids.update(await self.repo_lead.get_or_create_ids(
+                    external_id for external_id in external_ids if external_id not in lead_ids
+                ))
+            
+                # Links for model LeadsSources, existing ones are skipped
+                await self.repo_lead.add_source_links_ignore_existing({
+                    (lead_ids[item['external_id']], item['source_id']) 
+                    for item in items
+                })
+            
+                # Assign operators in memory against one snapshot of capacities
+                snapshot = RoutingIndex()
+                snapshot.load(*await self.repo_operator.get_routing_state(source_ids))
+                assigner = BatchAssigner(snapshot)
+                # Lead repeated in the batch goes to the operator it just got
+                batch_affinity: Dict[int, int] = {}
+                await self._ensure_affinity_loaded()
+            
+                contacts_data: List[Dict[str, Any]] = []
+                for item in items:
+                    lead_id = lead_ids[item['external_id']]
+                    contact_data: Dict[str, Any] = {
+                        "lead_id": lead_id,
+                        "source_id": item['source_id']
                     }
-                )
-
-            # Create contact with operator or not  
-            new_contact = self.repo.create(object=contact_data)
-            if new_contact and operator:
-                operator.increment_current_loading()
-                self.repo_operator.save()
+                    operator_id = self._affine_operator(
+                        assigner, item['source_id'], lead_id, batch_affinity.get(lead_id)
+                    )
+                    if operator_id is None:
+                        operator_id = assigner.select(item['source_id'])
                 
-            return new_contact
+                    if operator_id is not None:
+                        assigner.take(item['source_id'], operator_id)
+                        batch_affinity[lead_id] = operator_id
+                        contact_data.update(
+                            {
+                                "operator_id": operator_id, 
+                                "status": StatusList.NEW
+                            }
+                        )
+                    contacts_data.append(contact_data)
+                
+                # Claim capacity per operator in SQL. If the snapshot is outdated
+                # and the claim fails, contacts of that operator stay in queue
+                claimed = Counter(
+                    contact_data['operator_id'] 
+                    for contact_data in contacts_data 
+                    if contact_data.get('operator_id')
+                )
+                for operator_id, count in list(claimed.items()):
+                    operator = await self.repo_operator.claim_capacity(operator_id, count)
+                    
+                    if operator:
+                        stage_operator_state(self.repo.db, operator)
+                        continue
+                    
+                    del claimed[operator_id]
+                    for contact_data in contacts_data:
+                        if contact_data.get('operator_id') == operator_id:
+                            del contact_data['operator_id'], contact_data['status']
+            
+                contacts = await self.repo.add_many(contacts_data)
+            
+            objects = [
+                {
+                    "id": contact.id,
+                    "external_id": item['external_id'],
+                    "lead_id": contact.lead_id,
+                    "source_id": contact.source_id,
+                    "operator_id": contact.operator_id,
+                    "status": contact.status,
+                    "created_at": contact.created_at,
+                    "updated_at": contact.updated_at,
+                }
+                for item, contact in zip(items, contacts)
+            ]
+            assigned_count = sum(claimed.values())
+            distribution_outcomes_total.inc("assigned", amount=assigned_count)
+            distribution_outcomes_total.inc("queued", amount=len(objects) - assigned_count)
+            
+            return {
+                'objects': objects,
+                'total_count': len(objects),
+                'assigned_count': assigned_count,
+                'queued_count': len(objects) - assigned_count,
+            }
         
+        except (RepositoryException, ServiceException) as e:
+            raise
         except Exception as e:
-            self.repo.db.rollback()
             raise UnexpectedException(
                 status_code=500,
                 detail=f"Unexpected Error in Service Contact: {e}"
             ) from e
     
-    def select_best_operator(self, source_id: int) -> Optional[Operator]:
-        try:    
-            available_operators = self.repo_operator.get_available_operator_for_source(source_id)
+    # Errors propagate: queueing the contact would hide a broken routing
+    async def select_best_operator(self, source_id: int) -> Optional[int]:
+        if not self.routing_index.is_loaded:
+            self.routing_index.load(*await self.repo_operator.get_routing_state())
+        
+        return self.routing_index.select(source_id)
+    
+    async def claim_best_operator(self, source_id: int, lead_id: Optional[int] = None) -> Optional[int]:
+        # Returning lead goes to its last operator while that one can take it,
+        # checked against the index without extra queries
+        if lead_id is not None:
+            await self._ensure_affinity_loaded()
+            if not self.routing_index.is_loaded:
+                self.routing_index.load(*await self.repo_operator.get_routing_state())
             
-            if not available_operators:
+            operator_id = self._affine_operator(self.routing_index, source_id, lead_id)
+            if operator_id is not None:
+                operator = await self.repo_operator.claim_capacity(operator_id)
+                if operator:
+                    stage_operator_state(self.repo.db, operator)
+                    self.routing_index.advance(source_id, operator.id)
+                    return operator.id
+        
+        for _ in range(MAX_CLAIM_ATTEMPTS):
+            operator_id = await self.select_best_operator(source_id)
+            
+            if operator_id is None:
                 return None
+            
+            operator = await self.repo_operator.claim_capacity(operator_id)
+            
+            if operator:
+                stage_operator_state(self.repo.db, operator)
+                self.routing_index.advance(source_id, operator.id)
+                return operator.id
+            
+            # Zero rows matched: operator got full or inactive in another request.
+            # Refresh it in the index and try the next candidate
+            state = await self.repo_operator.get_loading_state(operator_id)
+            if state is None:
+                self.routing_index.remove_operator(operator_id)
+            else:
+                self.routing_index.upsert_operator(operator_id, *state)
+        
+        return None
+    
+    def _affine_operator(
+        self, 
+        index: Union[RoutingIndex, BatchAssigner], 
+        source_id: int, 
+        lead_id: int, 
+        operator_id: Optional[int] = None
+    ) -> Optional[int]:
+        if not config.LEAD_AFFINITY_ENABLED:
+            return None
+        if operator_id is None:
+            operator_id = self.affinity.get(lead_id)
+        if operator_id is not None and index.can_take(source_id, operator_id):
+            return operator_id
+        return None
+    
+    # Warmed once per process from the last contact of every lead
+    async def _ensure_affinity_loaded(self) -> None:
+        if config.LEAD_AFFINITY_ENABLED and not self.affinity.is_loaded:
+            self.affinity.load(await self.repo.get_last_operators(self.affinity.max_size))
+    
+    async def release_operator(self, operator_id: int) -> None:
+        operator = await self.repo_operator.release_capacity(operator_id)
+        
+        if operator:
+            stage_operator_state(self.repo.db, operator)
+            stage_capacity_freed(self.repo.db)
+    
+    # Assigns queued contacts while their sources have free operators.
+    # Per batch: one SELECT of oldest queued ids, then one claim and 
+    # one UPDATE per chosen operator, all in one transaction
+    async def redistribute_queued(self, batch_size: int = 100) -> int:
+        queued = await self.repo.count_by_source(StatusList.IN_QUEUE)
+        if not queued:
+            return 0
+        
+        snapshot = RoutingIndex()
+        snapshot.load(*await self.repo_operator.get_routing_state(queued))
+        assigner = BatchAssigner(snapshot)
+        assigned_count = 0
+        
+        for source_id in sorted(queued):
+            while assigner.has_candidate(source_id):
+                contact_ids = await self.repo.get_queued_ids(source_id, batch_size)
+                
+                plan: Dict[int, List[int]] = {}
+                for contact_id in contact_ids:
+                    operator_id = assigner.assign(source_id)
+                    if operator_id is None:
+                        break
+                    plan.setdefault(operator_id, []).append(contact_id)
+                
+                assigned = await self._assign_queued(plan, snapshot)
+                assigned_count += assigned
                 
-            coefficients = []
-            for operator in available_operators:
-                weight = operator.get_priority_source(source_id)
+                # Queue of the source is empty or every claim lost a race
+                if not assigned or len(contact_ids) < batch_size:
+                    break
+        
+        distribution_outcomes_total.inc("dequeued", amount=assigned_count)
+        return assigned_count
+    
+    @retry_on_lock
+    async def _assign_queued(self, plan: Dict[int, List[int]], snapshot: RoutingIndex) -> int:
+        assigned_count = 0
+        
+        async with self.uow:
+            for operator_id, contact_ids in plan.items():
+                operator = await self.repo_operator.claim_capacity(operator_id, len(contact_ids))
                 
-                if weight is None:
+                if operator is None:
+                    # Snapshot is behind the database, next batch uses real state
+                    state = await self.repo_operator.get_loading_state(operator_id)
+                    if state is None:
+                        snapshot.remove_operator(operator_id)
+                    else:
+                        snapshot.upsert_operator(operator_id, *state)
                     continue
                 
-                coef = weight / max(operator.current_loading, 1)
-                coefficients.append((operator, coef))
-                            
-            coefficients.sort(key=lambda x: (-x[1], x[0].current_loading))  
+                assigned = await self.repo.assign_queued(contact_ids, operator_id)
+                if len(assigned) < len(contact_ids):
+                    # Some contacts were changed by another request meanwhile
+                    operator = await self.repo_operator.release_capacity(
+                        operator_id, len(contact_ids) - len(assigned)
+                    )
+                
+                if operator:
+                    stage_operator_state(self.repo.db, operator)
+                assigned_count += len(assigned)
+        
+        return assigned_count
+    
+    # One chunk per fetched partition: first bytes go out 
+    # before the whole result is read
+    async def export(
+        self, 
+        filter_params: FilterContact, 
+        format: str = "ndjson", 
+        batch_size: int = 1000
+    ) -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        if format == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue()
+        
+        async for rows in self.repo.stream_rows(filter_params, batch_size):
+            rows = [self._export_row(row) for row in rows]
             
-            print(f'Result: operator:{coefficients[0][0].id}, coef: {coefficients[0][1]}')
-            return coefficients[0][0]
-        except Exception as e:
-            print(f"Error in service: contact, function: select_best_operator: {e}")
-            return None
+            if format == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+    
+    @staticmethod
+    def _export_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **row,
+            "status": row["status"].value,
+            "created_at": row["created_at"].isoformat(),
+            "updated_at": row["updated_at"].isoformat(),
+        }
@@ -1,16 +1,44 @@
-from models import Lead
+from models import Lead, Contact
 from repositories.repo_lead import LeadRepository
+from repositories.repo_operator import OperatorRepository
+from repositories.repo_contact import DistributeRepository
+from repositories.repo_base import retry_on_lock
 from services.service_base import BaseService
+from services.routing_index import stage_operator_state
+from services.queue_worker import stage_capacity_freed
 
 class LeadService(BaseService[LeadRepository, Lead]):
-    def __init__(self, lead_repository):
-        self.repo: LeadRepository = lead_repository
+    def __init__(
+        self, 
+        lead_repository: LeadRepository,
+        operator_repository: OperatorRepository,
+        distribute_repository: DistributeRepository
+    ):
+        super().__init__(repo=lead_repository)
+        self.repo_operator = operator_repository
+        self.repo_contact = distribute_repository
         
-    def get_sources(self, id: int):
-        sources = self.repo.get_list_sources(id)
+    async def get_sources(self, id: int):
+        sources = await self.repo.get_list_sources(id)
         response = {
             'objects': sources,
             'total_count': len(sources)
         }
-        print(response)
-        return response
\ No newline at end of file
+        return response
+    
+    @retry_on_lock
+    async def delete(self, id: int) -> None:
+        async with self.uow:
+            lead = await self.repo.get(id)
+            
+            # Active contacts of the lead are deleted with it, 
+            # their operators get the capacity back
+            active = await self.repo_contact.count_active_by_operator(Contact.lead_id == id)
+            for operator_id, count in active.items():
+                operator = await self.repo_operator.release_capacity(operator_id, count)
+                if operator:
+                    stage_operator_state(self.repo.db, operator)
+            if active:
+                stage_capacity_freed(self.repo.db)
+            
+            await self.repo.delete(lead)
@@ -1,44 +1,59 @@
 from models import Operator
 from repositories.repo_operator import OperatorRepository
+from repositories.repo_base import retry_on_lock
 
 from services.service_base import BaseService
+from services.routing_index import stage_operator_state
+
+from exceptions.exc_service import FailedUpdateException
 
 
 class OperatorService(BaseService[OperatorRepository, Operator]):
     def __init__(self, repository: OperatorRepository) -> None:
         super().__init__(repository)
    
-    def get_priorities(self, id: int):
-        priorities = self.repo.get_list_priotiries(id)
+    async def get_priorities(self, id: int):
+        priorities = await self.repo.get_list_priotiries(id)
         response = {
             'objects': priorities,
             'total_count': len(priorities)
         }
         return response
     
-    def atomic_increase_loading(self, id: int) -> Operator:       
-        return self.repo.execute_with_locked(id, self._increase)
-    
-    def atomic_decrease_loading(self, id: int) -> Operator:       
-        return self.repo.execute_with_locked(id, self._decrease)
+    @retry_on_lock
+    async def delete(self, id: int) -> None:
+        # Set-based deletes of children and the operator commit together
+        async with self.uow:
+            operator = await self.repo.get(id)
+            await self.repo.delete(operator)
     
-    # Private static methods for use inside in execute_with_locked 
-    @staticmethod
-    def _decrease(operator: Operator) -> Operator:
-            if not operator.is_active:
-                raise Exception(
-                    f"Increase loading only for active operators"
+    @retry_on_lock
+    async def atomic_increase_loading(self, id: int) -> Operator:       
+        async with self.uow:
+            operator = await self.repo.claim_capacity(id)
+            
+            if operator is None:
+                raise FailedUpdateException(
+                    detail=f"Increase loading only for active operators "
+                           f"with free capacity, operator id={id}"
+                )
+            
+            stage_operator_state(self.repo.db, operator)
+            await self.repo.save()
+        
+        return operator
+        
+    @retry_on_lock
+    async def atomic_decrease_loading(self, id: int) -> Operator:       
+        async with self.uow:
+            operator = await self.repo.release_capacity(id)
+            
+            if operator is None:
+                raise FailedUpdateException(
+                    detail=f"Loading of operator id={id} is already 0"
                 )
             
-            operator.decrement_current_loading()
-            return operator
-    @staticmethod
-    def _increase(operator: Operator) -> Operator:
-        if not operator.is_active:
-            raise Exception(
-                f"Increase loading only for active operators"
-            )
+            stage_operator_state(self.repo.db, operator)
+            await self.repo.save()
         
-        operator.increment_current_loading()
         return operator
-    
\ No newline at end of file
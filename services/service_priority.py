@@ -22,14 +22,14 @@ class PriorityService(BaseService[PriorityRepository, OperatorSourcePriority]):
         self.repo_operator = repo_operator
         self.repo_source = repo_source
     
-    def assign_priority(
+    async def assign_priority(
         self, 
         data: Dict[str, Any]
     ) -> OperatorSourcePriority:
         try:
-            self.repo_operator.get(data["operator_id"])
-            self.repo_source.get(data["source_id"])
-            new_priority = self.repo.create(data)
+            await self.repo_operator.get(data["operator_id"])
+            await self.repo_source.get(data["source_id"])
+            new_priority = await self.repo.create(data)
             return new_priority
         
         except RepositoryException as e:
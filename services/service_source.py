@@ -1,7 +1,15 @@
 from repositories.repo_source import SourceRepository
+from repositories.repo_base import retry_on_lock
 from services.service_base import BaseService
 from models import Source
 
 class SourceService(BaseService[SourceRepository, Source]):
     def __init__(self, repository: SourceRepository) -> None:
         super().__init__(repo=repository)
+    
+    @retry_on_lock
+    async def delete(self, id: int) -> None:
+        # Set-based deletes of children and the source commit together
+        async with self.uow:
+            source = await self.repo.get(id)
+            await self.repo.delete(source)
@@ -0,0 +1,32 @@
+from typing import Any, Dict, List
+
+from models import Contact
+from repositories.repo_stats import StatsRepository
+from services.service_base import BaseService
+from schemas.schema_stats import FilterStats
+
+
+class StatsService(BaseService[StatsRepository, Contact]):
+    def __init__(self, repository: StatsRepository) -> None:
+        super().__init__(repo=repository)
+    
+    async def get_contacts(self, group_by: List[str], filter_params: FilterStats) -> Dict[str, Any]:
+        # Keep order of first appearance, GROUP BY a column twice makes no sense
+        group_by = list(dict.fromkeys(group_by))
+        objects = await self.repo.count_contacts(group_by, filter_params)
+        
+        return {
+            'objects': objects,
+            'group_by': group_by,
+            'total_count': sum(item['count'] for item in objects),
+            'created_from': filter_params.created_at_ge,
+            'created_to': filter_params.created_at_le,
+        }
+    
+    async def get_by_status(self, group_by: str, filter_params: FilterStats) -> Dict[str, Any]:
+        objects = await self.repo.count_by_status(group_by, filter_params)
+        
+        return {
+            'objects': objects,
+            'total_count': len(objects),
+        }
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+import config
+from repositories.repo_operator import OperatorRepository
+from repositories.repo_source import SourceRepository
+from repositories.state_changes import OPERATORS, PRIORITIES, SOURCES, StateChangeRepository
+from services.routing_index import RoutingIndex, routing_index
+from services.response_cache import TableVersions, table_versions
+
+logger = logging.getLogger(__name__)
+
+
+# Keeps process-local state coherent with writes of other worker processes.
+# Polls state_changes on its own connection. On SQLite PRAGMA data_version 
+# tells whether any other connection committed since the last poll, 
+# the log is read only then. Changed operators and sources are read again
+# and replaced in the routing index, their tables invalidate cached responses.
+# Loading isn't logged, only operators the index sees as full are read again
+class StateSync:
+    def __init__(
+        self,
+        interval: float = config.STATE_SYNC_INTERVAL,
+        index: RoutingIndex = routing_index,
+        versions: TableVersions = table_versions,
+    ) -> None:
+        self.interval = interval
+        self.index = index
+        self.versions = versions
+        self.version: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, engine: AsyncEngine) -> None:
+        if self.is_running:
+            return
+        self.version = None
+        self._data_version = None
+        self._task = asyncio.get_running_loop().create_task(self._run(engine))
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self, engine: AsyncEngine) -> None:
+        # data_version is per connection, the same one is used for every poll
+        async with engine.connect() as connection:
+            while True:
+                try:
+                    await self.poll(connection)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Failed to sync routing state")
+                await asyncio.sleep(self.interval)
+
+    # Returns the number of changed entries
+    async def poll(self, connection: AsyncConnection) -> int:
+        try:
+            if connection.dialect.name == "sqlite":
+                data_version = await connection.scalar(text("PRAGMA data_version"))
+                if data_version == self._data_version:
+                    return 0
+                self._data_version = data_version
+
+            async with AsyncSession(bind=connection, expire_on_commit=False) as db:
+                repository = StateChangeRepository(db)
+                if self.version is None:
+                    # Index is loaded lazily, so it is newer than everything logged so far
+                    self.version = await repository.get_version()
+                    return 0
+
+                changes = await repository.get_changes_since(self.version)
+                if changes:
+                    await self._apply(db, changes)
+                    self.version = max(version for *_, version in changes)
+                await self._refresh_full(db)
+                return len(changes)
+        finally:
+            # No snapshot is held between polls
+            await connection.rollback()
+
+    async def _apply(self, db: AsyncSession, changes: List[Tuple[str, int, int]]) -> None:
+        ids: Dict[str, Set[int]] = defaultdict(set)
+        for table_name, entity_id, _ in changes:
+            ids[table_name].add(entity_id)
+        tables = set(ids)
+
+        operator_ids = ids[OPERATORS] | ids[PRIORITIES]
+        if operator_ids:
+            repository = OperatorRepository(db)
+            states = await repository.get_routing_states_of(operator_ids)
+            found = {operator_id for operator_id, *_ in states}
+            weights: Dict[int, Dict[int, int]] = {
+                operator_id: {} for operator_id in ids[PRIORITIES] & found
+            }
+            if weights:
+                for operator_id, source_id, weight in await repository.get_priorities_of(weights):
+                    weights[operator_id][source_id] = weight
+
+            # Deleted operator took its priorities with it
+            if operator_ids - found:
+                tables.add(PRIORITIES)
+            if self.index.is_loaded:
+                for operator_id in operator_ids - found:
+                    self.index.remove_operator(operator_id)
+                for operator_id, *state in states:
+                    self.index.upsert_operator(operator_id, *state)
+                for operator_id, source_weights in weights.items():
+                    self.index.replace_priorities(operator_id, source_weights)
+
+        if ids[SOURCES]:
+            missing = ids[SOURCES] - await SourceRepository(db).get_existing_ids(ids[SOURCES])
+            if missing:
+                tables.add(PRIORITIES)
+            if self.index.is_loaded:
+                for source_id in missing:
+                    self.index.remove_source(source_id)
+
+        self.versions.bump(tables)
+
+    # Loading isn't logged. Operators seen as full may have been released
+    # by another worker, they are read again, the rest fail their claim
+    async def _refresh_full(self, db: AsyncSession) -> None:
+        if not self.index.is_loaded:
+            return
+        operator_ids = self.index.full_operators()
+        if operator_ids:
+            for operator_id, *state in await OperatorRepository(db).get_routing_states_of(operator_ids):
+                self.index.upsert_operator(operator_id, *state)
+
+
+state_sync = StateSync()
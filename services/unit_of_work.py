@@ -0,0 +1,43 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from repositories.repo_base import UNIT_OF_WORK_KEY
+from exceptions.exc_service import DatabaseException
+
+
+# Service level transaction: while it is open repositories only flush,
+# one commit is done on exit of the outermost block, rollback on error.
+# Depth is kept in session.info, so services sharing a session nest safely
+class UnitOfWork:
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+    
+    async def __aenter__(self) -> "UnitOfWork":
+        self.db.info[UNIT_OF_WORK_KEY] = self.db.info.get(UNIT_OF_WORK_KEY, 0) + 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        depth = self.db.info[UNIT_OF_WORK_KEY] - 1
+        self.db.info[UNIT_OF_WORK_KEY] = depth
+        
+        if depth > 0:
+            return
+        
+        if exc_type is not None:
+            await self.db.rollback()
+            return
+        
+        try:
+            await self.db.commit()
+            
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            raise DatabaseException(
+                status_code=500, 
+                detail=f"Database Error\n"
+                       f"Failed to commit unit of work: {e}"
+            ) from e
@@ -1,4 +1,6 @@
-from database import get_db
+import asyncio
+
+from database import SessionLocal
 
 from repositories.repo_operator import OperatorRepository
 from repositories.repo_source import SourceRepository
@@ -67,25 +69,28 @@ priorities = [
     },
 ]
 
-def set_operators(db):
+async def set_operators(db):
     operator_repo = OperatorRepository(db)
     
     for operator in operators:
-        operator_repo.create(operator)
+        await operator_repo.create(operator)
 
-def set_sources(db):
+async def set_sources(db):
     source_repo = SourceRepository(db)
     
     for source in sources:
-        source_repo.create(source)
+        await source_repo.create(source)
 
-def set_priority(db):
+async def set_priority(db):
     priority_repo = PriorityRepository(db)
     
     for priority in priorities:
-        priority_repo.create(priority)
-        
-db = next(get_db())
-set_operators(db)
-set_sources(db)
-set_priority(db)
\ No newline at end of file
+        await priority_repo.create(priority)
+
+async def main():
+    async with SessionLocal() as db:
+        await set_operators(db)
+        await set_sources(db)
+        await set_priority(db)
+
+asyncio.run(main())
\ No newline at end of file
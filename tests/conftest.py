@@ -0,0 +1,81 @@
+import asyncio
+import inspect
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import get_db, make_engine
+from main import app
+from models import Base
+from repositories.lead_affinity import lead_affinity
+from repositories.lead_cache import lead_cache
+from services.response_cache import response_cache
+from services.routing_index import routing_index
+
+
+# Coroutine tests run in a new event loop each, engines of the
+# sessions fixture (also requested through other fixtures) are disposed in the same loop
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+
+    arguments = {name: pyfuncitem.funcargs[name] for name in pyfuncitem._fixtureinfo.argnames}
+
+    async def run():
+        try:
+            await pyfuncitem.obj(**arguments)
+        finally:
+            for argument in pyfuncitem.funcargs.values():
+                if isinstance(argument, async_sessionmaker):
+                    await argument.kw["bind"].dispose()
+
+    asyncio.run(run())
+    return True
+
+
+def create_schema(path) -> str:
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+    return f"sqlite+aiosqlite:///{path}"
+
+
+@pytest.fixture
+def database_url(tmp_path) -> str:
+    return create_schema(tmp_path / "test.db")
+
+
+# New database with the schema of the models for every test
+@pytest.fixture
+def sessions(database_url) -> async_sessionmaker:
+    return async_sessionmaker(
+        bind=make_engine(database_url),
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+# Process-local state is filled by session listeners, it must not leak between databases
+@pytest.fixture(autouse=True)
+def clear_process_state():
+    yield
+    routing_index.clear()
+    lead_cache.clear()
+    lead_affinity.clear()
+    response_cache.clear()
+
+
+# API of the application on the database of the test, without lifespan workers
+@pytest.fixture
+def client(sessions):
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = get_test_db
+    yield httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+    app.dependency_overrides.clear()
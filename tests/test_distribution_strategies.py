@@ -0,0 +1,209 @@
+import math
+import random
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import pytest
+
+from services.distribution_strategies import (
+    CapacityRatioStrategy,
+    LeastLoadedStrategy,
+    SmoothRoundRobinStrategy,
+    WeightedLoadStrategy,
+    WeightedRandomStrategy,
+)
+
+
+# Orders written out again by the description of every strategy,
+# operator id breaks the remaining ties like in the heap
+REFERENCE_KEYS = {
+    WeightedLoadStrategy: lambda weight, current, maximum: (-weight / max(current, 1), current),
+    LeastLoadedStrategy: lambda weight, current, maximum: (current, -weight),
+    CapacityRatioStrategy: lambda weight, current, maximum: (current / maximum, -weight),
+}
+
+State = Tuple[int, int, int]
+
+
+def reference_select(strategy_class, operators: Dict[int, State]) -> Optional[int]:
+    key = REFERENCE_KEYS[strategy_class]
+    return min(
+        operators,
+        key=lambda operator_id: (*key(*operators[operator_id]), operator_id),
+        default=None
+    )
+
+
+def random_state(rnd: random.Random) -> State:
+    max_loading = rnd.randint(1, 8)
+    return rnd.randint(1, 10), rnd.randint(0, max_loading - 1), max_loading
+
+
+@pytest.mark.parametrize("strategy_class", list(REFERENCE_KEYS), ids=lambda cls: cls.name)
+@pytest.mark.parametrize("seed", range(20))
+def test_heap_strategy_matches_full_scan(strategy_class, seed):
+    rnd = random.Random(seed)
+    strategy = strategy_class()
+    operators: Dict[int, State] = {}
+
+    for _ in range(500):
+        operator_id = rnd.randint(1, 30)
+        if rnd.random() < 0.2:
+            strategy.remove(operator_id)
+            operators.pop(operator_id, None)
+        else:
+            state = random_state(rnd)
+            strategy.update(operator_id, *state)
+            operators[operator_id] = state
+
+        assert strategy.select() == reference_select(strategy_class, operators)
+
+
+def test_heap_strategy_select_is_a_probe():
+    strategy = LeastLoadedStrategy()
+    strategy.update(1, 5, 0, 3)
+    strategy.update(2, 5, 1, 3)
+
+    assert [strategy.select() for _ in range(3)] == [1, 1, 1]
+
+
+# Classic smooth weighted round-robin with a pass over all operators:
+# the lowest pass goes next and advances by 1/weight
+class ReferenceRoundRobin:
+    def __init__(self) -> None:
+        self.passes: Dict[int, float] = {}
+        self.weights: Dict[int, int] = {}
+        self.time = 0.0
+
+    def update(self, operator_id: int, weight: int) -> None:
+        self.weights[operator_id] = weight
+        self.passes[operator_id] = max(self.passes.get(operator_id, 0.0), self.time)
+
+    def remove(self, operator_id: int) -> None:
+        self.weights.pop(operator_id, None)
+
+    def next(self) -> Optional[int]:
+        operator_id = min(
+            self.weights,
+            key=lambda operator_id: (self.passes[operator_id], operator_id),
+            default=None
+        )
+        if operator_id is not None:
+            self.time = self.passes[operator_id]
+            self.passes[operator_id] += 1 / self.weights[operator_id]
+        return operator_id
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_smooth_round_robin_matches_full_scan(seed):
+    rnd = random.Random(seed)
+    strategy = SmoothRoundRobinStrategy()
+    reference = ReferenceRoundRobin()
+
+    for _ in range(500):
+        action = rnd.random()
+        operator_id = rnd.randint(1, 10)
+        if action < 0.1:
+            strategy.remove(operator_id)
+            reference.remove(operator_id)
+        elif action < 0.3:
+            weight = rnd.randint(1, 10)
+            strategy.update(operator_id, weight, 0, 10)
+            reference.update(operator_id, weight)
+        else:
+            expected = reference.next()
+            assert strategy.select() == expected
+            if expected is not None:
+                strategy.advance(expected)
+
+
+def test_smooth_round_robin_keeps_weight_proportions():
+    weights = {1: 5, 2: 3, 3: 1, 4: 1}
+    strategy = SmoothRoundRobinStrategy()
+    for operator_id, weight in weights.items():
+        strategy.update(operator_id, weight, 0, 10)
+
+    rounds = 20
+    taken = Counter()
+    for _ in range(rounds * sum(weights.values())):
+        operator_id = strategy.select()
+        strategy.advance(operator_id)
+        taken[operator_id] += 1
+
+    for operator_id, weight in weights.items():
+        assert abs(taken[operator_id] - rounds * weight) <= 1
+
+
+def test_smooth_round_robin_turn_moves_only_on_advance():
+    strategy = SmoothRoundRobinStrategy()
+    strategy.update(1, 1, 0, 10)
+    strategy.update(2, 1, 0, 10)
+
+    assert [strategy.select() for _ in range(3)] == [1, 1, 1]
+    strategy.advance(1)
+    assert strategy.select() == 2
+
+
+def test_smooth_round_robin_skips_zero_weight():
+    strategy = SmoothRoundRobinStrategy()
+    strategy.update(1, 0, 0, 10)
+
+    assert strategy.select() is None
+
+
+# Random source answering every possible target once in turn,
+# a full cycle must hit every operator exactly weight times
+class CyclingRandom(random.Random):
+    def __init__(self) -> None:
+        super().__init__()
+        self.next_target = 0
+
+    def randrange(self, stop):
+        target = self.next_target % stop
+        self.next_target += 1
+        return target
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_weighted_random_hits_match_weights(seed):
+    rnd = random.Random(seed)
+    cycling = CyclingRandom()
+    strategy = WeightedRandomStrategy(cycling)
+    weights: Dict[int, int] = {}
+
+    for _ in range(100):
+        operator_id = rnd.randint(1, 20)
+        # Removed slots are reused by the next new operators
+        if rnd.random() < 0.3:
+            strategy.remove(operator_id)
+            weights.pop(operator_id, None)
+        else:
+            weight = rnd.randint(0, 6)
+            strategy.update(operator_id, weight, 0, 10)
+            weights[operator_id] = weight
+
+        total = sum(weights.values())
+        cycling.next_target = 0
+        hits = Counter(strategy.select() for _ in range(total))
+        expected = Counter({operator_id: weight for operator_id, weight in weights.items() if weight})
+
+        if total:
+            assert hits == expected
+        else:
+            assert strategy.select() is None
+
+
+def test_weighted_random_sample_proportions():
+    weights = {1: 6, 2: 3, 3: 1}
+    strategy = WeightedRandomStrategy(random.Random(7))
+    for operator_id, weight in weights.items():
+        strategy.update(operator_id, weight, 0, 10)
+
+    samples = 20_000
+    hits = Counter(strategy.select() for _ in range(samples))
+
+    # Within five standard deviations of the binomial count
+    for operator_id, weight in weights.items():
+        share = weight / sum(weights.values())
+        deviation = math.sqrt(samples * share * (1 - share))
+        assert abs(hits[operator_id] - samples * share) < 5 * deviation
@@ -0,0 +1,144 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from models import Contact, IdempotencyKey
+from repositories.repo_idempotency import IdempotencyRepository
+from services.idempotency import IdempotencyStore
+from exceptions.exc_service import IdempotencyConflictException, IdempotencyKeyReusedException
+
+KEY = {"Idempotency-Key": "key-1"}
+CONTACT = {"external_id": "lead-1", "source_id": 1}
+
+
+async def count_contacts(sessions) -> int:
+    async with sessions() as db:
+        return await db.scalar(select(func.count()).select_from(Contact))
+
+
+async def stored_keys(sessions):
+    async with sessions() as db:
+        return list(await db.scalars(select(IdempotencyKey)))
+
+
+async def test_reserve_returns_existing_request(sessions):
+    async with sessions() as db:
+        repository = IdempotencyRepository(db)
+        now = time.time()
+
+        assert await repository.reserve("scope", "key", b"body", now, now + 60) is None
+        assert await repository.reserve("scope", "key", b"other", now, now + 60) == (b"body", None)
+        # Keys are scoped by endpoint
+        assert await repository.reserve("other scope", "key", b"body", now, now + 60) is None
+
+        await repository.save_response("scope", "key", {"id": 1}, now + 60)
+        assert await repository.reserve("scope", "key", b"body", now, now + 60) == (b"body", {"id": 1})
+
+
+async def test_expired_key_is_free(sessions):
+    async with sessions() as db:
+        repository = IdempotencyRepository(db)
+        now = time.time()
+        await repository.reserve("scope", "key", b"body", now - 120, now - 60)
+
+        # Worker that died mid-request doesn't hold the key forever
+        assert await repository.reserve("scope", "key", b"other", now, now + 60) is None
+
+
+async def test_first_request_stores_response(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+
+    response = await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    [key] = await stored_keys(sessions)
+    assert (key.scope, key.key, key.response) == ("create_contact", "key-1", response.json())
+
+
+async def test_replay_returns_first_response(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    first = await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    replay = await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert await count_contacts(sessions) == 1
+
+
+async def test_replay_of_batch(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    body = {"items": [CONTACT, {"external_id": "lead-2", "source_id": 1}]}
+    first = await client.post("/contacts/batch", json=body, headers=KEY)
+
+    replay = await client.post("/contacts/batch", json=body, headers=KEY)
+
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json() == first.json()
+    assert await count_contacts(sessions) == 2
+
+
+async def test_key_with_other_body_is_rejected(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    response = await client.post("/contacts/", json={**CONTACT, "external_id": "lead-2"}, headers=KEY)
+
+    assert response.status_code == 422
+    assert await count_contacts(sessions) == 1
+
+
+async def test_key_in_progress_is_conflict(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    async with sessions() as db:
+        now = time.time()
+        fingerprint = IdempotencyStore.fingerprint(CONTACT)
+        await IdempotencyRepository(db).reserve("create_contact", "key-1", fingerprint, now, now + 60)
+
+    response = await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    assert response.status_code == 409
+    assert await count_contacts(sessions) == 0
+
+
+async def test_key_released_on_failure(sessions, client):
+    # No source yet: the request fails after the key was reserved
+    failed = await client.post("/contacts/", json=CONTACT, headers=KEY)
+    assert failed.status_code >= 400
+    assert await stored_keys(sessions) == []
+
+    # Retry with the same key after the cause is fixed
+    await client.post("/sources/", json={"name": "source"})
+    response = await client.post("/contacts/", json=CONTACT, headers=KEY)
+
+    assert response.status_code == 201
+    assert "Idempotent-Replayed" not in response.headers
+    assert await count_contacts(sessions) == 1
+
+
+async def test_store_releases_key_without_response(sessions):
+    async with sessions() as db:
+        store = IdempotencyStore(IdempotencyRepository(db))
+        async with store.claim("scope", "key", {"a": 1}) as entry:
+            assert entry.response is None
+
+        async with store.claim("scope", "key", {"a": 1}) as entry:
+            entry.response = {"id": 1}
+
+        with pytest.raises(IdempotencyKeyReusedException):
+            async with store.claim("scope", "key", {"a": 2}):
+                pass
+
+        async with store.claim("scope", "key", {"a": 1}) as entry:
+            assert entry.response == {"id": 1}
+
+
+async def test_store_conflict_while_in_progress(sessions):
+    async with sessions() as first, sessions() as second:
+        async with IdempotencyStore(IdempotencyRepository(first)).claim("scope", "key", {"a": 1}):
+            with pytest.raises(IdempotencyConflictException):
+                async with IdempotencyStore(IdempotencyRepository(second)).claim("scope", "key", {"a": 1}):
+                    pass
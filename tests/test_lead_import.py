@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import select
+
+from models import Lead
+from services.lead_import import import_executor, iter_records
+
+
+@pytest.fixture(autouse=True)
+def shared_executor(monkeypatch):
+    monkeypatch.setattr(import_executor, "max_workers", 2)
+    yield import_executor
+    import_executor.shutdown()
+
+
+async def stream(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def records(data: bytes, format: str, size: int = 3):
+    return [record async for record in iter_records(stream(data, size), format)]
+
+
+async def stored_leads(sessions):
+    async with sessions() as db:
+        leads = await db.scalars(select(Lead).order_by(Lead.external_id))
+        return {lead.external_id: lead.name for lead in leads}
+
+
+@pytest.mark.parametrize("size", [1, 3, 1000])
+async def test_csv_records_keep_quoted_newlines(size):
+    data = b'external_id,name\r\nlead-1,"two\r\nlines"\r\nlead-2,"say ""hi""\nthere"\nlead-3,plain\n'
+
+    assert await records(data, "csv", size) == [
+        b"external_id,name\r",
+        b'lead-1,"two\r\nlines"\r',
+        b'lead-2,"say ""hi""\nthere"',
+        b"lead-3,plain",
+    ]
+
+
+async def test_ndjson_records_are_lines():
+    data = b'{"external_id": "a\\nb"}\n{"external_id": "\\"c"}\n'
+
+    assert await records(data, "ndjson") == [b'{"external_id": "a\\nb"}', b'{"external_id": "\\"c"}']
+
+
+async def test_unclosed_quote_runs_to_end_of_file():
+    assert await records(b'id\n"a\nb\n', "csv") == [b"id", b'"a\nb']
+
+
+async def test_import_csv_with_multiline_cells(sessions, client):
+    data = (
+        'external_id,name\n'
+        'lead-1,"Ivan\nIvanov"\n'
+        '\n'
+        'lead-2,"broken \xff\n'
+        'cell"\n'
+        ',"no\nid"\n'
+        'lead-3,"with ""quotes"""\n'
+    ).encode("latin-1")
+
+    response = await client.post("/leads/import?format=csv", content=data)
+
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["processed"], report["imported"], report["failed"]) == (4, 2, 2)
+    # Line of the first line of a record
+    assert [error["line"] for error in report["errors"]] == [5, 7]
+    assert report["errors"][0]["error"].startswith("Invalid UTF-8")
+    assert await stored_leads(sessions) == {"lead-1": "Ivan\nIvanov", "lead-3": 'with "quotes"'}
+
+
+async def test_imports_share_worker_processes(sessions, client, shared_executor):
+    await client.post("/sources/", json={"name": "source"})
+    executors = set()
+
+    for number in range(2):
+        data = f'{{"external_id": "lead-{number}", "source_id": 1}}\n'.encode()
+        response = await client.post("/leads/import?format=ndjson", content=data)
+        assert response.json()["linked"] == 1
+        executors.add(id(shared_executor.get()))
+
+    assert len(executors) == 1
+    shared_executor.shutdown()
+    # Started again by the next import
+    response = await client.post("/leads/import", content=b'{"external_id": "lead-2"}\n')
+    assert response.json()["imported"] == 1
+    assert await stored_leads(sessions) == {"lead-0": None, "lead-1": None, "lead-2": None}
@@ -0,0 +1,8 @@
+async def test_metrics_in_prometheus_text_format(client):
+    await client.post("/operators/", json={"name": "operator", "max_loading": 3})
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    assert 'operator_max_loading{operator_id="1"} 3' in response.text.splitlines()
@@ -0,0 +1,42 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect
+
+import config
+from models import Base
+
+
+@pytest.fixture
+def alembic_config(tmp_path, monkeypatch):
+    # env.py takes the database of the application
+    monkeypatch.setattr(config, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'migrations.db'}")
+    return Config("alembic.ini"), f"sqlite:///{tmp_path / 'migrations.db'}"
+
+
+def test_upgrade_matches_models(alembic_config):
+    alembic_cfg, url = alembic_config
+    command.upgrade(alembic_cfg, "head")
+
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn), Base.metadata)
+    engine.dispose()
+    assert diff == []
+
+
+def test_downgrade_to_base(alembic_config):
+    alembic_cfg, url = alembic_config
+    command.upgrade(alembic_cfg, "head")
+    command.downgrade(alembic_cfg, "0001")
+
+    engine = create_engine(url)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("contacts")}
+    assert {"ix_contact_operator_id", "ix_contact_status"} <= indexes
+    assert not inspect(engine).has_table("state_changes")
+
+    command.downgrade(alembic_cfg, "base")
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
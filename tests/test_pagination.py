@@ -0,0 +1,132 @@
+import base64
+import json
+import random
+from typing import List, Optional
+
+import pytest
+
+from models import Lead
+
+
+async def add_leads(sessions, names: List[Optional[str]]) -> None:
+    async with sessions() as db:
+        db.add_all([
+            Lead(external_id=f"lead-{number}", name=name)
+            for number, name in enumerate(names)
+        ])
+        await db.commit()
+
+
+# Expected order of rows: by name with id breaking ties, NULLs after all names
+def expected_ids(leads: List[dict], order_type: str) -> List[int]:
+    descending = order_type == 'desc'
+    named = sorted(
+        (lead for lead in leads if lead['name'] is not None),
+        key=lambda lead: (lead['name'], lead['id']),
+        reverse=descending
+    )
+    unnamed = sorted(
+        (lead for lead in leads if lead['name'] is None),
+        key=lambda lead: lead['id'],
+        reverse=descending
+    )
+    return [lead['id'] for lead in named + unnamed]
+
+
+async def walk_cursor(client, params: dict) -> List[dict]:
+    rows = []
+    response = (await client.get("/leads/", params=params)).json()
+    rows.extend(response['objects'])
+    while response['next_cursor']:
+        assert len(response['objects']) == params['limit']
+        response = (await client.get("/leads/", params={
+            'cursor': response['next_cursor'], 'limit': params['limit']
+        })).json()
+        rows.extend(response['objects'])
+    return rows
+
+
+@pytest.mark.parametrize("order_type", ['asc', 'desc'])
+@pytest.mark.parametrize("limit", [1, 4, 7])
+async def test_cursor_over_nullable_column_with_ties(sessions, client, order_type, limit):
+    rnd = random.Random(limit)
+    await add_leads(sessions, [rnd.choice([None, "anna", "boris", "boris", "vera"]) for _ in range(29)])
+
+    rows = await walk_cursor(client, {'order_by': 'name', 'order_type': order_type, 'limit': limit})
+
+    assert len(rows) == 29
+    assert [row['id'] for row in rows] == expected_ids(rows, order_type)
+
+
+@pytest.mark.parametrize("names", [[None] * 5, ["anna"] * 5, []])
+async def test_cursor_when_all_sort_values_equal(sessions, client, names):
+    await add_leads(sessions, names)
+
+    rows = await walk_cursor(client, {'order_by': 'name', 'order_type': 'asc', 'limit': 2})
+
+    assert [row['id'] for row in rows] == list(range(1, len(names) + 1))
+
+
+async def test_cursor_page_fields(sessions, client):
+    await add_leads(sessions, ["anna", "boris", "vera"])
+
+    first = (await client.get("/leads/", params={'limit': 2, 'with_count': True})).json()
+    last = (await client.get("/leads/", params={'limit': 2, 'cursor': first['next_cursor']})).json()
+
+    assert (first['total_count'], first['limit'], first['order_by'], first['page']) == (3, 2, 'id', None)
+    assert [row['id'] for row in last['objects']] == [3]
+    assert (last['total_count'], last['next_cursor']) == (None, None)
+
+
+def make_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    make_cursor({'order_by': 'name'}),
+    make_cursor(['missing_column', 'asc', 'anna', 1]),
+    make_cursor(['name', 'sideways', 'anna', 1]),
+    make_cursor(['created_at', 'asc', 'yesterday', 1]),
+    make_cursor(['id', 'asc', 1, 'one']),
+])
+async def test_invalid_cursor_is_bad_request(sessions, client, cursor):
+    await add_leads(sessions, ["anna"])
+
+    response = await client.get("/leads/", params={'cursor': cursor})
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()['detail']
+
+
+@pytest.mark.parametrize("order_type", ['asc', 'desc'])
+async def test_offset_pages_follow_sort(sessions, client, order_type):
+    rnd = random.Random(3)
+    await add_leads(sessions, [rnd.choice([None, "anna", "boris", "vera"]) for _ in range(11)])
+
+    rows = []
+    for page in range(1, 5):
+        response = (await client.get("/leads/", params={
+            'page': page, 'limit': 3, 'order_by': 'name', 'order_type': order_type
+        })).json()
+        assert (response['page'], response['limit'], response['total_count']) == (page, 3, 11)
+        assert response['next_cursor'] is None
+        rows.extend(response['objects'])
+
+    assert len(rows) == 11
+    assert [row['id'] for row in rows] == expected_ids(rows, order_type)
+
+
+async def test_page_and_cursor_are_exclusive(sessions, client):
+    await add_leads(sessions, ["anna", "boris", "vera"])
+    first = (await client.get("/leads/", params={'limit': 1})).json()
+
+    response = await client.get("/leads/", params={'page': 2, 'cursor': first['next_cursor']})
+
+    assert response.status_code == 400
+
+
+async def test_page_must_be_positive(client):
+    response = await client.get("/leads/", params={'page': 0})
+
+    assert response.status_code == 422
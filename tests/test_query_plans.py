@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import make_engine
+from benchmarks.datagen import DatasetParams, generate_dataset
+from benchmarks.explain import CHECKS, query_plans, uses_index
+
+from tests.conftest import create_schema
+
+
+# Small generated dataset, analyzed once for all checks:
+# the planner picks indexes by statistics
+@pytest.fixture(scope="module")
+def analyzed_database_url(tmp_path_factory) -> str:
+    url = create_schema(tmp_path_factory.mktemp("plans") / "plans.db")
+
+    async def prepare():
+        engine = make_engine(url)
+        try:
+            await generate_dataset(engine, DatasetParams(
+                operators=50, sources=10, leads=2_000, contacts=10_000, chunk_size=5_000
+            ))
+            async with engine.begin() as conn:
+                await conn.execute(text("ANALYZE"))
+        finally:
+            await engine.dispose()
+
+    asyncio.run(prepare())
+    return url
+
+
+@pytest.mark.parametrize(
+    "call, indexes", 
+    [(call, indexes) for _, call, indexes in CHECKS], 
+    ids=[name for name, *_ in CHECKS]
+)
+async def test_contact_query_uses_index(analyzed_database_url, call, indexes):
+    engine = make_engine(analyzed_database_url)
+    sessions = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        plans = await query_plans(engine, sessions, call)
+    finally:
+        await engine.dispose()
+
+    assert plans, "no SELECT on contacts was executed"
+    assert uses_index(plans, indexes), "\n".join(plans)
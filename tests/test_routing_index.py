@@ -0,0 +1,161 @@
+import random
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+from services.distribution_strategies import STRATEGIES, WeightedRandomStrategy
+from services.routing_index import BatchAssigner, RoutingIndex
+
+from tests.test_distribution_strategies import REFERENCE_KEYS, reference_select
+
+
+Operators = List[Tuple[int, int, int, bool]]
+Priorities = List[Tuple[int, int, int]]
+
+
+def random_world(rnd: random.Random, sources: int) -> Tuple[Operators, Priorities]:
+    operators = [
+        (operator_id, rnd.randint(0, 3), rnd.randint(1, 8), rnd.random() > 0.1)
+        for operator_id in range(1, rnd.randint(1, 30) + 1)
+    ]
+    priorities = [
+        (operator_id, source_id, rnd.randint(1, 10))
+        for operator_id, *_ in operators
+        for source_id in rnd.sample(range(1, sources + 1), rnd.randint(1, sources))
+    ]
+    return operators, priorities
+
+
+def strategy_factory(name: str, seed: int):
+    # Every index gets the same random sequence per source
+    if name == WeightedRandomStrategy.name:
+        return lambda source_id: WeightedRandomStrategy(random.Random(seed * 1000 + source_id))
+    return lambda source_id: STRATEGIES[name]()
+
+
+# Operators able to take a contact of the source with their state, by a full scan
+def eligible(index: RoutingIndex, priorities: Priorities, source_id: int) -> Dict[int, Tuple[int, int, int]]:
+    result = {}
+    for operator_id, priority_source_id, weight in priorities:
+        state = index._operators.get(operator_id)
+        if (
+            priority_source_id == source_id
+            and state.active
+            and state.current_loading < state.max_loading
+        ):
+            result[operator_id] = (weight, state.current_loading, state.max_loading)
+    return result
+
+
+def test_increment_loading_of_one_source():
+    index = RoutingIndex(lambda source_id: STRATEGIES["least_loaded"]())
+    index.load(
+        [(1, 0, 5, True), (2, 1, 5, True)],
+        [(1, 1, 1), (2, 1, 1), (1, 2, 1), (2, 2, 1)],
+    )
+
+    index.increment_loading(1, only_source_id=1)
+    index.increment_loading(1, only_source_id=1)
+
+    # Source 1 sees the new loading, source 2 keeps the old one until refresh
+    assert index.select(1) == 2
+    assert index.select(2) == 1
+    assert index.can_take(2, 1)
+
+    index.refresh(2, [1])
+    assert index.select(2) == 2
+
+
+def test_increment_loading_removes_full_operator():
+    index = RoutingIndex(lambda source_id: STRATEGIES["least_loaded"]())
+    index.load([(1, 0, 1, True)], [(1, 1, 1), (1, 2, 1)])
+
+    index.increment_loading(1, only_source_id=1)
+
+    assert index.select(1) is None
+    assert not index.can_take(2, 1)
+    assert index.full_operators() == {1}
+
+
+@pytest.mark.parametrize("name", list(STRATEGIES))
+@pytest.mark.parametrize("seed", range(30))
+def test_batch_assigner_matches_sequential(name, seed):
+    rnd = random.Random(seed)
+    sources = rnd.randint(1, 6)
+    operators, priorities = random_world(rnd, sources)
+    items = [rnd.randint(1, sources) for _ in range(rnd.randint(1, 200))]
+    if seed % 2:
+        items.sort()
+
+    sequential = RoutingIndex(strategy_factory(name, seed))
+    sequential.load(operators, priorities)
+    batched = RoutingIndex(strategy_factory(name, seed))
+    batched.load(operators, priorities)
+    assigner = BatchAssigner(batched)
+
+    expected = []
+    for source_id in items:
+        operator_id = sequential.select(source_id)
+        if operator_id is not None:
+            sequential.increment_loading(operator_id)
+            sequential.advance(source_id, operator_id)
+        expected.append(operator_id)
+
+    assert [assigner.assign(source_id) for source_id in items] == expected
+
+    assigner.flush()
+    assert batched._operators == sequential._operators
+    for source_id in range(1, sources + 1):
+        assert batched.select(source_id) == sequential.select(source_id)
+
+
+@pytest.mark.parametrize("name", [strategy.name for strategy in REFERENCE_KEYS])
+@pytest.mark.parametrize("seed", range(30))
+def test_batch_assigner_matches_full_scan(name, seed):
+    rnd = random.Random(seed)
+    sources = rnd.randint(1, 6)
+    operators, priorities = random_world(rnd, sources)
+    index = RoutingIndex(strategy_factory(name, seed))
+    index.load(operators, priorities)
+    assigner = BatchAssigner(index)
+
+    for _ in range(rnd.randint(1, 200)):
+        source_id = rnd.randint(1, sources)
+        expected = reference_select(STRATEGIES[name], eligible(index, priorities, source_id))
+        assert assigner.assign(source_id) == expected
+
+    assigner.flush()
+    for source_id in range(1, sources + 1):
+        assert index.select(source_id) == reference_select(
+            STRATEGIES[name], eligible(index, priorities, source_id)
+        )
+
+
+def test_batch_assigner_take_of_checked_operator():
+    index = RoutingIndex(lambda source_id: STRATEGIES["least_loaded"]())
+    index.load([(1, 0, 2, True), (2, 0, 2, True)], [(1, 1, 1), (2, 1, 1), (1, 2, 1)])
+    assigner = BatchAssigner(index)
+
+    # Operator chosen outside of the strategy, e.g. by lead affinity
+    assert assigner.can_take(2, 1)
+    assigner.take(2, 1)
+    assigner.take(2, 1)
+
+    assert not assigner.can_take(2, 1)
+    assert assigner.select(1) == 2
+    assigner.flush()
+    assert index.select(1) == 2
+    assert index.select(2) is None
+
+
+def test_has_candidate_keeps_round_robin_turn():
+    index = RoutingIndex(lambda source_id: STRATEGIES["smooth_round_robin"]())
+    index.load([(1, 0, 10, True), (2, 0, 10, True)], [(1, 1, 1), (2, 1, 1)])
+    assigner = BatchAssigner(index)
+
+    taken = []
+    while assigner.has_candidate(1):
+        assert assigner.has_candidate(1)
+        taken.append(assigner.assign(1))
+
+    assert taken == [1, 2] * 10
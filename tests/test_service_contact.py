@@ -0,0 +1,49 @@
+from sqlalchemy import delete, select
+
+from models import Contact, Lead, LeadsSources
+from repositories.lead_cache import lead_cache
+
+
+async def delete_lead_elsewhere(sessions, external_id: str) -> None:
+    # Another worker deletes the lead: no listener of this process sees it
+    async with sessions() as db:
+        lead_id = await db.scalar(select(Lead.id).where(Lead.external_id == external_id))
+        await db.execute(delete(Contact).where(Contact.lead_id == lead_id))
+        await db.execute(delete(LeadsSources).where(LeadsSources.lead_id == lead_id))
+        await db.execute(delete(Lead).where(Lead.id == lead_id))
+        await db.commit()
+
+
+async def lead_id_of(sessions, external_id: str) -> int:
+    async with sessions() as db:
+        return await db.scalar(select(Lead.id).where(Lead.external_id == external_id))
+
+
+async def test_contact_of_lead_deleted_by_another_worker(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    for external_id in ("lead-1", "lead-2"):
+        response = await client.post("/contacts/", json={"external_id": external_id, "source_id": 1})
+        assert response.status_code == 201
+    await delete_lead_elsewhere(sessions, "lead-1")
+    assert lead_cache.get("lead-1") == 1
+
+    response = await client.post("/contacts/", json={"external_id": "lead-1", "source_id": 1})
+
+    assert response.status_code == 201, response.text
+    assert response.json()["lead_id"] == await lead_id_of(sessions, "lead-1") == 3
+
+
+async def test_batch_with_lead_deleted_by_another_worker(sessions, client):
+    await client.post("/sources/", json={"name": "source"})
+    items = [{"external_id": external_id, "source_id": 1} for external_id in ("lead-1", "lead-2")]
+    response = await client.post("/contacts/batch", json={"items": items})
+    assert response.status_code == 201
+    await delete_lead_elsewhere(sessions, "lead-1")
+
+    response = await client.post("/contacts/batch", json={"items": items})
+
+    assert response.status_code == 201, response.text
+    assert [item["lead_id"] for item in response.json()["objects"]] == [
+        await lead_id_of(sessions, "lead-1"),
+        await lead_id_of(sessions, "lead-2"),
+    ] == [3, 2]
@@ -0,0 +1,63 @@
+from sqlalchemy import select, update
+
+import config
+from models import Lead, Operator, Source, StateChange
+from repositories.lead_cache import lead_cache, stage_leads
+from repositories.state_changes import OPERATORS, SOURCES, StateChangeRepository
+from services.response_cache import table_versions
+
+
+async def test_changes_applied_after_commit_only(sessions):
+    async with sessions() as db:
+        stage_leads(db, {"lead-1": 1})
+        assert lead_cache.get("lead-1") is None
+        await db.commit()
+
+    assert lead_cache.get("lead-1") == 1
+
+
+async def test_changes_dropped_on_rollback(sessions):
+    async with sessions() as db:
+        db.add(Lead(external_id="lead-1"))
+        await db.flush()
+        await db.rollback()
+
+        # Next transaction of the same session starts clean
+        stage_leads(db, {"lead-2": 2})
+        await db.commit()
+
+    assert lead_cache.get("lead-1") is None
+    assert lead_cache.get("lead-2") == 2
+
+
+async def test_changes_collected_on_flush_and_by_statements(sessions):
+    versions = table_versions.get(["sources", "operators"])
+
+    async with sessions() as db:
+        db.add(Source(name="source"))
+        await db.flush()
+        await db.execute(update(Operator).values(active=False))
+        assert table_versions.get(["sources", "operators"]) == versions
+        await db.commit()
+
+    assert table_versions.get(["sources", "operators"]) == tuple(version + 1 for version in versions)
+
+
+# Written before commit: the log is in the same transaction as the change
+async def test_changes_applied_before_commit(sessions, monkeypatch):
+    monkeypatch.setattr(config, "STATE_SYNC_ENABLED", True)
+
+    async with sessions() as db:
+        db.add(Operator(name="operator", max_loading=3))
+        await db.commit()
+        db.add(Source(name="source"))
+        await db.flush()
+        await db.rollback()
+        db.add(Source(name="other source"))
+        await db.commit()
+
+    async with sessions() as db:
+        repository = StateChangeRepository(db)
+        assert await repository.get_version() == 2
+        assert sorted(await repository.get_changes_since(0)) == [(OPERATORS, 1, 1), (SOURCES, 1, 2)]
+        assert await db.scalar(select(StateChange).where(StateChange.version > 2)) is None
@@ -0,0 +1,188 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from models import Contact, ContactActivityHourly, Lead, Operator, Source
+from dependencies.custom_enum import StatusList
+from repositories.contact_rollup import as_utc
+from repositories.repo_stats import StatsRepository
+from schemas.schema_stats import FilterStats
+
+BASE = datetime(2026, 10, 1, 8, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+# (created_at, source_id, operator_id, status)
+Row = Tuple[datetime, int, Optional[int], StatusList]
+
+
+def contact_times(rnd: random.Random) -> List[datetime]:
+    # Exact hour marks and the last microsecond of hours are the edges of windows
+    edges = [BASE + timedelta(hours=hours) + shift for hours in range(6) for shift in (timedelta(0), -MICROSECOND)]
+    return edges[1:] + [BASE + timedelta(seconds=rnd.randrange(6 * 3600)) for _ in range(80)]
+
+
+def random_rows(seed: int) -> List[Row]:
+    rnd = random.Random(seed)
+    return [
+        (
+            created_at,
+            rnd.randint(1, 2),
+            rnd.choice([None, 1, 2, 3]),
+            rnd.choice(list(StatusList)),
+        )
+        for created_at in contact_times(rnd)
+    ]
+
+
+async def add_contacts(sessions, rows: List[Row]) -> None:
+    async with sessions() as db:
+        db.add_all([Operator(name=f"operator-{number}", max_loading=10) for number in range(3)])
+        db.add_all([Source(name=f"source-{number}") for number in range(2)])
+        db.add(Lead(external_id="lead"))
+        await db.flush()
+
+        for created_at, source_id, operator_id, status in rows:
+            contact = Contact(source_id=source_id, lead_id=1, operator_id=operator_id, status=status)
+            contact.created_at = created_at
+            db.add(contact)
+        await db.commit()
+
+
+def reference_counts(rows: List[Row], group_by: List[str], filter_params: FilterStats) -> Counter:
+    counts: Counter = Counter()
+    for created_at, source_id, operator_id, status in rows:
+        values = {"source_id": source_id, "operator_id": operator_id, "status": status}
+        if filter_params.created_at_ge is not None and created_at < filter_params.created_at_ge:
+            continue
+        if filter_params.created_at_le is not None and created_at > filter_params.created_at_le:
+            continue
+        if any(
+            getattr(filter_params, name) is not None and getattr(filter_params, name) != values[name]
+            for name in values
+        ):
+            continue
+        counts[tuple(values[name] for name in group_by)] += 1
+    return counts
+
+
+async def counted(sessions, group_by: List[str], filter_params: FilterStats) -> Counter:
+    async with sessions() as db:
+        items = await StatsRepository(db).count_contacts(group_by, filter_params)
+    return Counter({tuple(item[name] for name in group_by): item["count"] for item in items})
+
+
+async def rollup_rows(sessions) -> Counter:
+    async with sessions() as db:
+        rows = await db.execute(select(ContactActivityHourly))
+        return Counter({
+            (as_utc(row.hour), row.source_id, row.operator_id, row.status): row.count
+            for row in rows.scalars()
+            if row.count
+        })
+
+
+HOUR = timedelta(hours=1)
+MINUTE = timedelta(minutes=1)
+
+WINDOWS = {
+    "everything": (None, None),
+    "whole_hours": (BASE + HOUR, BASE + 3 * HOUR),
+    "partial_hours": (BASE + 10 * MINUTE, BASE + 2 * HOUR + 30 * MINUTE),
+    "inside_one_hour": (BASE + 61 * MINUTE, BASE + 62 * MINUTE),
+    "one_instant_on_hour": (BASE + 2 * HOUR, BASE + 2 * HOUR),
+    "last_microsecond_of_hour": (BASE + 2 * HOUR - MICROSECOND, BASE + 4 * HOUR - MICROSECOND),
+    "from_only": (BASE + 2 * HOUR + 15 * MINUTE, None),
+    "to_only": (None, BASE + 3 * HOUR + 45 * MINUTE),
+    "other_time_zone": (
+        (BASE + 90 * MINUTE).astimezone(timezone(timedelta(hours=5, minutes=30))),
+        (BASE + 4 * HOUR).astimezone(timezone(timedelta(hours=-3))),
+    ),
+}
+
+
+@pytest.mark.parametrize("window", list(WINDOWS.values()), ids=list(WINDOWS))
+@pytest.mark.parametrize("group_by", [["operator_id", "source_id", "status"], ["status"]])
+async def test_count_contacts_matches_full_scan(sessions, window, group_by):
+    rows = random_rows(1)
+    await add_contacts(sessions, rows)
+    created_from, created_to = window
+
+    filter_params = FilterStats(created_at_ge=created_from, created_at_le=created_to)
+
+    assert await counted(sessions, group_by, filter_params) == reference_counts(rows, group_by, filter_params)
+
+
+@pytest.mark.parametrize("filters", [
+    {"operator_id": 2},
+    {"source_id": 1, "status": StatusList.DONE},
+    {"status": StatusList.IN_QUEUE},
+])
+async def test_count_contacts_with_filters(sessions, filters):
+    rows = random_rows(2)
+    await add_contacts(sessions, rows)
+    group_by = ["operator_id", "source_id", "status"]
+
+    filter_params = FilterStats(
+        created_at_ge=BASE + 20 * MINUTE,
+        created_at_le=BASE + 4 * HOUR + 5 * MINUTE,
+        **filters
+    )
+
+    assert await counted(sessions, group_by, filter_params) == reference_counts(rows, group_by, filter_params)
+
+
+async def test_rollup_follows_orm_changes(sessions):
+    rows = random_rows(3)
+    await add_contacts(sessions, rows)
+
+    # Status and operator changes move counts, deletes take them off
+    async with sessions() as db:
+        contacts = list(await db.scalars(select(Contact).order_by(Contact.id)))
+        for contact in contacts[::3]:
+            contact.status = StatusList.DONE
+            contact.operator_id = None
+        for contact in contacts[1::5]:
+            await db.delete(contact)
+        await db.commit()
+
+    maintained = await rollup_rows(sessions)
+    async with sessions() as db:
+        await StatsRepository(db).rebuild_rollup()
+
+    assert await rollup_rows(sessions) == maintained
+
+
+async def test_rebuild_rollup_of_window(sessions):
+    rows = random_rows(4)
+    await add_contacts(sessions, rows)
+    expected = await rollup_rows(sessions)
+
+    # Contacts inserted by a bulk statement bypass the rollup
+    bulk_at = BASE + 2 * HOUR + 30 * MINUTE
+    async with sessions() as db:
+        await db.execute(insert(Contact), [
+            {"source_id": 1, "lead_id": 1, "operator_id": None, "status": StatusList.NEW, "created_at": bulk_at}
+        ] * 3)
+        # Counts outside the window are left as they are
+        await db.execute(delete(ContactActivityHourly).where(ContactActivityHourly.hour < BASE + HOUR))
+        await db.commit()
+
+    async with sessions() as db:
+        await StatsRepository(db).rebuild_rollup(BASE + HOUR + 30 * MINUTE, bulk_at)
+
+    expected[(BASE + 2 * HOUR, 1, 0, StatusList.NEW)] += 3
+    for key in list(expected):
+        if key[0] < BASE + HOUR:
+            del expected[key]
+    assert await rollup_rows(sessions) == expected
+
+    async with sessions() as db:
+        await StatsRepository(db).rebuild_rollup()
+
+    rows += [(bulk_at, 1, None, StatusList.NEW)] * 3
+    group_by = ["operator_id", "source_id", "status"]
+    assert await counted(sessions, group_by, FilterStats()) == reference_counts(rows, group_by, FilterStats())